@@ -0,0 +1,119 @@
+"""
+Measures the cold start of the CLI: the wall time of `main.py` in a fresh interpreter, from launch
+to exit, for `--help`, for a run on a tiny synthetic VCF (one sample, a few hundred records) and for
+the same run on two workers. The bare interpreter start is measured too, as the floor. The median
+of `--repeat` launches is reported.
+
+The imports of the tiny run are broken down with `python -X importtime`: self time summed per
+top-level package (pyarrow, cyvcf2, pydantic, ...), so a change that pulls a heavy module back
+into the startup path shows up by name. Results are saved as JSON; `--compare` prints the change
+against an earlier results file.
+
+Usage:
+    PYTHONPATH=src python benchmarks/cold_start.py -o before.json
+    PYTHONPATH=src python benchmarks/cold_start.py -o after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from synthetic_vcf import SyntheticSpec
+from throughput import CACHE, environment, synthetic_vcf
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / 'src' / 'cumulus_genomic_pipeline' / 'main.py'
+TINY_SPEC = SyntheticSpec(records=300, samples=1, family='singleton')
+# Packages reported on their own in the import breakdown; the rest is summed as "other".
+PACKAGES = ('pyarrow', 'cyvcf2', 'numpy', 'pydantic', 'pydantic_core', 'cumulus_genomic_pipeline')
+
+
+def commands(vcf: Path, output_dir: Path) -> dict[str, list[str]]:
+    return {
+        'interpreter': [sys.executable, '-c', 'pass'],
+        'help': [sys.executable, str(MAIN), '--help'],
+        'run': [sys.executable, str(MAIN), '-i', str(vcf), '-o', str(output_dir)],
+        'run_2_workers': [sys.executable, str(MAIN), '-i', str(vcf), '-i', str(vcf), '-o', str(output_dir), '-w', '2'],
+    }
+
+
+def launch(command: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_breakdown(command: list[str], env: dict) -> dict[str, float]:
+    """
+    Runs `command` with -X importtime and returns the import self time in ms per top-level package.
+    """
+    result = subprocess.run(
+        [command[0], '-X', 'importtime', *command[1:]], env=env, check=True, capture_output=True, text=True
+    )
+    totals: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line.removeprefix('import time:').split('|')
+        package = name.strip().split('.')[0]
+        totals[package if package in PACKAGES else 'other'] += int(self_us) / 1000
+    return {package: round(ms, 1) for package, ms in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+def benchmark(repeat: int, cache: Path) -> dict:
+    vcf = synthetic_vcf(TINY_SPEC, cache)
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(ROOT / 'src'), os.environ.get('PYTHONPATH')]))}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, command in commands(vcf, Path(tmp) / 'out').items():
+            seconds = []
+            for _ in range(repeat):
+                # A fresh output directory, so the manifest does not skip the run.
+                subprocess.run(['rm', '-rf', str(Path(tmp) / 'out')], check=True)
+                seconds.append(launch(command, env))
+            results[name] = {'median_ms': round(statistics.median(seconds) * 1000, 1), 'min_ms': round(min(seconds) * 1000, 1)}
+        subprocess.run(['rm', '-rf', str(Path(tmp) / 'out')], check=True)
+        imports = import_breakdown(commands(vcf, Path(tmp) / 'out')['run'], env)
+    return {'case': TINY_SPEC.name, 'launches': results, 'imports_ms': imports}
+
+
+def compare(result: dict, baseline_path: Path):
+    before = json.loads(baseline_path.read_text())['results'][0]
+    print('| launch | median ms before | after | change |')
+    print('|---|---|---|---|')
+    for name, after in result['launches'].items():
+        if name not in before['launches']:
+            continue
+        previous = before['launches'][name]['median_ms']
+        print(f"| {name} | {previous:.0f} | {after['median_ms']:.0f} | {after['median_ms'] / previous - 1:+.1%} |")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Launches per command; the median is reported')
+    parser.add_argument('-o', '--output', type=Path, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='Results JSON of an earlier run to compare with')
+    parser.add_argument('--cache', type=Path, default=CACHE, help='Directory for the generated VCF')
+    args = parser.parse_args()
+
+    result = benchmark(args.repeat, args.cache)
+    for name, launch_result in result['launches'].items():
+        print(f"{name}: {launch_result['median_ms']:.0f} ms (min {launch_result['min_ms']:.0f} ms)")
+    print(f"imports of run (self ms): {result['imports_ms']}")
+
+    if args.output:
+        args.output.write_text(json.dumps({'environment': environment(), 'results': [result]}, indent=2) + '\n')
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares the output schema profiles on one or more VCFs: Parquet size, processing (write) time
+and DuckDB scan time per table.
+
+Usage:
+    PYTHONPATH=src python benchmarks/schema_profiles.py VCF [VCF ...] [--repeat N]
+
+DuckDB is optional; without it the scan column is left empty.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import process_inputs
+from cumulus_genomic_pipeline.schema.schema import SCHEMA_PROFILES
+
+# Scans touching the columns the compact profile changes.
+QUERIES = {
+    'variants': 'SELECT chromosome, variant_class, vep_impact, count(*) FROM {table} GROUP BY ALL',
+    'consequence': 'SELECT chromosome, symbol, biotype, vep_impact, count(*) FROM {table} GROUP BY ALL',
+    'occurance': 'SELECT chromosome, zygosity, filter, count(*) FROM {table} GROUP BY ALL',
+}
+
+
+def run_profile(vcf_files: list[str], profile: str, output_dir: Path, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        inputs = VcfProcessingInput(vcf_files=vcf_files, output_dir=str(output_dir), valid=True, schema_profile=profile)
+        start = time.perf_counter()
+        process_inputs(inputs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def table_files(output_dir: Path, table: str) -> list[Path]:
+    flat = output_dir / f'{table}.parquet'
+    return [flat] if flat.exists() else sorted((output_dir / table).glob('*.parquet'))
+
+
+def scan_time(files: list[Path], table: str, repeat: int) -> float | None:
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    source = f"read_parquet([{', '.join(repr(str(f)) for f in files)}])"
+    best = float('inf')
+    with duckdb.connect() as con:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            con.execute(QUERIES[table].format(table=source)).fetchall()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('vcf', nargs='+')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is reported')
+    args = parser.parse_args()
+
+    print('| profile | process (s) | table | size (KiB) | DuckDB scan (ms) |')
+    print('|---|---|---|---|---|')
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in SCHEMA_PROFILES:
+            output_dir = Path(tmp) / profile
+            output_dir.mkdir()
+            elapsed = run_profile(args.vcf, profile, output_dir, args.repeat)
+            for table in QUERIES:
+                files = table_files(output_dir, table)
+                size = sum(f.stat().st_size for f in files) / 1024
+                scan = scan_time(files, table, args.repeat)
+                scan_ms = f'{scan * 1000:.1f}' if scan is not None else ''
+                print(f'| {profile} | {elapsed:.2f} | {table} | {size:.0f} | {scan_ms} |')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Writes deterministic synthetic VEP-annotated VCFs with the header layout of the test fixture
+(tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz), for benchmarking at any scale.
+
+The same arguments and seed always give the same file. Knobs:
+    - records: Number of records, spread evenly over chr1-22 and chrX in position order.
+    - samples: Number of samples.
+    - transcripts: CSQ entries per ALT allele.
+    - family: `trio` groups the samples into father, mother and child, the child inheriting one
+      allele from each parent, and writes a PED file next to the VCF. `singleton` draws every
+      sample on its own.
+    - multiallelic: Fraction of records with two ALT alleles.
+
+A path ending in .gz is written as BGZF with a tabix index, so it can also be sharded.
+
+Usage:
+    PYTHONPATH=src python benchmarks/synthetic_vcf.py out.vcf.gz --records 100000 --samples 3 --family trio
+"""
+
+import argparse
+import gzip
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from cumulus_genomic_pipeline.vcf_index import TBI_SUFFIX, build_tabix_index, write_bgzf
+
+TEMPLATE = Path(__file__).resolve().parents[1] / 'tests' / 'data' / '4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+FAMILIES = ('trio', 'singleton')
+FORMAT = 'GT:AD:DP:GQ:PL'
+BASES = 'ACGT'
+PRIMARY_CONTIG = re.compile(r'chr(\d+|X)')
+FILTERS = ('PASS',) * 8 + ('VQSRTrancheSNP99.90to99.95', 'LowQual')
+CONSEQUENCES = (
+    ('intergenic_variant', 'MODIFIER'), ('upstream_gene_variant', 'MODIFIER'), ('intron_variant', 'MODIFIER'),
+    ('synonymous_variant', 'LOW'), ('missense_variant', 'MODERATE'), ('stop_gained', 'HIGH'),
+)
+BIOTYPES = ('protein_coding', 'lncRNA', 'processed_pseudogene')
+# Mean distance between records, in bases.
+SPACING = 2000
+
+
+@dataclass(slots=True, frozen=True)
+class SyntheticSpec:
+    records: int = 10_000
+    samples: int = 3
+    transcripts: int = 3
+    family: str = 'trio'
+    multiallelic: float = 0.0
+    seed: int = 1
+
+    @property
+    def name(self) -> str:
+        return (
+            f'r{self.records}-s{self.samples}-t{self.transcripts}-{self.family}'
+            f'-m{self.multiallelic:g}-seed{self.seed}'
+        )
+
+
+DEFAULT_SPEC = SyntheticSpec()
+
+
+def write_vcf(path: Path, spec: SyntheticSpec) -> Path:
+    """
+    Writes the VCF described by `spec` to `path`, and its PED file for trios. Returns `path`.
+    """
+    rng = random.Random(spec.seed)
+    header, contigs = _template_header()
+    samples = _sample_names(spec)
+    lines = header + ['\t'.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT', *samples])]
+    per_contig = -(-spec.records // len(contigs))
+    for index in range(spec.records):
+        contig = contigs[index // per_contig]
+        if index % per_contig == 0:
+            position = rng.randint(10_000, 100_000)
+        position += rng.randint(1, 2 * SPACING)
+        lines.append(_record(rng, spec, contig, position))
+    payload = ('\n'.join(lines) + '\n').encode()
+
+    if path.name.endswith('.gz'):
+        write_bgzf(path, payload)
+        build_tabix_index(str(path), path.with_name(path.name + TBI_SUFFIX))
+    else:
+        path.write_bytes(payload)
+    if spec.family == 'trio':
+        _write_ped(ped_path(path), samples)
+    return path
+
+
+def ped_path(vcf_path: Path) -> Path:
+    return vcf_path.with_name(vcf_path.name.removesuffix('.gz').removesuffix('.vcf') + '.ped')
+
+
+def _template_header() -> tuple[list[str], list[str]]:
+    with gzip.open(TEMPLATE, 'rt') as template:
+        header = [line.rstrip('\n') for line in template if line.startswith('##')]
+    contigs = [line.split('ID=')[1].split(',')[0] for line in header if line.startswith('##contig=')]
+    contigs = [contig for contig in contigs if PRIMARY_CONTIG.fullmatch(contig)]
+    return header, contigs
+
+
+def _sample_names(spec: SyntheticSpec) -> list[str]:
+    if spec.family == 'trio':
+        roles = ('father', 'mother', 'child')
+        return [f'FAM{i // 3 + 1:05d}_{roles[i % 3]}' for i in range(spec.samples)]
+    return [f'S{i + 1:05d}' for i in range(spec.samples)]
+
+
+def _record(rng: random.Random, spec: SyntheticSpec, contig: str, position: int) -> str:
+    ref = rng.choice(BASES)
+    alts = [_alt(rng, ref) for _ in range(2 if rng.random() < spec.multiallelic else 1)]
+    if len(alts) == 2 and alts[0] == alts[1]:
+        alts[1] = next(base for base in BASES if base not in (ref, alts[0]))
+    alleles = len(alts) + 1
+    frequencies = [rng.uniform(0.01, 0.5) / len(alts) for _ in alts]
+
+    genotypes = []
+    for index in range(spec.samples):
+        if spec.family == 'trio' and index % 3 == 2:
+            father, mother = genotypes[index - 2], genotypes[index - 1]
+            genotypes.append((rng.choice(father), rng.choice(mother)))
+        else:
+            genotypes.append((_allele(rng, frequencies), _allele(rng, frequencies)))
+    calls = [_call(rng, genotype, alleles) for genotype in genotypes]
+
+    called = [allele for genotype in genotypes for allele in genotype]
+    counts = [called.count(allele) for allele in range(1, alleles)]
+    depth = rng.randint(10, 60) * max(spec.samples, 1)
+    info = ';'.join([
+        f"AC={','.join(map(str, counts))}",
+        f"AF={','.join(f'{count / len(called):.3f}' for count in counts)}",
+        f'AN={len(called)}',
+        f'DP={depth}',
+        f'FS={rng.uniform(0, 10):.3f}',
+        f'MQ={rng.uniform(30, 60):.2f}',
+        f'QD={rng.uniform(1, 30):.2f}',
+        f'SOR={rng.uniform(0, 3):.3f}',
+        f'VQSLOD={rng.uniform(-20, 20):.2f}',
+        'culprit=MQ',
+        f"CSQ={','.join(_csq(rng, spec, contig, position, ref, alt) for alt in alts)}",
+    ])
+    fields = [
+        contig, str(position), '.', ref, ','.join(alts), f'{rng.uniform(30, 3000):.2f}', rng.choice(FILTERS),
+        info, FORMAT, *calls,
+    ]
+    return '\t'.join(fields)
+
+
+def _alt(rng: random.Random, ref: str) -> str:
+    kind = rng.random()
+    if kind < 0.08:
+        # Insertion, anchored on the REF base.
+        return ref + ''.join(rng.choice(BASES) for _ in range(rng.randint(1, 4)))
+    return rng.choice([base for base in BASES if base != ref])
+
+
+def _allele(rng: random.Random, frequencies: list[float]) -> int:
+    draw = rng.random()
+    for allele, frequency in enumerate(frequencies, start=1):
+        if draw < frequency:
+            return allele
+        draw -= frequency
+    return 0
+
+
+def _call(rng: random.Random, genotype: tuple[int, int], alleles: int) -> str:
+    first, second = sorted(genotype)
+    depth = rng.randint(5, 60)
+    ad = [0] * alleles
+    for allele in genotype:
+        ad[allele] += depth // 2
+    ad[first] += depth % 2
+    quality = rng.randint(0, 99)
+    # PL has one value per unordered genotype (Number=G); the called one is 0.
+    pl = [
+        0 if (a, b) == (first, second) else rng.randint(10, 500)
+        for b in range(alleles) for a in range(b + 1)
+    ]
+    return f"{first}/{second}:{','.join(map(str, ad))}:{depth}:{quality}:{','.join(map(str, pl))}"
+
+
+def _csq(rng: random.Random, spec: SyntheticSpec, contig: str, position: int, ref: str, alt: str) -> str:
+    # VEP's minimal representation of the allele: insertions drop the shared anchor base.
+    allele = alt[1:] if len(alt) > len(ref) else alt
+    variant_class = 'insertion' if len(alt) > len(ref) else 'SNV'
+    entries = []
+    for transcript in range(spec.transcripts):
+        consequence, impact = rng.choice(CONSEQUENCES)
+        gene = rng.randint(1, 60_000)
+        entries.append('|'.join([
+            allele, consequence, impact, f'GENE{gene}', 'Transcript', f'ENSG{gene:011d}',
+            '1' if transcript == 0 else '', f'ENST{gene * 10 + transcript:011d}',
+            f'{rng.randint(1, 20)}/20' if impact != 'MODIFIER' else '', rng.choice(BIOTYPES), '',
+            '', '', rng.choice(('1', '-1')), '', '', '', '', '', variant_class,
+            f'{contig}:g.{position}{ref}>{alt}', 'YES' if transcript == 0 else '', '',
+        ]))
+    return ','.join(entries)
+
+
+def _write_ped(path: Path, samples: list[str]):
+    lines = []
+    for index, sample in enumerate(samples):
+        family, role = sample.split('_')
+        if role == 'child' and index >= 2:
+            lines.append(f'{family}\t{sample}\t{samples[index - 2]}\t{samples[index - 1]}\t0\t2')
+        else:
+            lines.append(f"{family}\t{sample}\t0\t0\t{1 if role == 'father' else 2 if role == 'mother' else 0}\t1")
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', type=Path)
+    parser.add_argument('--records', type=int, default=DEFAULT_SPEC.records)
+    parser.add_argument('--samples', type=int, default=DEFAULT_SPEC.samples)
+    parser.add_argument('--transcripts', type=int, default=DEFAULT_SPEC.transcripts)
+    parser.add_argument('--family', choices=FAMILIES, default=DEFAULT_SPEC.family)
+    parser.add_argument('--multiallelic', type=float, default=DEFAULT_SPEC.multiallelic)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SPEC.seed)
+    args = parser.parse_args()
+    spec = SyntheticSpec(args.records, args.samples, args.transcripts, args.family, args.multiallelic, args.seed)
+    write_vcf(args.output, spec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Measures `process_inputs` on synthetic VCFs: records/s, rows/s and output bytes per table, and
+peak RSS. Results are saved as JSON; `--compare` prints the change against an earlier results file.
+
+Every combination of the generator arguments is one case. Each run is a fresh process, so peak
+RSS is per run: `peak_rss_mb` is the process running `process_inputs`, and `peak_worker_rss_mb`
+the largest pool worker (with `-w` above 1). The fastest of `--repeat` runs is reported, with the
+highest peak RSS of any of them.
+
+Usage:
+    PYTHONPATH=src python benchmarks/throughput.py --records 20000 100000 --samples 3 30 -o after.json
+    PYTHONPATH=src python benchmarks/throughput.py --records 20000 --set schema_profile=compact --compare before.json
+
+Generated VCFs are kept in `--cache` (default benchmarks/.cache) and reused.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, fields
+from pathlib import Path
+
+import cyvcf2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pydantic import TypeAdapter
+
+from cumulus_genomic_pipeline.manifest import pipeline_version
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from synthetic_vcf import DEFAULT_SPEC, FAMILIES, SyntheticSpec, ped_path, write_vcf
+
+TABLES = ('variants', 'consequence', 'occurance', 'sites')
+CACHE = Path(__file__).resolve().parent / '.cache'
+
+
+def synthetic_vcf(spec: SyntheticSpec, cache: Path) -> Path:
+    path = cache / f'{spec.name}.vcf.gz'
+    if not path.exists():
+        cache.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=cache) as tmp:
+            write_vcf(Path(tmp) / path.name, spec)
+            # The VCF last, as its presence marks a complete set of files.
+            for written in sorted(Path(tmp).iterdir(), key=lambda file: file.name == path.name):
+                written.rename(cache / written.name)
+    return path
+
+
+def run_once(inputs: VcfProcessingInput) -> dict:
+    """
+    Runs `process_inputs` in a new process, and returns its wall time and peak RSS.
+    """
+    # Not a pool: its processes are daemons, which cannot start the pipeline's own workers.
+    context = multiprocessing.get_context('spawn')
+    results = context.SimpleQueue()
+    process = context.Process(target=_measure, args=(inputs, results))
+    process.start()
+    result = results.get()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(f"Benchmark run failed: {result['error']}")
+    return result
+
+
+def _measure(inputs: VcfProcessingInput, results):
+    from cumulus_genomic_pipeline.process_vcf import process_inputs
+
+    # Per-record warnings would be timed too.
+    logging.basicConfig(level=logging.ERROR)
+    try:
+        start = time.perf_counter()
+        process_inputs(inputs)
+        seconds = time.perf_counter() - start
+    except Exception as e:
+        results.put({'error': repr(e)})
+        return
+    # ru_maxrss is in KiB on Linux.
+    results.put({
+        'seconds': seconds,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'peak_worker_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    })
+
+
+def table_outputs(output_dir: Path) -> dict[str, tuple[int, int]]:
+    """
+    Returns the rows and bytes of each table written, in any output layout.
+    """
+    outputs = {}
+    for table in TABLES:
+        flat = output_dir / f'{table}.parquet'
+        files = [flat] if flat.exists() else sorted((output_dir / table).rglob('*.parquet'))
+        if not files:
+            # The sites table is only written with site_table=true.
+            continue
+        outputs[table] = (
+            sum(pq.read_metadata(file).num_rows for file in files), sum(file.stat().st_size for file in files)
+        )
+    return outputs
+
+
+def benchmark(spec: SyntheticSpec, settings: dict, repeat: int, cache: Path) -> dict:
+    vcf = synthetic_vcf(spec, cache)
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            # Trios come with their PED, so the family columns are computed.
+            ped_file = str(ped_path(vcf)) if spec.family == 'trio' else None
+            # --set values are strings; pydantic converts them to the field types.
+            inputs = TypeAdapter(VcfProcessingInput).validate_python(
+                {'vcf_files': [str(vcf)], 'output_dir': tmp, 'valid': True, 'ped_file': ped_file, **settings}
+            )
+            runs.append(run_once(inputs))
+            outputs = table_outputs(Path(tmp))
+
+    seconds = min(run['seconds'] for run in runs)
+    return {
+        'case': spec.name,
+        'spec': asdict(spec),
+        'settings': settings,
+        'vcf_bytes': vcf.stat().st_size,
+        'seconds': round(seconds, 4),
+        'records_per_s': round(spec.records / seconds, 1),
+        'rows': {table: rows for table, (rows, _) in outputs.items()},
+        'rows_per_s': {table: round(rows / seconds, 1) for table, (rows, _) in outputs.items()},
+        'output_bytes': {table: size for table, (_, size) in outputs.items()},
+        'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+        'peak_worker_rss_mb': round(max(run['peak_worker_rss_mb'] for run in runs), 1),
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'pipeline': pipeline_version(),
+        'python': platform.python_version(),
+        'pyarrow': pa.__version__,
+        'cyvcf2': cyvcf2.__version__,
+        'platform': platform.platform(),
+        'cpus': multiprocessing.cpu_count(),
+    }
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = {
+        (result['case'], json.dumps(result['settings'], sort_keys=True)): result
+        for result in json.loads(baseline_path.read_text())['results']
+    }
+    print('| case | settings | records/s before | records/s after | change | peak RSS MiB before | after |')
+    print('|---|---|---|---|---|---|---|')
+    for result in results:
+        key = (result['case'], json.dumps(result['settings'], sort_keys=True))
+        before = baseline.get(key)
+        if before is None:
+            continue
+        change = result['records_per_s'] / before['records_per_s'] - 1
+        print(
+            f"| {key[0]} | {key[1]} | {before['records_per_s']:.0f} | {result['records_per_s']:.0f} | "
+            f"{change:+.1%} | {before['peak_rss_mb']:.0f} | {result['peak_rss_mb']:.0f} |"
+        )
+
+
+def parse_setting(value: str) -> tuple[str, str]:
+    key, _, setting = value.partition('=')
+    if key not in {field.name for field in fields(VcfProcessingInput)} or not setting:
+        raise argparse.ArgumentTypeError(f'Expected FIELD=VALUE with a VcfProcessingInput field, got {value}')
+    return key, setting
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, nargs='+', default=[DEFAULT_SPEC.records])
+    parser.add_argument('--samples', type=int, nargs='+', default=[DEFAULT_SPEC.samples])
+    parser.add_argument('--transcripts', type=int, nargs='+', default=[DEFAULT_SPEC.transcripts])
+    parser.add_argument('--family', choices=FAMILIES, nargs='+', default=[DEFAULT_SPEC.family])
+    parser.add_argument('--multiallelic', type=float, nargs='+', default=[DEFAULT_SPEC.multiallelic])
+    parser.add_argument('--seed', type=int, default=DEFAULT_SPEC.seed)
+    parser.add_argument('--set', dest='settings', type=parse_setting, action='append', default=[],
+                        help='Pipeline option as a VcfProcessingInput FIELD=VALUE, e.g. workers=4; repeatable')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the fastest is reported')
+    parser.add_argument('-o', '--output', type=Path, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='Results JSON of an earlier run to compare with')
+    parser.add_argument('--cache', type=Path, default=CACHE, help='Directory for the generated VCFs')
+    parser.add_argument('--clear-cache', action='store_true', help='Remove the generated VCFs when done')
+    args = parser.parse_args()
+
+    settings = dict(args.settings)
+    results = []
+    for records, samples, transcripts, family, multiallelic in itertools.product(
+            args.records, args.samples, args.transcripts, args.family, args.multiallelic):
+        spec = SyntheticSpec(records, samples, transcripts, family, multiallelic, args.seed)
+        result = benchmark(spec, settings, args.repeat, args.cache)
+        results.append(result)
+        print(
+            f"{result['case']}: {result['seconds']:.2f}s, {result['records_per_s']:.0f} records/s, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MiB, rows {result['rows']}"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps({'environment': environment(), 'results': results}, indent=2) + '\n')
+    if args.compare:
+        compare(results, args.compare)
+    if args.clear_cache:
+        shutil.rmtree(args.cache, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Sorts an output table by locus before it is written, within a memory budget.
+
+Batches are buffered until they reach the budget, then sorted and spilled to a temporary Arrow IPC
+file (a run). On close, the runs are merged a block at a time: among the current batch of every
+run, the smallest last key is the frontier, every row up to the frontier is final and is emitted
+sorted, and the rest waits for the next round. A table that fits in the budget is sorted in
+memory without spilling.
+
+The tables of a work unit share one `SortBudget`: when their buffers add up to it, the largest
+buffer is spilled, so the budget is divided between the tables by the size of their rows.
+
+Rows are ordered by chromosome, start and locus key (`locus_hash` or `locus_key`). Chromosomes
+compare as strings, like the Parquet statistics that are pruned on.
+"""
+
+import tempfile
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cumulus_genomic_pipeline.parquet_writer import LOCUS_COLUMNS, TableWriter
+
+SORT_COLUMNS = ('chromosome', 'start')
+
+
+class SortBudget:
+    """
+    The sort memory of one work unit, shared by the `SortedWriter` of each of its tables. Each
+    writer runs in its own writer thread and reports the bytes it buffers. When the buffers add
+    up to `memory_bytes`, the largest one is spilled: right away when its writer is the one
+    reporting, else when that writer takes its next batch.
+    """
+
+    def __init__(self, memory_bytes: int):
+        self.memory_bytes = memory_bytes
+        self.lock = threading.Lock()
+        self.buffered: dict[int, int] = {}
+        self.requested: set[int] = set()
+
+    def should_spill(self, writer: 'SortedWriter', buffered_bytes: int) -> bool:
+        """
+        Records the bytes `writer` buffers, and returns whether it should spill them now.
+        """
+        key = id(writer)
+        with self.lock:
+            self.buffered[key] = buffered_bytes
+            if not buffered_bytes:
+                self.requested.discard(key)
+                return False
+            if key not in self.requested and sum(self.buffered.values()) < self.memory_bytes:
+                return False
+            largest = max(self.buffered, key=self.buffered.__getitem__)
+            if key in self.requested or largest == key:
+                self.requested.discard(key)
+                return True
+            self.requested.add(largest)
+            return False
+
+
+class SortedWriter:
+    """
+    Writes the rows of one table to a `TableWriter` (or `DatasetWriter`) in locus order.
+
+    Output batches have as many rows as the largest input batch, so the row groups of writers
+    without a byte target keep their size. Spilled runs go to a temporary directory under
+    `spill_dir`, removed on close.
+    """
+
+    def __init__(self, writer: TableWriter, budget: SortBudget | int, spill_dir: str | None = None):
+        self.writer = writer
+        self.schema = writer.schema
+        self.keys = [*SORT_COLUMNS, *(column for column in LOCUS_COLUMNS if column in self.schema.names)]
+        # A byte count is a budget of this writer's own.
+        self.budget = budget if isinstance(budget, SortBudget) else SortBudget(budget)
+        self.spill_dir = spill_dir
+        self.buffer: list[pa.RecordBatch] = []
+        self.buffered_bytes = 0
+        self.runs: list[Path] = []
+        self.batch_rows = 1
+        self.pending: list[pa.Table] = []
+        self._tmp: tempfile.TemporaryDirectory | None = None
+
+    @property
+    def files(self) -> list[Path]:
+        return self.writer.files
+
+    def write(self, batch: pa.RecordBatch):
+        self.batch_rows = max(self.batch_rows, batch.num_rows)
+        self.buffer.append(batch)
+        self.buffered_bytes += batch.nbytes
+        if self.budget.should_spill(self, self.buffered_bytes):
+            self._spill()
+
+    def drain(self):
+        """
+        Spills the buffered rows as a sorted run now, to free their memory.
+        """
+        if self.buffer:
+            self._spill()
+
+    def close(self):
+        try:
+            if self.runs:
+                if self.buffer:
+                    self._spill()
+                self._merge()
+            elif self.buffer:
+                self._emit(self._sort(pa.Table.from_batches(self.buffer, schema=self.schema)))
+            self._emit_pending(final=True)
+            self.writer.close()
+        finally:
+            self._cleanup()
+
+    def __enter__(self) -> 'SortedWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.close()
+        else:
+            self._cleanup()
+            self.writer.__exit__(exc_type, exc, tb)
+
+    def _sort(self, table: pa.Table) -> pa.Table:
+        keys = pa.table(_decoded(table, self.keys), names=self.keys)
+        return table.take(pc.sort_indices(keys, sort_keys=[(key, 'ascending') for key in self.keys]))
+
+    def _spill(self):
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix='.sort-', dir=self.spill_dir)
+        # One chunk, so every batch of the run shares the same dictionaries (the IPC file format
+        # does not allow replacing them between batches).
+        table = self._sort(pa.Table.from_batches(self.buffer, schema=self.schema)).combine_chunks()
+        path = Path(self._tmp.name) / f'run-{len(self.runs):05d}.arrow'
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, self.schema) as run:
+            run.write_table(table, max_chunksize=self.batch_rows)
+        self.runs.append(path)
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.budget.should_spill(self, 0)
+
+    def _merge(self):
+        cursors = [_RunCursor(path, self.keys) for path in self.runs]
+        live = [cursor for cursor in cursors if cursor.advance()]
+        while live:
+            frontier = min(cursor.last_key() for cursor in live)
+            pieces = [cursor.take_through(frontier) for cursor in live]
+            self._emit(self._sort(pa.concat_tables(pieces)))
+            live = [cursor for cursor in live if cursor.advance()]
+
+    def _emit(self, table: pa.Table):
+        self.pending.append(table)
+        self._emit_pending()
+
+    def _emit_pending(self, final: bool = False):
+        if not self.pending:
+            return
+        table = pa.concat_tables(self.pending)
+        offset = 0
+        while table.num_rows - offset >= self.batch_rows or (final and offset < table.num_rows):
+            for batch in table.slice(offset, self.batch_rows).combine_chunks().to_batches():
+                self.writer.write(batch)
+            offset += self.batch_rows
+        rest = table.slice(offset)
+        self.pending = [rest] if rest.num_rows else []
+
+    def _cleanup(self):
+        # The rows are written or dropped: they no longer take a share of the budget.
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.budget.should_spill(self, 0)
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+
+class _RunCursor:
+    """
+    Reads a sorted run one batch at a time and hands it out up to a frontier key.
+    """
+
+    def __init__(self, path: Path, keys: list[str]):
+        self.reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        self.keys = keys
+        self.next_batch = 0
+        self.current: pa.Table | None = None
+
+    def advance(self) -> bool:
+        """
+        Loads the next batch once the current one is used up. Returns False when the run is exhausted.
+        """
+        while self.current is None or self.current.num_rows == 0:
+            if self.next_batch == self.reader.num_record_batches:
+                return False
+            self.current = pa.Table.from_batches([self.reader.get_batch(self.next_batch)])
+            self.next_batch += 1
+        return True
+
+    def last_key(self) -> tuple:
+        return tuple(column[-1].as_py() for column in _decoded(self.current, self.keys))
+
+    def take_through(self, frontier: tuple) -> pa.Table:
+        """
+        Removes and returns the rows of the current batch with keys up to `frontier`.
+        """
+        columns = _decoded(self.current, self.keys)
+        # Lexicographic key <= frontier, built from the last key outwards.
+        mask = pc.less_equal(columns[-1], frontier[-1])
+        for column, value in zip(reversed(columns[:-1]), reversed(frontier[:-1])):
+            mask = pc.or_(pc.less(column, value), pc.and_(pc.equal(column, value), mask))
+        # The batch is sorted, so the matching rows are a prefix.
+        n = pc.sum(mask).as_py() or 0
+        head, self.current = self.current.slice(0, n), self.current.slice(n)
+        return head
+
+
+def _decoded(table: pa.Table, keys: list[str]) -> list[pa.Array]:
+    # Key columns as plain arrays; the compact schema profile stores chromosome as a dictionary.
+    columns = []
+    for key in keys:
+        column = table.column(key).combine_chunks()
+        columns.append(column.dictionary_decode() if pa.types.is_dictionary(column.type) else column)
+    return columns
@@ -0,0 +1,168 @@
+"""
+Persistent set of the loci whose variant and consequence rows are already in the output.
+
+With locus deduplication, a locus gets variant and consequence rows only from the first work unit
+that sees it; later units (other cases, later runs) only write its occurrences. The store lives in
+`locus_store/` in the output directory:
+
+    - keys.npy / owners.npy: The sorted keys of every materialized locus and the unit that wrote
+      it, memory-mapped when read.
+    - delta-case-<id>.part-<n>.npy: The keys first materialized by one finished unit, not yet
+      merged into keys.npy. Units write their own delta file, so parallel workers never write
+      the same file; `compact` merges them after the run.
+
+Keys are the int64 `locus_key`, or the first 16 bytes of the SHA-256 `locus_hash`. Lookups are a
+binary search per block of records, so a locus costs the same whether it is common or rare.
+
+A unit that runs again does not count the loci it wrote itself as known, so rerunning it writes
+the same rows again. A rerun whose input changed may drop loci that other units rely on, so
+`process_inputs` then resets the store and runs every unit again. Loci first seen at the same time by two units running in parallel are
+written by both.
+"""
+
+import logging
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from cumulus_genomic_pipeline.radiant.vcf.common import Common
+from cumulus_genomic_pipeline.radiant.vcf.locus_key import SHA256
+
+STORE_DIR = 'locus_store'
+_DELTA = re.compile(r'delta-case-(\d+)\.part-(\d+)\.npy')
+
+
+def unit_owner(case_id: int, part: int) -> int:
+    return case_id << 24 | part
+
+
+def locus_keys(commons: list[Common], mode: str) -> np.ndarray:
+    """
+    Returns the store keys of a block of records, whose locus keys are already assigned.
+    """
+    if mode == SHA256:
+        return np.array([bytes.fromhex(common.locus_hash[:32]) for common in commons], dtype='S16')
+    return np.array([common.locus_key for common in commons], dtype=np.int64)
+
+
+class LocusStore:
+    """
+    The store directory. Opened once per run in the main process, and per unit in the workers.
+    """
+
+    def __init__(self, output_dir: str):
+        self.path = Path(output_dir) / STORE_DIR
+
+    def reset(self):
+        for file in self.path.glob('*.npy'):
+            file.unlink()
+
+    def open(self, case_id: int, part: int) -> 'UnitLoci':
+        """
+        Returns the loci known to the unit (case_id, part): the merged keys and every delta but its own.
+        """
+        owner = unit_owner(case_id, part)
+        keys = owners = None
+        if (self.path / 'keys.npy').exists():
+            keys = np.load(self.path / 'keys.npy', mmap_mode='r')
+            owners = np.load(self.path / 'owners.npy', mmap_mode='r')
+        deltas = [
+            np.load(file) for file, delta_owner in self._deltas() if delta_owner != owner
+        ]
+        recent = np.unique(np.concatenate(deltas)) if deltas else None
+        return UnitLoci(self.path / f'delta-case-{case_id}.part-{part:05d}.npy', owner, keys, owners, recent)
+
+    def compact(self):
+        """
+        Merges the delta files into keys.npy and owners.npy. Run when no unit is in flight.
+        """
+        deltas = self._deltas()
+        if not deltas:
+            return
+        keys, owners = [], []
+        if (self.path / 'keys.npy').exists():
+            keys.append(np.load(self.path / 'keys.npy'))
+            owners.append(np.load(self.path / 'owners.npy'))
+        for file, owner in deltas:
+            delta = np.load(file)
+            keys.append(delta)
+            owners.append(np.full(len(delta), owner, dtype=np.int64))
+        # Stable, so a locus keeps the owner it had first.
+        all_keys = np.concatenate(keys)
+        order = np.argsort(all_keys, kind='stable')
+        merged, first = np.unique(all_keys[order], return_index=True)
+        _save(self.path / 'keys.npy', merged)
+        _save(self.path / 'owners.npy', np.concatenate(owners)[order][first])
+        for file, _ in deltas:
+            file.unlink()
+        logging.info(f'Locus store {self.path} holds {len(merged)} loci')
+
+    def _deltas(self) -> list[tuple[Path, int]]:
+        deltas = []
+        for file in sorted(self.path.glob('delta-*.npy')):
+            match = _DELTA.fullmatch(file.name)
+            if match:
+                deltas.append((file, unit_owner(int(match[1]), int(match[2]))))
+        return deltas
+
+
+class UnitLoci:
+    """
+    The known loci of one unit, and the ones it materializes itself.
+    """
+
+    def __init__(
+            self, delta_path: Path, owner: int, keys: np.ndarray | None, owners: np.ndarray | None,
+            recent: np.ndarray | None
+        ):
+        self.delta_path = delta_path
+        self.owner = owner
+        self.keys = keys
+        self.owners = owners
+        self.recent = recent
+        self.new: np.ndarray | None = None
+
+    def claim(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Returns, per record, whether its variant and consequence rows are written: True for the first
+        record of each locus that is not known yet. Those loci become known.
+        """
+        known = np.zeros(len(keys), dtype=bool)
+        if self.keys is not None:
+            found, positions = _find(self.keys, keys)
+            known |= found & (np.asarray(self.owners[positions]) != self.owner)
+        for sorted_keys in (self.recent, self.new):
+            if sorted_keys is not None:
+                known |= _find(sorted_keys, keys)[0]
+        # Only the first record of a locus repeated within the block.
+        first = np.zeros(len(keys), dtype=bool)
+        first[np.unique(keys, return_index=True)[1]] = True
+        claimed = first & ~known
+        if claimed.any():
+            self.new = np.sort(keys[claimed]) if self.new is None else np.union1d(self.new, keys[claimed])
+        return claimed
+
+    def save(self):
+        """
+        Writes the unit's delta file, once its output is committed.
+        """
+        self.delta_path.parent.mkdir(exist_ok=True)
+        if self.new is None:
+            self.delta_path.unlink(missing_ok=True)
+            return
+        _save(self.delta_path, self.new)
+
+
+def _find(sorted_keys: np.ndarray, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.intp)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.asarray(sorted_keys[positions]) == keys, positions
+
+
+def _save(path: Path, array: np.ndarray):
+    tmp = path.with_name(f'.{path.name}.tmp.npy')
+    np.save(tmp, array)
+    os.replace(tmp, path)
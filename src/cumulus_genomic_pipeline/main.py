@@ -5,16 +5,66 @@ import logging
 from pathlib import Path
 
 from cumulus_genomic_pipeline.process_args import validate
-from cumulus_genomic_pipeline.process_vcf import process_inputs
 
 def main():
     parser = argparse.ArgumentParser(description="Process multiple files with Docker")    
-    parser.add_argument('-i', '--vcf', action='append', required=True,
+    parser.add_argument('-i', '--vcf', action='append',
                        help='Input file paths (specify multiple times)')
+    parser.add_argument('-m', '--manifest',
+                       help='File listing input VCF paths, one per line')
+    parser.add_argument('-c', '--case', dest='cases', action='append',
+                       help='JSON case definition (a case or a list of cases); only its samples are read from its VCF')
     parser.add_argument('-o', '--output_dir', required=True,
                        help='Output directory path')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='Verbose output')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                       help='Number of worker processes')
+    parser.add_argument('--shard', action='store_true',
+                       help='Split each bgzipped VCF into region shards using its index (built if missing)')
+    parser.add_argument('--shard-size', dest='shard_size', type=int, default=None,
+                       help='Shard length in base pairs (default: one shard per contig)')
+    parser.add_argument('--schema-profile', dest='schema_profile', choices=['default', 'compact'], default='default',
+                       help='Output column types; compact dictionary encodes low-cardinality string columns')
+    parser.add_argument('--locus-key', dest='locus_key', choices=['sha256', 'blake2b', 'packed'], default='sha256',
+                       help='Locus join key: SHA-256 hex locus_hash, or an int64 locus_key (hashed or bit-packed)')
+    parser.add_argument('--writer-profile', dest='writer_profile', choices=['default', 'scan', 'archive'],
+                       default='default',
+                       help='Parquet options: pyarrow defaults, scan (zstd, page index, Bloom filters) or archive (zstd 9)')
+    parser.add_argument('--row-group-mb', dest='row_group_mb', type=int, default=None,
+                       help='Target row group size in MiB, overriding the writer profile')
+    parser.add_argument('--output-layout', dest='output_layout', choices=['flat', 'hive'], default='flat',
+                       help='Write one file per table (and shard), or datasets partitioned by case_id and chromosome')
+    parser.add_argument('--sort', action='store_true',
+                       help='Sort every output table by chromosome, start and locus key')
+    parser.add_argument('--sort-memory-mb', dest='sort_memory_mb', type=int, default=256,
+                       help='Rows held in memory while sorting a VCF or shard, in MiB, shared by its tables; more are spilled to disk')
+    parser.add_argument('--force', action='store_true',
+                       help='Process every input again, even the work units the output manifest lists as done')
+    parser.add_argument('--dedupe-loci', dest='dedupe_loci', action='store_true',
+                       help='Write variant and consequence rows once per locus across cases and runs; occurrences are kept')
+    parser.add_argument('--flush-mb', dest='flush_mb', type=int, default=64,
+                       help='Estimated size of the buffered rows of a VCF or shard at which they are flushed to the writers')
+    parser.add_argument('--memory-budget-mb', dest='memory_budget_mb', type=int, default=None,
+                       help='Flushed rows not yet written, summed over all workers; processing waits above it')
+    parser.add_argument('--metrics-dir', dest='metrics_dir', default=None,
+                       help='Directory for metrics.json and metrics.prom (Prometheus text format); default: the output directory')
+    parser.add_argument('--metrics-interval', dest='metrics_interval', type=float, default=None,
+                       help='Also write the metrics every this many seconds while the run goes on')
+    parser.add_argument('--sparse-occurrences', dest='sparse_occurrences', action='store_true',
+                       help='Write occurrence rows only for samples carrying the allele (and the parents of carrying progenies)')
+    parser.add_argument('--sparse-min-dp', dest='sparse_min_dp', type=int, default=None,
+                       help='With --sparse-occurrences, also keep rows with at least this DP (and --sparse-min-gq, if set)')
+    parser.add_argument('--sparse-min-gq', dest='sparse_min_gq', type=int, default=None,
+                       help='With --sparse-occurrences, also keep rows with at least this GQ (and --sparse-min-dp, if set)')
+    parser.add_argument('--ped', dest='ped_file', default=None,
+                       help='PED file giving the sex, affected status and trios of the samples of VCFs given without a case')
+    parser.add_argument('--site-table', dest='site_table', action='store_true',
+                       help='Write QUAL, FILTER and INFO once per record to a sites table; occurrences keep the sample columns')
+    parser.add_argument('--trace', dest='trace_file', default=None,
+                       help='Write JSON lines trace events of the record loop to this file (rewritten every run)')
+    parser.add_argument('--trace-every', dest='trace_every', type=int, default=1000,
+                       help='With --trace, trace one record in this many (1: every record)')
     args = parser.parse_args()
     
     if args.verbose:
@@ -23,6 +73,9 @@ def main():
     inputs = validate(args)
     if inputs.valid:
         logging.info('Valid CLI args. Processing VCFs...')
+        # Imported once the args are valid: pyarrow, cyvcf2 and numpy are most of the start time,
+        # and --help or a bad invocation has no use for them.
+        from cumulus_genomic_pipeline.process_vcf import process_inputs
         process_inputs(inputs)
         logging.info('Done processing. Exiting...')
         sys.exit(0)
@@ -0,0 +1,212 @@
+"""
+The run manifest: which work units of which inputs are already in the output directory.
+
+`manifest.json` in the output directory records, per input VCF, its SHA-256 checksum and case id
+(case definitions have an entry each, keyed "<vcf path>#<case id>", with a checksum of the
+definition) and, per finished work unit (the whole file or one shard), the Parquet files it committed and
+its record count. It also records the pipeline version and the settings that shape the output.
+A rerun with the same version and settings skips the units whose input is unchanged, so an
+interrupted run resumes at the first unfinished shard and unchanged inputs are not processed
+again. Any version or settings change starts a new manifest.
+
+Units only commit whole: their files are written under temporary names and renamed when the
+unit finishes, and the manifest is updated after that (itself written to a temporary file and
+renamed). A unit interrupted halfway leaves no rows behind and is rerun from its start.
+
+Checksums are cached with the file size and modification time, so unchanged inputs are not read
+again to check them.
+
+When an input's entry is reset (its checksum, case or the settings changed), the files its units
+had committed are recorded as superseded, in the manifest too. Once a run's units are all
+committed, the superseded files that no unit wrote again are deleted, e.g. the higher parts of
+an input that is now split into fewer shards.
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from cumulus_genomic_pipeline.scheduler import WorkUnit
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+_CHUNK = 1 << 20
+
+
+def pipeline_version() -> str:
+    try:
+        return importlib.metadata.version('cumulus-genomic-pipeline')
+    except importlib.metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
+class UnitOutput:
+    """
+    What a finished work unit committed.
+
+    Attributes:
+        records (int): VCF records read.
+        files (list[str]): Parquet files written, relative to the output directory.
+        metrics (dict | None): The unit's stage metrics (see `StageTimer.snapshot`). Not kept in the manifest.
+        locus_keys (tuple | None): The distinct int64 (keys, checks) of the unit's loci (see
+            `CollisionCheck.pairs`), for the run's collision check. None with sha256 keys. Not kept in the manifest.
+    """
+
+    records: int = 0
+    files: list[str] = field(default_factory=list)
+    metrics: dict | None = None
+    locus_keys: tuple | None = None
+
+
+class RunManifest:
+    """
+    The manifest of one output directory, see the module docstring.
+    """
+
+    def __init__(self, output_dir: str, settings: dict):
+        self.path = Path(output_dir) / MANIFEST
+        self.settings = settings
+        self.version = pipeline_version()
+        self.inputs: dict[str, dict] = {}
+        self.superseded: set[str] = set()
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            manifest = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logging.warning(f'Ignoring unreadable manifest {self.path}: {e}')
+            return
+        if manifest.get('manifest_version') == MANIFEST_VERSION:
+            self.superseded = set(manifest.get('superseded', []))
+        if (manifest.get('manifest_version'), manifest.get('pipeline_version'), manifest.get('settings')) != (
+            MANIFEST_VERSION, self.version, self.settings
+        ):
+            logging.info(f'Pipeline version or settings changed since {self.path} was written. Processing all inputs.')
+            if manifest.get('manifest_version') == MANIFEST_VERSION:
+                for entry in manifest.get('inputs', {}).values():
+                    self._supersede(entry)
+            return
+        self.inputs = manifest.get('inputs', {})
+
+    def checksum(self, vcf_path: str, key: str | None = None) -> str:
+        """
+        Returns the checksum of an input, from the manifest when its size and modification time are unchanged.
+        """
+        stat = os.stat(vcf_path)
+        entry = self.inputs.get(key or vcf_path)
+        if entry and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return entry['checksum']
+        return file_checksum(vcf_path)
+
+    def committed(self, unit: WorkUnit) -> bool:
+        """
+        Whether an earlier run committed the unit. Asked before `pending`, which resets changed inputs.
+        """
+        entry = self.inputs.get(_input_key(unit))
+        return entry is not None and _part(unit) in entry['units']
+
+    def pending(self, units: list[WorkUnit], force: bool = False) -> list[WorkUnit]:
+        """
+        Returns the units that still have to run, in their original order, and resets the entries of
+        inputs whose checksum or case id changed. With `force`, every unit runs again.
+        """
+        # Cases selected from one joint-called VCF share its checksum.
+        checksums: dict[str, str] = {}
+        for key, unit in {_input_key(unit): unit for unit in units}.items():
+            stat = os.stat(unit.vcf_path)
+            checksum = checksums.get(unit.vcf_path) or self.checksum(unit.vcf_path, key)
+            checksums[unit.vcf_path] = checksum
+            case = _case_checksum(unit)
+            entry = self.inputs.get(key)
+            if (
+                force or not entry
+                or (entry['checksum'], entry['case_id'], entry.get('case')) != (checksum, unit.case_id, case)
+            ):
+                if entry:
+                    self._supersede(entry)
+                entry = {'checksum': checksum, 'case_id': unit.case_id, 'units': {}}
+                if case is not None:
+                    entry['case'] = case
+            entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            self.inputs[key] = entry
+        pending = [unit for unit in units if _part(unit) not in self.inputs[_input_key(unit)]['units']]
+        if len(pending) < len(units):
+            logging.info(f'{len(units) - len(pending)} of {len(units)} work units already done according to {self.path}')
+        return pending
+
+    def commit(self, unit: WorkUnit, output: UnitOutput):
+        """
+        Records a finished unit and rewrites the manifest.
+        """
+        self.inputs[_input_key(unit)]['units'][_part(unit)] = {
+            'region': unit.shard.region if unit.shard else None,
+            'records': output.records,
+            'files': output.files,
+        }
+        self.save()
+
+    def remove_superseded(self):
+        """
+        Deletes the superseded files that no unit wrote again. Run once every unit of the run is committed.
+        """
+        if not self.superseded:
+            return
+        current = {file for entry in self.inputs.values() for unit in entry['units'].values() for file in unit['files']}
+        stale = self.superseded - current
+        for file in stale:
+            (self.path.parent / file).unlink(missing_ok=True)
+        if stale:
+            logging.info(f'Removed {len(stale)} files of earlier runs that this run did not write again')
+        self.superseded = set()
+        self.save()
+
+    def save(self):
+        manifest = {
+            'manifest_version': MANIFEST_VERSION,
+            'pipeline_version': self.version,
+            'settings': self.settings,
+            'inputs': self.inputs,
+            'superseded': sorted(self.superseded),
+        }
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, self.path)
+
+
+    def _supersede(self, entry: dict):
+        for unit in entry.get('units', {}).values():
+            self.superseded.update(unit.get('files', []))
+
+
+def _input_key(unit: WorkUnit) -> str:
+    return f'{unit.vcf_path}#{unit.case_id}' if unit.case is not None else unit.vcf_path
+
+
+def _case_checksum(unit: WorkUnit) -> str | None:
+    # A changed case definition (e.g. its samples) changes the rows of the case.
+    if unit.case is None:
+        return None
+    # Compact JSON, as pydantic wrote it when cases were models, so existing manifests stay valid.
+    case_json = json.dumps(asdict(unit.case), separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(case_json.encode()).hexdigest()
+
+
+def _part(unit: WorkUnit) -> str:
+    # JSON object keys are strings.
+    return str(unit.shard.part if unit.shard else 0)
@@ -0,0 +1,142 @@
+"""
+Memory accounting for the rows a work unit holds before they are written.
+
+Two layers:
+    - `TableEstimate`: Estimates the Arrow bytes of the rows buffered for one table, from a
+      per-unit rate (bytes per record, or per byte of CSQ) learned from the batches already
+      flushed. `_process_vcf` flushes its blocks when the estimate of all tables passes the
+      flush threshold, instead of only every `BATCH_SIZE` records.
+    - `MemoryBudget`: A byte budget shared by every worker process. Flushed batches are charged
+      to it until their writer has written them out, including while they wait in the writer's
+      row group or sort buffer. A transform that would go over the budget first has its own
+      writers drain their buffers, then waits for writers (of any worker) to catch up. Since every
+      waiting worker drains its writers, the buffers cannot hold the budget up for good. The
+      pool's worker processes receive the budget through `install`.
+"""
+
+import multiprocessing
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from cumulus_genomic_pipeline.pipeline import Cancelled
+
+# Seconds between checks for cancellation while waiting for budget.
+_POLL = 0.1
+_budget: 'MemoryBudget | None' = None
+
+
+@dataclass(slots=True)
+class TableEstimate:
+    """
+    Estimated bytes of the rows buffered for one table.
+
+    Attributes:
+        rate (float): Bytes per unit, replaced by the measured rate at every flush.
+        units (int): Units added since the last flush.
+    """
+
+    rate: float
+    units: int = 0
+
+    @property
+    def bytes(self) -> int:
+        return int(self.units * self.rate)
+
+    def flushed(self, nbytes: int):
+        if self.units:
+            self.rate = nbytes / self.units
+        self.units = 0
+
+
+class MemoryBudget:
+    """
+    A byte budget shared between processes. Create it before starting the worker pool.
+
+    A charge larger than the whole budget is let through once nothing else is charged, so a
+    single oversized batch slows the run down instead of blocking it.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = multiprocessing.Value('q', 0, lock=False)
+        self.condition = multiprocessing.Condition()
+
+    def try_acquire(self, nbytes: int) -> bool:
+        """
+        Charges `nbytes` if that does not go over the budget, without waiting. Returns whether it did.
+        """
+        with self.condition:
+            if self.used.value and self.used.value + nbytes > self.limit:
+                return False
+            self.used.value += nbytes
+            return True
+
+    def acquire(self, nbytes: int, cancelled: threading.Event | None = None):
+        with self.condition:
+            while self.used.value and self.used.value + nbytes > self.limit:
+                if cancelled is not None and cancelled.is_set():
+                    raise Cancelled()
+                self.condition.wait(_POLL)
+            self.used.value += nbytes
+
+    def release(self, nbytes: int):
+        with self.condition:
+            self.used.value -= nbytes
+            self.condition.notify_all()
+
+
+class MemoryLease:
+    """
+    The share of a `MemoryBudget` held by one work unit, so whatever the unit still holds when it
+    stops (on success or failure) goes back to the budget. Without a budget, it only counts.
+    """
+
+    def __init__(self, budget: MemoryBudget | None):
+        self.budget = budget
+        self.held = 0
+        self.lock = threading.Lock()
+
+    def acquire(
+            self, nbytes: int, cancelled: threading.Event | None = None, on_wait: Callable[[], None] | None = None
+        ):
+        """
+        Charges `nbytes`, waiting for budget. `on_wait` is called first if there is a wait, outside
+        the budget's lock, e.g. to have the unit's own writers free what they hold.
+        """
+        if self.budget is not None and not self.budget.try_acquire(nbytes):
+            if on_wait is not None:
+                on_wait()
+            self.budget.acquire(nbytes, cancelled)
+        with self.lock:
+            self.held += nbytes
+
+    def release(self, nbytes: int):
+        with self.lock:
+            self.held -= nbytes
+        if self.budget is not None:
+            self.budget.release(nbytes)
+
+    def close(self):
+        with self.lock:
+            held, self.held = self.held, 0
+        if held and self.budget is not None:
+            self.budget.release(held)
+
+    def __enter__(self) -> 'MemoryLease':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def install(budget: MemoryBudget | None):
+    """
+    Makes `budget` the budget of this process. The worker pool initializer.
+    """
+    global _budget
+    _budget = budget
+
+
+def current_budget() -> MemoryBudget | None:
+    return _budget
@@ -0,0 +1,248 @@
+"""
+Per-stage wall time and item counts, written as JSON and in the Prometheus text format.
+
+Every work unit has a `StageTimer`, which adds up the wall time, items and timed calls of each
+stage. Stages are timed per batch or block, never per record, so the cost is a few clock reads
+per batch. Each stage is timed from one thread only (the reader, the transform or one table's
+writer), so the totals need no lock.
+
+Stages:
+    - decode: cyvcf2 decoding, in the reader thread. Items are records.
+    - record: `process_common` and buffering each record into the table blocks.
+    - locus_key: Locus keys of a block, the collision check and the locus store lookup.
+    - consequence / variant / occurrence: Flushing each block into its table builder.
+    - arrow: Building the Arrow record batches. Items are rows.
+    - backpressure: Waiting for the memory budget and for the writers to take the batches.
+    - write.<table>: Parquet writes of one table, in its writer thread. Items are rows.
+    - close: Closing the writers (last row groups, merging sorted runs, renaming into place).
+
+A finished unit's totals go back to the main process in its `UnitOutput`. With a reporting
+interval, workers also send snapshots of the unit in flight over the queue given to `install`.
+`RunMetrics` collects both in the main process and writes metrics.json and metrics.prom, with
+totals per stage, per worker process and per input VCF.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+METRICS_JSON = 'metrics.json'
+METRICS_PROM = 'metrics.prom'
+PROMETHEUS_PREFIX = 'cumulus_pipeline'
+
+_reports: 'multiprocessing.Queue | None' = None
+_interval: float | None = None
+
+
+class StageTimer:
+    """
+    The stage totals of one work unit. `stages` maps a stage to [seconds, items, calls].
+    """
+
+    def __init__(self, vcf_path: str, case_id: int, part: int):
+        self.vcf_path = vcf_path
+        self.case_id = case_id
+        self.part = part
+        self.stages: dict[str, list] = {}
+        self.reported = time.perf_counter()
+
+    def add(self, stage: str, start: float, items: int = 0) -> float:
+        """
+        Adds the time since `start` (a `time.perf_counter()` value) to `stage`. Returns the current
+        time, so consecutive stages can chain their start times.
+        """
+        now = time.perf_counter()
+        total = self.stages.get(stage)
+        if total is None:
+            total = self.stages[stage] = [0.0, 0, 0]
+        total[0] += now - start
+        total[1] += items
+        total[2] += 1
+        return now
+
+    def report(self):
+        """
+        Sends a snapshot to the main process when the reporting interval has passed. Called between batches.
+        """
+        if _reports is None:
+            return
+        now = time.perf_counter()
+        if now - self.reported >= _interval:
+            self.reported = now
+            _reports.put(self.snapshot())
+
+    def snapshot(self) -> dict:
+        return {
+            'input': self.vcf_path,
+            'case_id': self.case_id,
+            'part': self.part,
+            'worker': os.getpid(),
+            'stages': {stage: list(total) for stage, total in self.stages.items()},
+        }
+
+
+def install(reports: 'multiprocessing.Queue | None', interval: float | None):
+    """
+    Sets the queue and interval of in-flight snapshots for this process. Part of the worker pool initializer.
+    """
+    global _reports, _interval
+    _reports, _interval = (reports, interval) if reports is not None and interval else (None, None)
+
+
+class RunMetrics:
+    """
+    Collects the unit snapshots of a run in the main process and writes the metrics files.
+
+    Used as a context manager around the run. With an interval, a thread takes the snapshots of
+    units in flight from `queue` and rewrites the files every interval. The files are written
+    once more at the end, if any unit reported, so a run with nothing left to do keeps the
+    metrics of the previous one.
+    """
+
+    def __init__(self, directory: str, interval: float | None = None):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.queue: multiprocessing.Queue | None = multiprocessing.Queue() if interval else None
+        self.units: dict[tuple[str, int, int], dict] = {}
+        self.finished: set[tuple[str, int, int]] = set()
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def __enter__(self) -> 'RunMetrics':
+        if self.queue is not None:
+            self.thread = threading.Thread(target=self._collect, name='metrics', daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.queue.cancel_join_thread()
+            self.queue.close()
+        if self.units:
+            self.write(complete=exc_type is None)
+
+    def add(self, snapshot: dict | None):
+        """
+        Records the final snapshot of a finished unit.
+        """
+        if snapshot is None:
+            return
+        key = (snapshot['input'], snapshot['case_id'], snapshot['part'])
+        with self.lock:
+            self.units[key] = snapshot
+            self.finished.add(key)
+
+    def _collect(self):
+        next_write = time.monotonic() + self.interval
+        while not self.stopped.is_set():
+            try:
+                snapshot = self.queue.get(timeout=max(0.0, min(next_write - time.monotonic(), 0.5)))
+            except queue.Empty:
+                snapshot = None
+            if snapshot is not None:
+                key = (snapshot['input'], snapshot['case_id'], snapshot['part'])
+                with self.lock:
+                    # A snapshot can arrive after the unit's final totals.
+                    if key not in self.finished:
+                        self.units[key] = snapshot
+            if time.monotonic() >= next_write:
+                next_write = time.monotonic() + self.interval
+                try:
+                    self.write(complete=False)
+                except OSError as e:
+                    logging.warning(f'Could not write metrics to {self.directory}: {e}')
+
+    def write(self, complete: bool):
+        with self.lock:
+            units = list(self.units.values())
+            finished = len(self.finished)
+        totals: dict[str, list] = {}
+        workers: dict[str, dict[str, list]] = {}
+        inputs: dict[str, dict[str, list]] = {}
+        series: dict[tuple[str, str, str], list] = {}
+        for unit in units:
+            worker = str(unit['worker'])
+            for stage, (seconds, items, calls) in unit['stages'].items():
+                for total in (
+                    totals.setdefault(stage, [0.0, 0, 0]),
+                    workers.setdefault(worker, {}).setdefault(stage, [0.0, 0, 0]),
+                    inputs.setdefault(unit['input'], {}).setdefault(stage, [0.0, 0, 0]),
+                    series.setdefault((stage, unit['input'], worker), [0.0, 0, 0]),
+                ):
+                    total[0] += seconds
+                    total[1] += items
+                    total[2] += calls
+
+        now = time.time()
+        run = {
+            'started': _timestamp(self.started),
+            'updated': _timestamp(now),
+            'elapsed_seconds': round(now - self.started, 3),
+            'complete': complete,
+            'units_finished': finished,
+            'units_in_flight': len(units) - finished,
+        }
+        document = {
+            'run': run,
+            'stages': _stage_dicts(totals),
+            'workers': {worker: _stage_dicts(stages) for worker, stages in workers.items()},
+            'inputs': {vcf_path: _stage_dicts(stages) for vcf_path, stages in inputs.items()},
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _replace(self.directory / METRICS_JSON, json.dumps(document, indent=2) + '\n')
+        _replace(self.directory / METRICS_PROM, _prometheus(run, series))
+
+
+def _stage_dicts(stages: dict[str, list]) -> dict[str, dict]:
+    return {
+        stage: {'seconds': round(seconds, 6), 'items': items, 'calls': calls}
+        for stage, (seconds, items, calls) in sorted(stages.items())
+    }
+
+
+def _prometheus(run: dict, series: dict[tuple[str, str, str], list]) -> str:
+    lines = []
+    for index, (name, help_text) in enumerate((
+        ('stage_seconds_total', 'Wall time spent in a pipeline stage.'),
+        ('stage_items_total', 'Items processed by a pipeline stage: records, or rows for arrow and write stages.'),
+        ('stage_calls_total', 'Timed batches or blocks of a pipeline stage.'),
+    )):
+        metric = f'{PROMETHEUS_PREFIX}_{name}'
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+        for (stage, vcf_path, worker), total in sorted(series.items()):
+            labels = f'stage="{_label(stage)}",input="{_label(vcf_path)}",worker="{worker}"'
+            lines.append(f'{metric}{{{labels}}} {total[index]}')
+    for name, help_text, value in (
+        ('run_elapsed_seconds', 'Seconds since the run started.', run['elapsed_seconds']),
+        ('run_complete', 'Whether the run has finished without errors.', int(run['complete'])),
+        ('units_finished', 'Work units finished in this run.', run['units_finished']),
+        ('units_in_flight', 'Work units that reported but have not finished.', run['units_in_flight']),
+    ):
+        metric = f'{PROMETHEUS_PREFIX}_{name}'
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} gauge', f'{metric} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec='seconds')
+
+
+def _replace(path: Path, text: str):
+    # Readers (e.g. a node exporter) never see a partly written file.
+    tmp = path.with_name(f'.{path.name}.tmp')
+    tmp.write_text(text)
+    os.replace(tmp, path)
@@ -0,0 +1,246 @@
+"""
+Parquet writer profiles and the per-table writers that apply them.
+
+A profile sets the Parquet encoding options (codec and level, dictionary encoding, statistics,
+page index, Bloom filters on the locus column) and the target row group size in bytes. Row groups
+are sized per table: batches are buffered until their in-memory Arrow size reaches the target and
+then written as one row group, so variants, consequences and occurrences all get row groups of
+about the same size whatever their rows per record.
+
+Tables are written either to one Parquet file (`TableWriter`) or into a dataset directory with
+hive partitions on `case_id` and `chromosome` (`DatasetWriter`). Either way, files are written
+under temporary names and only get their final names when the writer closes without error, so a
+failed or interrupted unit leaves no partial files behind.
+
+Profiles:
+    - default: pyarrow defaults, one row group per batch. The historical output.
+    - scan: ZSTD, statistics, page index and locus Bloom filters, 64 MiB row groups. For files
+      queried in place with DuckDB, which prunes row groups and pages with them.
+    - archive: ZSTD level 9 and 128 MiB row groups, smallest files.
+"""
+
+import inspect
+import logging
+import os
+import shutil
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_WRITER = 'default'
+SCAN_WRITER = 'scan'
+ARCHIVE_WRITER = 'archive'
+MIB = 1024 * 1024
+
+# Bloom filters need pyarrow 22+, above the pyarrow 21 the project pins: with the pinned version,
+# `writer_profile` drops them from the scan profile, with a warning.
+SUPPORTS_BLOOM_FILTERS = 'bloom_filter_options' in inspect.signature(pq.ParquetWriter.__init__).parameters
+_BLOOM_FPP = 0.05
+# Join columns of the locus key modes, see radiant.vcf.locus_key.
+LOCUS_COLUMNS = ('locus_hash', 'locus_key')
+FLAT_LAYOUT = 'flat'
+HIVE_LAYOUT = 'hive'
+OUTPUT_LAYOUTS = (FLAT_LAYOUT, HIVE_LAYOUT)
+PARTITION_COLUMNS = ('case_id', 'chromosome')
+# Target size of the files a dataset writer writes per flush, when the profile sets no row group target.
+DATASET_FILE_BYTES = 64 * MIB
+
+
+@dataclass(frozen=True, slots=True)
+class WriterProfile:
+    """
+    Parquet options shared by the three tables of a run.
+
+    Attributes:
+        compression (str): Parquet codec.
+        compression_level (int | None): Codec level, or None for the codec default.
+        use_dictionary (bool): Dictionary encode columns.
+        write_statistics (bool): Write column min/max statistics.
+        write_page_index (bool): Write the column and offset indexes used for page pruning.
+        bloom_filters (bool): Write a Bloom filter on the locus column.
+        row_group_bytes (int | None): Target in-memory size of a row group, or None for one row group per batch.
+    """
+
+    compression: str = 'snappy'
+    compression_level: int | None = None
+    use_dictionary: bool = True
+    write_statistics: bool = True
+    write_page_index: bool = False
+    bloom_filters: bool = False
+    row_group_bytes: int | None = None
+
+
+WRITER_PROFILES = {
+    DEFAULT_WRITER: WriterProfile(),
+    SCAN_WRITER: WriterProfile(
+        compression='zstd', compression_level=3, write_page_index=True, bloom_filters=True,
+        row_group_bytes=64 * MIB,
+    ),
+    ARCHIVE_WRITER: WriterProfile(compression='zstd', compression_level=9, row_group_bytes=128 * MIB),
+}
+
+
+def writer_profile(name: str = DEFAULT_WRITER, row_group_mb: int | None = None) -> WriterProfile:
+    """
+    Returns the named profile, with its row group target replaced by `row_group_mb` MiB when set.
+    Bloom filters are turned off, with a warning, when pyarrow cannot write them.
+
+    Raises:
+        ValueError: If the profile is not one of `WRITER_PROFILES`.
+    """
+    if name not in WRITER_PROFILES:
+        raise ValueError(f"Unknown writer profile '{name}', expected one of {tuple(WRITER_PROFILES)}")
+    profile = WRITER_PROFILES[name]
+    if profile.bloom_filters and not SUPPORTS_BLOOM_FILTERS:
+        logging.warning(f"pyarrow {pa.__version__} cannot write Bloom filters, the '{name}' profile writes none")
+        profile = replace(profile, bloom_filters=False)
+    if row_group_mb:
+        profile = replace(profile, row_group_bytes=row_group_mb * MIB)
+    return profile
+
+
+class TableWriter:
+    """
+    Writes the batches of one table to a Parquet file with the options of a profile.
+
+    The file is opened with the first row group, whose row count sets the number of distinct
+    values the Bloom filter is sized for. It is written as a hidden temporary file next to `path`
+    and renamed on close. Closing writes any buffered rows, and creates an empty file with the
+    schema when nothing was written.
+    """
+
+    def __init__(self, path: Path, schema: pa.Schema, profile: WriterProfile):
+        self.path = path
+        self.schema = schema
+        self.profile = profile
+        self.writer: pq.ParquetWriter | None = None
+        self.buffer: list[pa.RecordBatch] = []
+        self.buffered_bytes = 0
+        self.files: list[Path] = []
+        self.tmp_path = path.with_name(f'.{path.name}.tmp')
+
+    def write(self, batch: pa.RecordBatch):
+        if self.profile.row_group_bytes is None:
+            self._open(batch.num_rows).write_batch(batch)
+            return
+        self.buffer.append(batch)
+        self.buffered_bytes += batch.nbytes
+        if self.buffered_bytes >= self.profile.row_group_bytes:
+            self._write_buffer()
+
+    def drain(self):
+        """
+        Writes the buffered rows now, as a smaller row group (or files, for a dataset), to free their memory.
+        """
+        if self.buffer:
+            self._write_buffer()
+
+    def close(self):
+        if self.buffer:
+            self._write_buffer()
+        self._open(0).close()
+        os.replace(self.tmp_path, self.path)
+        self.files.append(self.path)
+
+    def __enter__(self) -> 'TableWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.close()
+        elif self.writer is not None:
+            self.writer.close()
+            self.tmp_path.unlink(missing_ok=True)
+
+    def _write_buffer(self):
+        table = pa.Table.from_batches(self.buffer, schema=self.schema)
+        self._open(table.num_rows).write_table(table, row_group_size=table.num_rows)
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def _open(self, rows: int) -> pq.ParquetWriter:
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema, **_parquet_options(self.profile, self.schema, rows))
+        return self.writer
+
+
+class DatasetWriter(TableWriter):
+    """
+    Writes the batches of one table into a dataset directory with hive partitions on
+    `PARTITION_COLUMNS`, e.g. `variants/case_id=1/chromosome=11/`.
+
+    Every flush of the buffer writes one file per partition it covers, named after `name` and
+    a flush counter, so work units with distinct names never write the same file and several
+    workers can write into one dataset at once. Existing files with other names are left in
+    place: runs add partitions (or files to them) without rewriting the others, while files of
+    an earlier run of the same unit are replaced. A unit that has no rows writes no files.
+
+    Files are written into a hidden staging directory and moved into the dataset on close. Only
+    then are the files of an earlier run of the unit that the new run did not overwrite removed,
+    so a failed run keeps the unit's earlier files.
+    """
+
+    def __init__(self, base_dir: Path, schema: pa.Schema, profile: WriterProfile, name: str):
+        super().__init__(base_dir, schema, replace(profile, row_group_bytes=profile.row_group_bytes or DATASET_FILE_BYTES))
+        # Imported here: only the hive layout needs pyarrow.dataset, and it adds to every start.
+        import pyarrow.dataset as ds
+
+        self.name = name
+        self.flushes = 0
+        self.partitioning = ds.partitioning(
+            pa.schema([schema.field(column) for column in PARTITION_COLUMNS]), flavor='hive'
+        )
+        self.staging = base_dir / f'.staging-{name}'
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def close(self):
+        if self.buffer:
+            self._write_buffer()
+        for staged in sorted(self.staging.rglob('*.parquet')):
+            target = self.path / staged.relative_to(self.staging)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, target)
+            self.files.append(target)
+        shutil.rmtree(self.staging, ignore_errors=True)
+        written = set(self.files)
+        for stale in self.path.glob(f'*/*/{self.name}.*.parquet'):
+            if stale not in written:
+                stale.unlink()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.close()
+        else:
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+    def _write_buffer(self):
+        import pyarrow.dataset as ds
+
+        table = pa.Table.from_batches(self.buffer, schema=self.schema)
+        options = _parquet_options(self.profile, self.schema, table.num_rows)
+        ds.write_dataset(
+            table, self.staging, format='parquet', partitioning=self.partitioning,
+            basename_template=f'{self.name}.{self.flushes:05d}-{{i}}.parquet',
+            file_options=ds.ParquetFileFormat().make_write_options(**options),
+            existing_data_behavior='overwrite_or_ignore', preserve_order=True,
+        )
+        self.flushes += 1
+        self.buffer = []
+        self.buffered_bytes = 0
+
+
+def _parquet_options(profile: WriterProfile, schema: pa.Schema, rows: int) -> dict:
+    # Keyword arguments shared by ParquetWriter and ParquetFileFormat.make_write_options.
+    options = dict(
+        compression=profile.compression, compression_level=profile.compression_level,
+        use_dictionary=profile.use_dictionary, write_statistics=profile.write_statistics,
+        write_page_index=profile.write_page_index,
+    )
+    # `writer_profile` has already warned when pyarrow cannot write them.
+    if profile.bloom_filters and SUPPORTS_BLOOM_FILTERS:
+        options['bloom_filter_options'] = {
+            column: {'ndv': max(rows, 1), 'fpp': _BLOOM_FPP} for column in LOCUS_COLUMNS if column in schema.names
+        }
+    return options
@@ -0,0 +1,120 @@
+"""
+Threaded stages for processing one work unit as a stream.
+
+A work unit runs as a reader thread (VCF decoding and decompression), the transform in the
+calling thread (Python record processing) and one writer thread per output table (Parquet
+encoding and compression, which release the GIL). Stages are connected by bounded channels, so
+a slow stage holds the others back instead of letting batches pile up in memory.
+
+Items carry sequence numbers. Each channel has a single producer and is FIFO, so order is
+preserved by construction; consumers check the numbers to make that explicit.
+"""
+
+import logging
+import queue
+import threading
+from collections.abc import Callable, Iterator
+
+QUEUE_DEPTH = 2
+# Seconds between checks for cancellation while blocked on a channel.
+_POLL = 0.1
+_DONE = object()
+
+
+class Cancelled(Exception):
+    """
+    Raised in a stage blocked on a channel when another stage has failed.
+    """
+
+
+class Channel:
+    """
+    Bounded FIFO of (sequence number, item) pairs between two stages.
+    """
+
+    def __init__(self, cancelled: threading.Event, maxsize: int = QUEUE_DEPTH):
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._cancelled = cancelled
+        self._next = 0
+
+    def put(self, item):
+        self._put((self._next, item))
+        self._next += 1
+
+    def close(self):
+        self._put(_DONE)
+
+    def __iter__(self) -> Iterator:
+        expected = 0
+        while True:
+            entry = self._get()
+            if entry is _DONE:
+                return
+            sequence, item = entry
+            if sequence != expected:
+                raise RuntimeError(f'Out of order batch: expected #{expected}, got #{sequence}')
+            expected += 1
+            yield item
+
+    def _put(self, entry):
+        while True:
+            if self._cancelled.is_set():
+                raise Cancelled()
+            try:
+                self._queue.put(entry, timeout=_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self):
+        while True:
+            if self._cancelled.is_set():
+                raise Cancelled()
+            try:
+                return self._queue.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+
+
+class Pipeline:
+    """
+    Owns the threads and channels of one work unit.
+
+    Used as a context manager around the transform: on exit it waits for every stage, and the
+    first failure (of a thread or of the transform) cancels the other stages and is re-raised.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.threads: list[threading.Thread] = []
+        self.errors: list[BaseException] = []
+
+    def channel(self, maxsize: int = QUEUE_DEPTH) -> Channel:
+        return Channel(self.cancelled, maxsize)
+
+    def start(self, name: str, target: Callable, *args):
+        thread = threading.Thread(target=self._run, args=(target, args), name=name, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def __enter__(self) -> 'Pipeline':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None and not isinstance(exc, Cancelled):
+            self.cancelled.set()
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return False
+
+    def _run(self, target: Callable, args: tuple):
+        try:
+            target(*args)
+        except Cancelled:
+            pass
+        except BaseException as e:
+            logging.debug(f'Stage {threading.current_thread().name} failed: {e!r}')
+            self.errors.append(e)
+            self.cancelled.set()
@@ -1,19 +1,54 @@
 import argparse
 import logging
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from pydantic import BaseModel
+from typing import Literal
 
-class VcfProcessingInput(BaseModel):
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case
+from cumulus_genomic_pipeline.radiant.vcf.pedigree import read_ped
+
+
+# A dataclass rather than a pydantic model: validate() checks every value itself, and the CLI
+# would otherwise pay for importing pydantic on every start.
+@dataclass(slots=True)
+class VcfProcessingInput:
     vcf_files: list[str]
     output_dir: str
     valid: bool
+    workers: int = 1
+    shard: bool = False
+    shard_size: int | None = None
+    schema_profile: Literal['default', 'compact'] = 'default'
+    locus_key: Literal['sha256', 'blake2b', 'packed'] = 'sha256'
+    writer_profile: Literal['default', 'scan', 'archive'] = 'default'
+    row_group_mb: int | None = None
+    output_layout: Literal['flat', 'hive'] = 'flat'
+    sort: bool = False
+    sort_memory_mb: int = 256
+    force: bool = False
+    dedupe_loci: bool = False
+    flush_mb: int = 64
+    memory_budget_mb: int | None = None
+    metrics_dir: str | None = None
+    metrics_interval: float | None = None
+    cases: list[Case] = field(default_factory=list)
+    sparse_occurrences: bool = False
+    sparse_min_dp: int | None = None
+    sparse_min_gq: int | None = None
+    ped_file: str | None = None
+    site_table: bool = False
+    trace_file: str | None = None
+    trace_every: int = 1000
 
 def validate(args: argparse.Namespace) -> VcfProcessingInput:
     logging.info("Validating CLI args...")
     vcf_files: list[str] = []
-    if 'vcf' in args and args.vcf:
-        logging.info(f'Found {len(args.vcf)} vcf args')
-        for vcf_file in args.vcf:
+    candidates: list[str] = list(args.vcf) if 'vcf' in args and args.vcf else []
+    if 'manifest' in args and args.manifest:
+        candidates.extend(_read_manifest(args.manifest))
+    if candidates:
+        logging.info(f'Found {len(candidates)} vcf args')
+        for vcf_file in candidates:
             vcf_path = Path(vcf_file)
             if not vcf_path.exists():
                 logging.warning(f"{vcf_file} does not exist")
@@ -23,9 +58,28 @@ def validate(args: argparse.Namespace) -> VcfProcessingInput:
                 logging.info(f"VCF {vcf_file} exists and is normal file")
                 vcf_files.append(vcf_file)
         logging.info(f"{len(vcf_files)} valid input files found.")
-    else:
-        logging.error('No vcf arg found')
-    valid = len(vcf_files) > 0
+    elif not ('cases' in args and args.cases):
+        logging.error('No vcf arg or manifest entries found')
+
+    cases: list[Case] = []
+    cases_valid = True
+    for case_file in (args.cases if 'cases' in args and args.cases else []):
+        file_cases = _read_cases(case_file)
+        if file_cases is None:
+            cases_valid = False
+            continue
+        for case in file_cases:
+            if not Path(case.vcf_filepath).is_file():
+                logging.error(f"VCF {case.vcf_filepath} of case {case.case_id} does not exist")
+                cases_valid = False
+            else:
+                cases.append(case)
+    # VCFs given without a case definition are numbered in input order.
+    case_ids = list(range(1, len(vcf_files) + 1)) + [case.case_id for case in cases]
+    if len(set(case_ids)) < len(case_ids):
+        logging.error(f"Case ids must be unique, counting the VCFs without a case as 1 to {len(vcf_files)}: {case_ids}")
+        cases_valid = False
+    valid = len(case_ids) > 0 and cases_valid
 
     output_dir = args.output_dir if 'output_dir' in args else ''
     logging.info(f'Validating output dir {output_dir}')
@@ -41,5 +95,119 @@ def validate(args: argparse.Namespace) -> VcfProcessingInput:
         logging.error("No output_dir argument found")
         valid = False
     
-    return VcfProcessingInput(vcf_files=vcf_files, output_dir=output_dir, valid=valid)
+    workers = args.workers if 'workers' in args and args.workers else 1
+    if workers < 1:
+        logging.error(f"Worker count must be at least 1, got {workers}")
+        valid = False
+    shard = args.shard if 'shard' in args else False
+    shard_size = args.shard_size if 'shard_size' in args else None
+    if shard_size is not None and shard_size < 1:
+        logging.error(f"Shard size must be a positive number of base pairs, got {shard_size}")
+        valid = False
+    schema_profile = args.schema_profile if 'schema_profile' in args and args.schema_profile else 'default'
+    locus_key = args.locus_key if 'locus_key' in args and args.locus_key else 'sha256'
+    writer_profile = args.writer_profile if 'writer_profile' in args and args.writer_profile else 'default'
+    row_group_mb = args.row_group_mb if 'row_group_mb' in args else None
+    if row_group_mb is not None and row_group_mb < 1:
+        logging.error(f"Row group size must be a positive number of MiB, got {row_group_mb}")
+        valid = False
+    output_layout = args.output_layout if 'output_layout' in args and args.output_layout else 'flat'
+    sort = args.sort if 'sort' in args else False
+    sort_memory_mb = args.sort_memory_mb if 'sort_memory_mb' in args and args.sort_memory_mb is not None else 256
+    if sort_memory_mb < 1:
+        logging.error(f"Sort memory must be a positive number of MiB, got {sort_memory_mb}")
+        valid = False
+    force = args.force if 'force' in args else False
+    dedupe_loci = args.dedupe_loci if 'dedupe_loci' in args else False
+    flush_mb = args.flush_mb if 'flush_mb' in args and args.flush_mb is not None else 64
+    memory_budget_mb = args.memory_budget_mb if 'memory_budget_mb' in args else None
+    if flush_mb < 1 or (memory_budget_mb is not None and memory_budget_mb < 1):
+        logging.error(f"Flush size and memory budget must be positive numbers of MiB, got {flush_mb} and {memory_budget_mb}")
+        valid = False
+    metrics_dir = args.metrics_dir if 'metrics_dir' in args else None
+    metrics_interval = args.metrics_interval if 'metrics_interval' in args else None
+    if metrics_interval is not None and metrics_interval <= 0:
+        logging.error(f"Metrics interval must be a positive number of seconds, got {metrics_interval}")
+        valid = False
+    sparse_occurrences = args.sparse_occurrences if 'sparse_occurrences' in args else False
+    sparse_min_dp = args.sparse_min_dp if 'sparse_min_dp' in args else None
+    sparse_min_gq = args.sparse_min_gq if 'sparse_min_gq' in args else None
+    if (sparse_min_dp is not None or sparse_min_gq is not None) and not sparse_occurrences:
+        logging.error("DP and GQ gates only apply with sparse occurrences")
+        valid = False
+    if any(gate is not None and gate < 0 for gate in (sparse_min_dp, sparse_min_gq)):
+        logging.error(f"DP and GQ gates cannot be negative, got {sparse_min_dp} and {sparse_min_gq}")
+        valid = False
+    site_table = args.site_table if 'site_table' in args else False
+    trace_file = args.trace_file if 'trace_file' in args else None
+    trace_every = args.trace_every if 'trace_every' in args and args.trace_every is not None else 1000
+    if trace_file is not None and not Path(trace_file).parent.is_dir():
+        logging.error(f"Directory of trace file {trace_file} does not exist")
+        valid = False
+    if trace_every < 1:
+        logging.error(f"Trace sampling must be a positive number of records, got {trace_every}")
+        valid = False
+    ped_file = args.ped_file if 'ped_file' in args else None
+    if ped_file is not None:
+        try:
+            logging.info(f"Found {len(read_ped(ped_file))} individuals in PED file {ped_file}")
+        except (OSError, ValueError) as e:
+            logging.error(f"Cannot read PED file {ped_file}: {e}")
+            valid = False
+
+    return VcfProcessingInput(
+        vcf_files=vcf_files, output_dir=output_dir, valid=valid,
+        workers=workers, shard=shard, shard_size=shard_size,
+        schema_profile=schema_profile, locus_key=locus_key,
+        writer_profile=writer_profile, row_group_mb=row_group_mb, output_layout=output_layout,
+        sort=sort, sort_memory_mb=sort_memory_mb, force=force,
+        dedupe_loci=dedupe_loci, flush_mb=flush_mb, memory_budget_mb=memory_budget_mb, metrics_dir=metrics_dir,
+        metrics_interval=metrics_interval, cases=cases, sparse_occurrences=sparse_occurrences,
+        sparse_min_dp=sparse_min_dp, sparse_min_gq=sparse_min_gq, ped_file=ped_file,
+        site_table=site_table, trace_file=trace_file, trace_every=trace_every
+    )
+
+
+
+def _read_manifest(manifest: str) -> list[str]:
+    """
+    Reads a manifest of VCF paths, one per line. Blank lines and lines starting with '#' are
+    skipped, and relative paths are resolved against the manifest's directory.
+    """
+    manifest_path = Path(manifest)
+    if not manifest_path.is_file():
+        logging.warning(f"Manifest {manifest} does not exist")
+        return []
+    vcf_files = []
+    for line in manifest_path.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            vcf_path = Path(line)
+            vcf_files.append(str(vcf_path if vcf_path.is_absolute() else manifest_path.parent / vcf_path))
+    logging.info(f'Found {len(vcf_files)} entries in manifest {manifest}')
+    return vcf_files
+
+
+def _read_cases(case_file: str) -> list[Case] | None:
+    """
+    Reads a case definition file: a JSON `Case` or a list of them. Relative VCF and index paths are
+    resolved against the file's directory. Returns None, after logging why, if the file is unusable.
+    """
+    # Only case definitions need pydantic, so it is imported here rather than on every start.
+    from pydantic import TypeAdapter, ValidationError
 
+    case_path = Path(case_file)
+    try:
+        loaded = TypeAdapter(Case | list[Case]).validate_json(case_path.read_bytes())
+    except (OSError, ValidationError) as e:
+        logging.error(f"Cannot read case definitions from {case_file}: {e}")
+        return None
+    cases = []
+    for case in loaded if isinstance(loaded, list) else [loaded]:
+        paths = {'vcf_filepath': case.vcf_filepath, 'index_vcf_filepath': case.index_vcf_filepath}
+        resolved = {
+            name: str(case_path.parent / path) for name, path in paths.items() if path and not Path(path).is_absolute()
+        }
+        cases.append(replace(case, **resolved))
+    logging.info(f'Found {len(cases)} cases in {case_file}')
+    return cases
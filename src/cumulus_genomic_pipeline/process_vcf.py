@@ -1,148 +1,445 @@
 import logging
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from functools import partial
 
 import pyarrow as pa
-import pyarrow.parquet as pq
-from pyarrow import Schema
 from pathlib import Path
 
 from cyvcf2 import VCF, Variant
-from cumulus_genomic_pipeline.radiant.vcf.experiment import Case, Experiment
-from cumulus_genomic_pipeline.schema.schema import variant_schema, consequence_schema, occurance_schema
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case
+from cumulus_genomic_pipeline.schema.schema import DEFAULT_PROFILE, BatchBuilder, table_schemas
 from cumulus_genomic_pipeline.process_args import VcfProcessingInput
-from cumulus_genomic_pipeline.radiant.vcf.common import process_common
-from cumulus_genomic_pipeline.radiant.vcf.consequence import parse_csq_header, process_consequence
-from cumulus_genomic_pipeline.radiant.vcf.occurrence import process_occurrence
-from cumulus_genomic_pipeline.radiant.vcf.pedigree import Pedigree
-from cumulus_genomic_pipeline.radiant.vcf.variant import process_variant
+from cumulus_genomic_pipeline.external_sort import SortBudget, SortedWriter
+from cumulus_genomic_pipeline.locus_store import LocusStore, UnitLoci, locus_keys
+from cumulus_genomic_pipeline.memory import MemoryBudget, MemoryLease, TableEstimate, current_budget
+from cumulus_genomic_pipeline.memory import install as install_budget
+from cumulus_genomic_pipeline.metrics import RunMetrics, StageTimer
+from cumulus_genomic_pipeline.metrics import install as install_reports
+from cumulus_genomic_pipeline.manifest import RunManifest, UnitOutput, file_checksum
+from cumulus_genomic_pipeline.parquet_writer import (
+    FLAT_LAYOUT, HIVE_LAYOUT, MIB, DatasetWriter, TableWriter, WriterProfile, writer_profile
+)
+from cumulus_genomic_pipeline.radiant.vcf.common import Common, process_common
+from cumulus_genomic_pipeline.radiant.vcf.consequence import ConsequenceBlock, parse_csq_header
+from cumulus_genomic_pipeline.radiant.vcf.locus_key import SHA256, CollisionCheck, assign_locus_keys
+from cumulus_genomic_pipeline.radiant.vcf.occurrence import OccurrenceBlock, SiteValues, SparseOccurrences
+from cumulus_genomic_pipeline.radiant.vcf.pedigree import PedEntry, Pedigree, case_from_ped, read_ped
+from cumulus_genomic_pipeline.radiant.vcf.split import AlleleSplitter
+from cumulus_genomic_pipeline.radiant.vcf.variant import VariantBlock
+from cumulus_genomic_pipeline.pipeline import Channel, Pipeline
+from cumulus_genomic_pipeline.scheduler import WorkUnit, plan_work, run_work
+from cumulus_genomic_pipeline.sharding import Shard
+from cumulus_genomic_pipeline.tracing import UnitTrace, unit_trace
+from cumulus_genomic_pipeline.tracing import install as install_tracing
+from cumulus_genomic_pipeline.tracing import reset as reset_trace
 
 VARIANT_OUT = 'variants.parquet'
 OCCURANCE_OUT = 'occurance.parquet'
 CONSEQUENCE_OUT = 'consequence.parquet'
+TABLE_OUTS = (VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT)
+# Written with the site table layout, see `table_schemas`.
+SITES_OUT = 'sites.parquet'
 BATCH_SIZE = 1000
+FLUSH_BYTES = 64 * MIB
+# Initial estimates of the Arrow bytes per variant record, per byte of CSQ and per occurrence sample,
+# measured on VEP annotated VCFs. TableBlocks replaces them with the rates of its own flushes.
+VARIANT_RECORD_BYTES = 300
+CSQ_BYTE_BYTES = 2
+OCCURRENCE_SAMPLE_BYTES = 128
+SITE_RECORD_BYTES = 160
+# Sent to the writer stages in place of a batch: write out or spill what they buffer.
+DRAIN = object()
+
+
+@dataclass(slots=True)
+class TableBlocks:
+    """
+    The records of the current batch, held per table until they are flushed into the table builders.
+    Locus keys are computed for the whole batch first. Variant rows need the picked consequences,
+    so the consequence block is flushed before the variant block. With a locus store, only the
+    records of loci the store does not know yet get variant and consequence rows. When the occurrence
+    block has a sites builder, the sites table is flushed as a fourth table.
+
+    `buffered_bytes` estimates the size of the rows the blocks would flush, so the caller can
+    flush by size rather than by record count. `timer` gets the time of each flush step.
+    """
+
+    variants: VariantBlock
+    consequences: ConsequenceBlock
+    occurances: OccurrenceBlock
+    locus_key: str = SHA256
+    collisions: CollisionCheck | None = None
+    loci: UnitLoci | None = None
+    estimates: tuple[TableEstimate, ...] | None = None
+    timer: StageTimer = field(default_factory=lambda: StageTimer('', 0, 0))
+
+    def __post_init__(self):
+        if self.estimates is None:
+            self.estimates = (
+                TableEstimate(VARIANT_RECORD_BYTES),
+                TableEstimate(CSQ_BYTE_BYTES),
+                TableEstimate(OCCURRENCE_SAMPLE_BYTES * max(len(self.occurances.samples), 1)),
+            )
+            if self.occurances.sites is not None:
+                self.estimates += (TableEstimate(SITE_RECORD_BYTES),)
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+    @property
+    def buffered_bytes(self) -> int:
+        return sum(estimate.bytes for estimate in self.estimates)
+
+    def add(self, record: Variant, common: Common):
+        self.consequences.add(record, common)
+        self.occurances.add(record, common)
+        self.variants.add(record, common)
+        variants, consequences, occurances, *sites = self.estimates
+        variants.units += 1
+        consequences.units += len(self.consequences.csqs[-1] or '')
+        occurances.units += 1
+        for estimate in sites:
+            estimate.units += 1
+
+    def flush(self) -> list[pa.RecordBatch]:
+        """
+        Flushes the blocks into their builders, and returns the (variant, consequence, occurance) batches,
+        followed by the sites batch if there is a sites table.
+        """
+        records = len(self)
+        start = time.perf_counter()
+        # Every record has a variant row, so the variant block holds the Common of every record.
+        assign_locus_keys(self.variants.commons, self.locus_key)
+        if self.collisions is not None:
+            self.collisions.add(self.variants.commons)
+        keep = None
+        if self.loci is not None:
+            keep = self.loci.claim(locus_keys(self.variants.commons, self.locus_key))
+        start = self.timer.add('locus_key', start, records)
+        picked = self.consequences.flush(keep)
+        start = self.timer.add('consequence', start, records)
+        self.variants.flush(picked, keep)
+        start = self.timer.add('variant', start, records)
+        self.occurances.flush()
+        start = self.timer.add('occurrence', start, records)
+        tables = [block.builder.flush() for block in (self.variants, self.consequences, self.occurances)]
+        if self.occurances.sites is not None:
+            tables.append(self.occurances.sites.flush())
+        self.timer.add('arrow', start, sum(batch.num_rows for batch in tables))
+        for estimate, batch in zip(self.estimates, tables):
+            estimate.flushed(batch.nbytes)
+        return tables
+
 
 def process_inputs(inputs: VcfProcessingInput):
-    case_id = 0
-    for vcf_path in inputs.vcf_files:
-        case_id+=1
-        _process_vcf(vcf_path, inputs.output_dir, case_id)
-
-def _process_vcf(vcf_path: str, output_dir: str, case_id: int):
-    variant_pq = Path(output_dir) / VARIANT_OUT
-    occurance_pq = Path(output_dir) / OCCURANCE_OUT
-    consequence_pq = Path(output_dir) / CONSEQUENCE_OUT
+    units = plan_work(inputs)
+    # A single unsharded VCF keeps the flat file names; anything else writes one part per case and shard.
+    partitioned = len(units) > 1 or any(unit.shard for unit in units)
+    logging.info(
+        f'Processing {len(inputs.vcf_files) + len(inputs.cases)} cases as {len(units)} work units on {inputs.workers} workers'
+    )
+    process = partial(
+        _process_unit, output_dir=inputs.output_dir, partitioned=partitioned,
+        schema_profile=inputs.schema_profile, locus_key=inputs.locus_key,
+        writer=writer_profile(inputs.writer_profile, inputs.row_group_mb), layout=inputs.output_layout,
+        sort_memory=inputs.sort_memory_mb * MIB if inputs.sort else None, dedupe_loci=inputs.dedupe_loci,
+        flush_bytes=inputs.flush_mb * MIB,
+        sparse=SparseOccurrences(inputs.sparse_min_dp, inputs.sparse_min_gq) if inputs.sparse_occurrences else None,
+        ped=read_ped(inputs.ped_file) if inputs.ped_file else None, site_table=inputs.site_table
+    )
+    budget = MemoryBudget(inputs.memory_budget_mb * MIB) if inputs.memory_budget_mb else None
+    manifest = RunManifest(inputs.output_dir, _manifest_settings(inputs, partitioned))
+    metrics = RunMetrics(inputs.metrics_dir or inputs.output_dir, inputs.metrics_interval)
+    store = LocusStore(inputs.output_dir)
+    fresh = inputs.force or not manifest.inputs
+    planned = units
+    committed = {id(unit) for unit in planned if manifest.committed(unit)}
+    units = manifest.pending(planned, force=inputs.force)
+    if inputs.dedupe_loci and not fresh and any(id(unit) in committed for unit in units):
+        # A committed unit that runs again may no longer write the loci other cases rely on, so
+        # the loci are claimed again from scratch, by every unit.
+        logging.warning('A work unit that was already done runs again with --dedupe-loci: processing all inputs again')
+        units = manifest.pending(planned, force=True)
+        fresh = True
+    if inputs.dedupe_loci and fresh:
+        # Loci are only known while the output that holds them is.
+        store.reset()
+    # The int64 keys of all the units of the run are checked together, once they are done.
+    collisions = CollisionCheck() if inputs.locus_key != SHA256 else None
+
+    def done(unit: WorkUnit, output: UnitOutput):
+        manifest.commit(unit, output)
+        metrics.add(output.metrics)
+        if collisions is not None and output.locus_keys is not None:
+            collisions.merge(*output.locus_keys)
+
+    reset_trace(inputs.trace_file)
+    try:
+        with metrics:
+            run_work(
+                units, inputs.workers, process, done=done, initializer=_install_worker,
+                initargs=(budget, metrics.queue, inputs.metrics_interval, inputs.trace_file, inputs.trace_every),
+                preload=(__name__,)
+            )
+        # Only now that the new files are all committed: a failed run keeps the earlier ones.
+        manifest.remove_superseded()
+    finally:
+        # Single-worker runs install them in this process.
+        _install_worker(None, None, None, None)
+        if inputs.dedupe_loci:
+            store.compact()
+    if collisions is not None and units:
+        collisions.report(f'the {len(units)} work units of this run')
+
+def _install_worker(
+        budget: MemoryBudget | None, reports, metrics_interval: float | None, trace_file: str | None,
+        trace_every: int = 1
+    ):
+    # Pool initializer: the run's shared memory budget, its queue for in-flight metrics and its trace file.
+    install_budget(budget)
+    install_reports(reports, metrics_interval)
+    install_tracing(trace_file, trace_every)
+
+def _manifest_settings(inputs: VcfProcessingInput, partitioned: bool) -> dict:
+    # Everything that changes the files a unit writes, or where it writes them.
+    return {
+        # Hive file names are the same either way, so runs with one or more inputs share the manifest.
+        'partitioned': partitioned or inputs.output_layout == HIVE_LAYOUT,
+        'ped': file_checksum(inputs.ped_file) if inputs.ped_file else None,
+        **{name: getattr(inputs, name) for name in (
+            'shard', 'shard_size', 'schema_profile', 'locus_key', 'writer_profile', 'row_group_mb', 'output_layout',
+            'sort', 'dedupe_loci', 'sparse_occurrences', 'sparse_min_dp', 'sparse_min_gq', 'site_table',
+        )},
+    }
+
+def _process_unit(
+        unit: WorkUnit, output_dir: str, partitioned: bool, schema_profile: str, locus_key: str, writer: WriterProfile,
+        layout: str, sort_memory: int | None, dedupe_loci: bool, flush_bytes: int, sparse: SparseOccurrences | None,
+        ped: dict[str, PedEntry] | None, site_table: bool
+    ) -> UnitOutput:
+    return _process_vcf(
+        unit.vcf_path, output_dir, unit.case_id, unit.shard, unit.index_path, partitioned, schema_profile, locus_key,
+        writer, layout, sort_memory, dedupe_loci, flush_bytes, unit.case, sparse, ped, site_table
+    )
+
+def _output_paths(
+        output_dir: str, case_id: int, part: int | None, outs: tuple[str, ...] = TABLE_OUTS
+    ) -> tuple[Path, ...]:
+    if part is None:
+        return tuple(Path(output_dir) / out for out in outs)
+    paths = []
+    for out in outs:
+        table_dir = Path(output_dir) / Path(out).stem
+        table_dir.mkdir(exist_ok=True)
+        paths.append(table_dir / f'case-{case_id}.part-{part:05d}.parquet')
+    return tuple(paths)
+
+def _table_writers(
+        output_dir: str, case_id: int, part: int, partitioned: bool, schemas: tuple, writer: WriterProfile, layout: str,
+        sort_memory: int | None, outs: tuple[str, ...] = TABLE_OUTS
+    ) -> list[TableWriter | SortedWriter]:
+    if layout == HIVE_LAYOUT:
+        # One dataset per table; the file names keep concurrent units from overwriting each other.
+        name = f'case-{case_id}.part-{part:05d}'
+        writers = [
+            DatasetWriter(Path(output_dir) / Path(out).stem, schema, writer, name)
+            for out, schema in zip(outs, schemas)
+        ]
+    else:
+        paths = _output_paths(output_dir, case_id, part if partitioned else None, outs)
+        writers = [TableWriter(path, schema, writer) for path, schema in zip(paths, schemas)]
+    if sort_memory is not None:
+        # The tables share the budget, the largest buffer spilling first; spilled runs go next to the output.
+        budget = SortBudget(sort_memory)
+        writers = [SortedWriter(table_writer, budget, output_dir) for table_writer in writers]
+    return writers
+
+def _process_vcf(
+        vcf_path: str, output_dir: str, case_id: int,
+        shard: Shard | None = None, index_path: Path | None = None, partitioned: bool | None = None,
+        schema_profile: str = DEFAULT_PROFILE, locus_key: str = SHA256, writer: WriterProfile = WriterProfile(),
+        layout: str = FLAT_LAYOUT, sort_memory: int | None = None, dedupe_loci: bool = False,
+        flush_bytes: int = FLUSH_BYTES, case: Case | None = None, sparse: SparseOccurrences | None = None,
+        ped: dict[str, PedEntry] | None = None, site_table: bool = False
+    ) -> UnitOutput:
+    part = shard.part if shard else 0
+    if partitioned is None:
+        partitioned = shard is not None
     logging.info(f"Processing vcf {vcf_path} outputting to {output_dir}")
-    
-    with pq.ParquetWriter(variant_pq, variant_schema) as variant_writer, \
-        pq.ParquetWriter(consequence_pq, consequence_schema) as conseq_writer, \
-        pq.ParquetWriter(occurance_pq, occurance_schema) as occurance_writer:
-        vcf = VCF(vcf_path)
+    started = time.perf_counter()
+    timer = StageTimer(vcf_path, case_id, part)
+    variant_schema, consequence_schema, occurance_schema, *sites_schema = schemas = table_schemas(
+        schema_profile, locus_key, site_table
+    )
+    outs = TABLE_OUTS + (SITES_OUT,) if site_table else TABLE_OUTS
+    table_writers = _table_writers(output_dir, case_id, part, partitioned, schemas, writer, layout, sort_memory, outs)
+
+    with ExitStack() as stack:
+        writers = [stack.enter_context(table_writer) for table_writer in table_writers]
+        # With a case definition, htslib only decodes the case's samples: the FORMAT arrays of every
+        # record, and so the Pedigree's experiment indexes, cover those samples alone.
+        samples = [experiment.aliquot for experiment in case.experiments] if case is not None else None
+        vcf = VCF(vcf_path, samples=samples)
+        if index_path is not None:
+            vcf.set_index(str(index_path))
         logging.debug(f"Cases: {vcf.samples}")
         csq_header = parse_csq_header(vcf)
-        experiments: list[Experiment] = []
-        for sample in vcf.samples:
-            experiments.append(Experiment(seq_id=1, task_id=1, patient_id=1, aliquot=sample, family_role='child', affected_status='', sex='Unknown', experimental_strategy='Unknown'))
-        case = Case(case_id=1, part=1, vcf_filepath=vcf_path, analysis_type='WGS', experiments=experiments, index_vcf_filepath=None)
+        splitter = AlleleSplitter(vcf, csq_header)
+        if case is None:
+            # One experiment per sample; the PED entries, if any, give their sex, status and family roles.
+            case = case_from_ped(case_id, vcf_path, vcf.samples, ped)
+        elif missing := set(samples) - set(vcf.samples):
+            raise ValueError(f'Samples {sorted(missing)} of case {case_id} are not in {vcf_path}')
         ped = Pedigree(case, vcf.samples)
         logging.info(f'Found the following samples: {vcf.samples}')
-        record_count = 0
-        record: Variant
-        variant_batch = []
-        occurance_batch = []
-        consequence_batch = []
-        for record in vcf:
-            record_count += 1
-            if record_count % 1000 == 0:
-                logging.debug(f'Record count: {record_count} vars: {len(variant_batch)} cons: {len(consequence_batch)} occ: {len(occurance_batch)}')
-                _write_all_tables(variant_writer, conseq_writer, occurance_writer, variant_batch, consequence_batch, occurance_batch)
-                variant_batch = []
-                occurance_batch = []
-                consequence_batch = []
-            out =_process_record(case_id, csq_header, ped, record, vcf_path)
-            if out is None:
-                logging.warning('Discarding record #{record_count}')
-            else:
-                (consequences, occurrences, variant) = out
-                variant_batch.append(variant)
-                consequence_batch.extend(consequences)
-                occurance_batch.extend(occurrences.values())
-        logging.debug(f'Record count: {record_count} vars: {len(variant_batch)} cons: {len(consequence_batch)} occ: {len(occurance_batch)}')
-        _write_all_tables(variant_writer, conseq_writer, occurance_writer, variant_batch, consequence_batch, occurance_batch)
-import pyarrow as pa
-from typing import List, Dict, Any
-
-def _process_record(case_id: int, csq_header, ped: Pedigree, record: Variant, vcf_path: str)-> tuple[list, dict, dict] | None:  
-    if len(record.ALT) <= 1:
-        common = process_common(record, case_id=case_id, part=0)
-        picked_consequence, consequences = process_consequence(record, csq_header, common)
-        occurrences = process_occurrence(record, ped, common=common)
-        variant = process_variant(record, picked_consequence, common)
-        return (consequences, occurrences, variant)
-    else:
-        logging.debug(
-            f"Skipped record {record.CHROM} - {record.POS} - {record.ALT} in file {vcf_path}:"
-            f" this is a multi allelic variant, mult-allelic are not supported. Please split vcf file."
+        variant_batch = BatchBuilder(variant_schema)
+        occurance_batch = BatchBuilder(occurance_schema)
+        consequence_batch = BatchBuilder(consequence_schema)
+        sites_batch = BatchBuilder(sites_schema[0]) if site_table else None
+        blocks = TableBlocks(
+            VariantBlock(variant_batch),
+            ConsequenceBlock(csq_header, consequence_batch),
+            OccurrenceBlock(
+                ped, occurance_batch, capacity=BATCH_SIZE, sparse=sparse, site_values=SiteValues.from_header(vcf),
+                sites=sites_batch
+            ),
+            locus_key,
+            CollisionCheck() if locus_key != SHA256 else None,
+            LocusStore(output_dir).open(case_id, part) if dedupe_loci else None,
+            timer=timer,
         )
-        return None
+        records = vcf(shard.region) if shard else vcf
+        trace = unit_trace(vcf_path, case_id, part)
+        if trace is not None:
+            trace.emit('unit', samples=len(vcf.samples), region=shard.region if shard else None)
 
-def _write_all_tables(
-        variant_writer, conseq_writer, occurance_writer,
-        variants: list[dict], consequences: list[dict], occurances: list[dict]
-    ):
-    _write_rows(variants, variant_schema, variant_writer)
-    _write_rows(consequences, consequence_schema, conseq_writer)
-    # _debug_schema_mismatch(occurances, occurance_schema)
-    _write_rows(occurances, occurance_schema, occurance_writer)
+        # The lease is closed after the pipeline has stopped its writers.
+        with MemoryLease(current_budget()) as lease, Pipeline() as pipeline:
+            batches = pipeline.channel()
+            outputs = [pipeline.channel() for _ in writers]
+            pipeline.start('reader', _read_batches, records, shard, batches, timer)
+            for writer, output, out in zip(writers, outputs, outs):
+                pipeline.start('writer', _write_batches, writer, output, lease, timer, f'write.{Path(out).stem}')
 
-def _write_rows(rows: list[dict], schema: Schema, writer):
-    table = pa.Table.from_pylist(rows, schema=schema)
-    writer.write_table(table)
+            record_count = 0
+            for batch in batches:
+                start = time.perf_counter()
+                for record in batch:
+                    record_count += 1
+                    if trace is not None and trace.sampled(record_count):
+                        _trace_record(trace, record_count, case_id, record, part, blocks, splitter)
+                    else:
+                        _process_record(case_id, record, part, blocks, splitter)
+                    if blocks.buffered_bytes >= flush_bytes:
+                        timer.add('record', start)
+                        _flush_blocks(blocks, outputs, lease, pipeline.cancelled, trace)
+                        start = time.perf_counter()
+                timer.add('record', start, len(batch))
+                _flush_blocks(blocks, outputs, lease, pipeline.cancelled, trace)
+                timer.report()
+            for output in outputs:
+                output.close()
 
+        # Closing the writers writes their last row groups and merges sorted runs.
+        start = time.perf_counter()
 
-def validate_dict_against_schema(row_dict: Dict[str, Any], schema: pa.Schema) -> List[str]:
-    """
-    Validate a dictionary against a schema and return error messages for mismatches.
-    """
-    errors = []
-    
-    for field in schema:
-        field_name = field.name
-        expected_type = field.type
-        
-        if field_name not in row_dict:
-            if not field.nullable:
-                errors.append(f"Missing required field: {field_name} (type: {expected_type})")
+    timer.add('close', start)
+    if trace is not None:
+        trace.emit('done', records=record_count, seconds=time.perf_counter() - started)
+
+    # The writers commit their files on exit; the loci they hold only become known after that.
+    if blocks.loci is not None:
+        blocks.loci.save()
+    files = [str(path.relative_to(output_dir)) for table_writer in table_writers for path in table_writer.files]
+    locus_keys = blocks.collisions.pairs() if blocks.collisions is not None else None
+    return UnitOutput(record_count, files, timer.snapshot(), locus_keys)
+
+def _read_batches(records, shard: Shard | None, batches: Channel, timer: StageTimer):
+    # Reader stage: decodes records into lists of BATCH_SIZE, so the transform only ever waits on full batches.
+    batch: list[Variant] = []
+    start = time.perf_counter()
+    for record in records:
+        if shard and not shard.owns(record.POS):
+            # Overlaps the shard but starts in the previous one, which emits it.
             continue
-        
-        value = row_dict[field_name]
-        
-        # Skip None values for nullable fields
-        if value is None:
-            if not field.nullable:
-                errors.append(f"Null value for non-nullable field: {field_name}")
+        batch.append(record)
+        if len(batch) == BATCH_SIZE:
+            timer.add('decode', start, len(batch))
+            batches.put(batch)
+            batch = []
+            start = time.perf_counter()
+    timer.add('decode', start, len(batch))
+    if batch:
+        batches.put(batch)
+    batches.close()
+
+def _write_batches(
+        writer: TableWriter | SortedWriter, batches: Channel, lease: MemoryLease, timer: StageTimer, stage: str
+    ):
+    # Writer stage: one per table, so the three tables are encoded and compressed concurrently.
+    # Rows stay charged to the lease while the writer buffers them (a row group or a sort run),
+    # and are released when it writes them out.
+    for batch in batches:
+        start = time.perf_counter()
+        held = writer.buffered_bytes
+        if batch is DRAIN:
+            writer.drain()
+            timer.add(stage, start)
+            lease.release(held - writer.buffered_bytes)
             continue
-        
-        # Check type compatibility
-        try:
-            # Try to create a scalar with the value to test type compatibility
-            pa.scalar(value, type=expected_type)
-        except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
-            errors.append(f"Field '{field_name}': Expected {expected_type}, got {type(value).__name__} with value: {value}")
-    
-    return errors
-
-def _debug_schema_mismatch(rows: List[Dict[str, Any]], schema: pa.Schema):
-    """
-    Debug schema mismatches by checking each row and field individually.
-    """
-    all_errors = []
-    logging.info('debug')
-    for i, row in enumerate(rows):
-        errors = validate_dict_against_schema(row, schema)
-        if errors:
-            row_errors = [f"Row {i}: {error}" for error in errors]
-            all_errors.extend(row_errors)
-            logging.debug(f"Errors in row {i}:")
-            for error in errors:
-                logging.debug(f"  {error}")
-    
-    return all_errors
\ No newline at end of file
+        writer.write(batch)
+        timer.add(stage, start, batch.num_rows)
+        lease.release(held + batch.nbytes - writer.buffered_bytes)
+
+def _flush_blocks(
+        blocks: TableBlocks, outputs: list[Channel], lease: MemoryLease, cancelled: threading.Event,
+        trace: UnitTrace | None = None
+    ):
+    records = len(blocks)
+    tables = blocks.flush()
+    start = time.perf_counter()
+    # Charged to the memory budget until the writers have written them out. When the budget is used
+    # up, the writers first drain what they buffer, then this waits.
+    def drain_writers():
+        for output in outputs:
+            output.put(DRAIN)
+
+    nbytes = sum(batch.nbytes for batch in tables)
+    lease.acquire(nbytes, cancelled, on_wait=drain_writers)
+    for batch, output in zip(tables, outputs):
+        output.put(batch)
+    now = blocks.timer.add('backpressure', start)
+    if trace is not None:
+        trace.emit(
+            'flush', records=records, rows=[batch.num_rows for batch in tables], bytes=nbytes,
+            backpressure_seconds=now - start
+        )
+
+def _process_record(case_id: int, record: Variant, part: int, blocks: TableBlocks, splitter: AlleleSplitter):
+    if len(record.ALT) <= 1:
+        common = process_common(record, case_id=case_id, part=part, hash_locus=False)
+        blocks.add(record, common)
+    else:
+        # Multi-allelic: one record per ALT allele, as `bcftools norm -m-` would write them.
+        for allele_record in splitter.split(record):
+            common = process_common(allele_record, case_id=case_id, part=part, hash_locus=False)
+            blocks.add(allele_record, common)
+
+def _trace_record(
+        trace: UnitTrace, index: int, case_id: int, record: Variant, part: int, blocks: TableBlocks,
+        splitter: AlleleSplitter
+    ):
+    # `_process_record` for a sampled record: timed, and followed by its trace event.
+    added = len(blocks)
+    start = time.perf_counter()
+    _process_record(case_id, record, part, blocks, splitter)
+    seconds = time.perf_counter() - start
+    csqs = blocks.consequences.csqs[added:]
+    trace.emit(
+        'record', index=index, chromosome=record.CHROM, start=record.POS, ref=record.REF, alt=record.ALT,
+        variants=len(csqs), transcripts=[csq.count(',') + 1 if csq else 0 for csq in csqs], seconds=seconds,
+        buffered_bytes=blocks.buffered_bytes
+    )
@@ -1,13 +1,21 @@
 import hashlib
 from dataclasses import dataclass
 
+import pyarrow as pa
 from cyvcf2 import Variant
 
+from cumulus_genomic_pipeline.schema.schema import BatchBuilder
 
-@dataclass()
+# Columns every output table carries from `Common`. Tables have either `locus_hash` or `locus_key`,
+# depending on the locus key mode (see `locus_key`).
+COMMON_COLUMNS = ('case_id', 'locus', 'locus_hash', 'locus_key', 'chromosome', 'start', 'end', 'reference', 'alternate')
+
+
+@dataclass(slots=True)
 class Common:
     """
     Represents common genomic variant information shared across different variant processing steps.
+    Slotted, since one is created for every record.
 
     Attributes:
         case_id (int): Identifier for the case or sample the variant belongs to.
@@ -15,6 +23,7 @@ class Common:
             typically in the format 'chrom-start-ref-alt'.
         locus_hash (str): Placeholder for a hash value uniquely identifying the locus.
             This can be used for quick comparisons or joins.
+        locus_key (int): int64 locus key, set instead of `locus_hash` in the blake2b and packed locus key modes.
         chromosome (str): Chromosome identifier, e.g., '1', 'X', 'MT'.
         start (int): 1-based position where the variant starts (VCF-style POS field).
         end (int): End position of the variant, usually the same as start for SNVs.
@@ -31,9 +40,14 @@ class Common:
     end: int
     reference: str
     alternate: str
+    locus_key: int | None = None
 
 
-def process_common(record: Variant, case_id: int, part: int) -> Common:
+def process_common(record: Variant, case_id: int, part: int, hash_locus: bool = True) -> Common:
+    """
+    Extracts the common locus attributes of a record. With `hash_locus=False`, `locus_hash` is
+    left unset so the keys of a whole block can be computed at once with `locus_key.assign_locus_keys`.
+    """
     # LUKE: this starts the parsing of the base variant
     chrom = record.CHROM.replace("chr", "")
     pos = record.POS
@@ -41,7 +55,7 @@ def process_common(record: Variant, case_id: int, part: int) -> Common:
     alt = record.ALT[0]
     info_end = record.end
     locus = f"{chrom}-{pos}-{ref}-{alt}"
-    locus_hash = hashlib.sha256(locus.encode()).hexdigest()
+    locus_hash = hashlib.sha256(locus.encode()).hexdigest() if hash_locus else None
     return Common(
         case_id=case_id,
         part=part,
@@ -53,3 +67,31 @@ def process_common(record: Variant, case_id: int, part: int) -> Common:
         reference=ref,
         alternate=alt,
     )
+
+
+def add_common(builder: BatchBuilder, common: Common, n: int):
+    """
+    Repeats the common locus columns of `common` for the next `n` rows of `builder`.
+    """
+    columns = builder.columns
+    for name in COMMON_COLUMNS:
+        if name in columns:
+            columns[name].repeat(getattr(common, name), n)
+
+
+def add_commons(builder: BatchBuilder, commons: list[Common], rows: pa.Array | None = None):
+    """
+    Appends the common locus columns of a block of records to `builder`.
+
+    Args:
+        builder (BatchBuilder): Table builder.
+        commons (list[Common]): One entry per record.
+        rows (pa.Array | None): Index into `commons` for each new row, e.g. one entry per transcript.
+            None appends one row per record.
+    """
+    columns = builder.columns
+    for name in COMMON_COLUMNS:
+        if name not in columns:
+            continue
+        values = pa.array([getattr(common, name) for common in commons], type=columns[name].type)
+        columns[name].extend(values.take(rows) if rows is not None else values)
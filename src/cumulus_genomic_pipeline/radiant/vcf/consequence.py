@@ -4,8 +4,8 @@ and transforming them into a structured format compatible with Iceberg tables.
 
 This module defines:
 - A schema for consequence data.
-- A helper dataclass for exon rank/total.
-- Functions to parse CSQ headers, extract CSQ field values, and process consequences.
+- A columnar CSQ engine (`ConsequenceBlock`) that parses a block of records at once with pyarrow.compute.
+- Functions to parse CSQ headers and process consequences into a columnar table builder.
 
 Dependencies:
 - cyvcf2: for reading VCF records.
@@ -13,91 +13,170 @@ Dependencies:
 - Common metadata and schema merging from internal modules.
 """
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from cyvcf2 import Variant, VCF
 
-from cumulus_genomic_pipeline.radiant.vcf.common import Common
+from cumulus_genomic_pipeline.radiant.vcf.common import Common, add_commons
+from cumulus_genomic_pipeline.schema.schema import BatchBuilder
 
 CSQ_FORMAT_FIELD = "CSQ"
 
-
-def get_csq_field(csq_fields, fields, field_name):
+# Consequence columns copied verbatim from a CSQ field.
+CSQ_COLUMNS = {
+    "variant_class": "VARIANT_CLASS",
+    "hgvsg": "HGVSg",
+    "hgvsp": "HGVSp",
+    "hgvsc": "HGVSc",
+    "symbol": "SYMBOL",
+    "transcript_id": "Feature",
+    "source": "Source",
+    "biotype": "BIOTYPE",
+    "strand": "STRAND",
+    "vep_impact": "IMPACT",
+    "mane_select": "ManeSelect",
+}
+EXON_TYPE = pa.struct([pa.field("rank", pa.string()), pa.field("total", pa.string())])
+
+
+def process_consequence(
+    record: Variant, csq_fields: dict[str, int], common: Common, builder: BatchBuilder
+) -> dict | None:
     """
-    Safely retrieves a field from CSQ annotation by name.
+    Processes VEP CSQ annotations from a VCF record and appends one consequence row per transcript
+    to `builder`. This is a one record `ConsequenceBlock`; the pipeline uses larger blocks.
 
     Args:
-        csq_fields (dict): Mapping of CSQ field names to indexes.
-        fields (list): Parsed CSQ annotation fields from a single transcript.
-        field_name (str): Name of the CSQ field to retrieve.
+        record (Variant): A cyvcf2 Variant object.
+        csq_fields (dict[str, int]): Field name to index mapping from CSQ header.
+        common (Common): Shared metadata (e.g. position, allele info).
+        builder (BatchBuilder): Accumulator for the consequence table.
 
     Returns:
-        str or None: Value of the CSQ field or None if not found.
+        dict or None: The primary (picked or canonical) consequence, keyed like the consequence schema.
     """
-    return fields[csq_fields[field_name]] if field_name in csq_fields else None
+    block = ConsequenceBlock(csq_fields, builder)
+    block.add(record, common)
+    picked = block.flush()
+    if not picked["is_picked"].is_valid()[0].as_py():
+        return None
+    return {name: values[0].as_py() for name, values in picked.items()}
 
 
-def process_consequence(record: Variant, csq_fields: dict[str, int], common: Common) -> tuple[dict, list[dict]]:
+class ConsequenceBlock:
     """
-    Processes VEP CSQ annotations from a VCF record and builds structured consequence data.
+    Columnar CSQ engine for the consequence table.
 
-    Args:
-        record (Variant): A cyvcf2 Variant object.
-        csq_fields (dict[str, int]): Field name to index mapping from CSQ header.
-        common (Common): Shared metadata (e.g. position, allele info).
+    `add` only keeps the raw CSQ string of each record. `flush` splits the strings of the whole
+    block into Arrow arrays with pyarrow.compute (records into transcripts, transcripts into fields),
+    projects the fields the consequence schema needs and derives `exon`, `consequences`, `aa_change`,
+    `dna_change`, `impact_score`, `is_picked` and `is_canonical` as column operations. Rows are
+    appended to the builder in record order, one per transcript.
 
-    Returns:
-        tuple:
-            - dict: The primary (picked or canonical) consequence.
-            - list of dict: All consequence entries for the variant.
+    The block grows until the caller flushes it, since the caller needs the picked consequences
+    `flush` returns.
+
+    Attributes:
+        csq_fields (dict[str, int]): Field name to index mapping from `parse_csq_header`.
+        builder (BatchBuilder): Consequence table builder the rows are flushed into.
     """
-    csq = record.INFO.get(CSQ_FORMAT_FIELD, None)
-    consequences = []
-    pick_consequence = None
-    if csq:
-        csq_data = csq.split(",")
-        for c in csq_data:
-            fields = c.split("|")
-            exon = get_csq_field(csq_fields, fields, "EXON").split("/")
-            vep_impact = get_csq_field(csq_fields, fields, "IMPACT")
-            hgvsg = get_csq_field(csq_fields, fields, "HGVSg")
-            hgvsp = get_csq_field(csq_fields, fields, "HGVSp")
-            hgvsc = get_csq_field(csq_fields, fields, "HGVSc")
-            picked = get_csq_field(csq_fields, fields, "PICK") == "1"
-            consequence = {
-                "case_id": common.case_id,
-                "locus": common.locus,
-                "locus_hash": common.locus_hash,
-                "chromosome": common.chromosome,
-                "start": common.start,
-                "end": common.end,
-                "reference": common.reference,
-                "alternate": common.alternate,
-                "variant_class": get_csq_field(csq_fields, fields, "VARIANT_CLASS"),
-                "hgvsg": hgvsg,
-                "hgvsp": hgvsp,
-                "hgvsc": hgvsc,
-                "symbol": get_csq_field(csq_fields, fields, "SYMBOL"),
-                "transcript_id": get_csq_field(csq_fields, fields, "Feature"),
-                "source": get_csq_field(csq_fields, fields, "Source"),
-                "biotype": get_csq_field(csq_fields, fields, "BIOTYPE"),
-                "strand": get_csq_field(csq_fields, fields, "STRAND"),
-                "exon": {"rank": str(exon[0]), "total": str(exon[1])} if len(exon) == 2 else None,
-                "vep_impact": vep_impact,
-                "consequences": get_csq_field(csq_fields, fields, "Consequence").split("&"),
-                "mane_select": get_csq_field(csq_fields, fields, "ManeSelect"),
-                "is_mane_select": False,
-                "is_mane_plus": False,
-                "is_picked": picked,
-                "is_canonical": get_csq_field(csq_fields, fields, "CANONICAL") == "YES",
-                "aa_change": hgvsp.split(":")[-1] if hgvsp else None,
-                "dna_change": hgvsc.split(":")[-1] if hgvsp else None,
-                "impact_score": IMPACT_SCORE.get(vep_impact, 0),
-            }
-            if picked:
-                pick_consequence = consequence
-            consequences.append(consequence)
-    if pick_consequence is None:
-        pick_consequence = next((c for c in consequences if c["is_canonical"]), None)
-    return pick_consequence, consequences
+
+    def __init__(self, csq_fields: dict[str, int], builder: BatchBuilder):
+        self.csq_fields = csq_fields
+        self.builder = builder
+        self.csqs: list[str | None] = []
+        self.commons: list[Common] = []
+
+    def __len__(self) -> int:
+        return len(self.csqs)
+
+    def add(self, record: Variant, common: Common):
+        self.csqs.append(record.INFO.get(CSQ_FORMAT_FIELD, None) or None)
+        self.commons.append(common)
+
+    def flush(self, keep: np.ndarray | None = None) -> dict[str, pa.Array]:
+        """
+        Appends the consequence rows of every record in the block to the builder and empties the block.
+
+        Args:
+            keep (np.ndarray | None): Boolean mask of the records to write; the CSQ of the others is not parsed.
+
+        Returns:
+            dict[str, pa.Array]: The primary consequence of each record, keyed like the consequence
+            schema, with one entry per record written. The last picked transcript wins; without one,
+            the first canonical transcript. Records with neither are null in every column.
+        """
+        if keep is not None:
+            self.csqs = [csq for csq, kept in zip(self.csqs, keep) if kept]
+            self.commons = [common for common, kept in zip(self.commons, keep) if kept]
+        raw = pa.array(self.csqs, type=pa.string())
+        transcripts = pc.split_pattern(raw, ",")
+        record_of_row = pc.list_parent_indices(transcripts)
+        fields = pc.split_pattern(pc.list_flatten(transcripts), "|")
+        n = len(fields)
+
+        values = {name: self._field(fields, csq_name) for name, csq_name in CSQ_COLUMNS.items()}
+        values["exon"] = _exon_array(self._field(fields, "EXON"))
+        values["consequences"] = pc.split_pattern(self._field(fields, "Consequence"), "&")
+        values["is_mane_select"] = pa.array(np.zeros(n, dtype=bool))
+        values["is_mane_plus"] = values["is_mane_select"]
+        values["is_picked"] = pc.equal(self._field(fields, "PICK"), "1").fill_null(False)
+        values["is_canonical"] = pc.equal(self._field(fields, "CANONICAL"), "YES").fill_null(False)
+        # HGVS notations are "<reference>:<change>"; both changes are only set when there is a protein change.
+        has_hgvsp = pc.greater(pc.utf8_length(values["hgvsp"]), 0).fill_null(False)
+        values["aa_change"] = _after_last_colon(values["hgvsp"], has_hgvsp)
+        values["dna_change"] = _after_last_colon(values["hgvsc"], has_hgvsp)
+        impact_index = pc.index_in(values["vep_impact"], pa.array(list(IMPACT_SCORE)))
+        values["impact_score"] = pc.take(pa.array(list(IMPACT_SCORE.values()), pa.int32()), impact_index).fill_null(0)
+
+        if n:
+            add_commons(self.builder, self.commons, record_of_row)
+            columns = self.builder.columns
+            for name, column_values in values.items():
+                columns[name].extend(column_values)
+            self.builder.end_rows(n)
+
+        picked = _picked_rows(len(self.csqs), record_of_row.to_numpy(), values["is_picked"], values["is_canonical"])
+        self.csqs = []
+        self.commons = []
+        return {name: column_values.take(picked) for name, column_values in values.items()}
+
+    def _field(self, fields: pa.ListArray, name: str) -> pa.Array:
+        index = self.csq_fields.get(name)
+        if index is None:
+            return pa.nulls(len(fields), pa.string())
+        return pc.list_element(fields, index)
+
+
+def _exon_array(exon: pa.Array) -> pa.StructArray:
+    # "rank/total", or null when the transcript has no exon number.
+    parts = pc.split_pattern(exon, "/")
+    has_exon = pc.equal(pc.list_value_length(parts), 2).fill_null(False)
+    parts = pc.if_else(has_exon, parts, pa.nulls(len(parts), parts.type))
+    return pa.StructArray.from_arrays(
+        [pc.list_element(parts, 0), pc.list_element(parts, 1)],
+        fields=list(EXON_TYPE),
+        mask=pc.invert(has_exon),
+    )
+
+
+def _after_last_colon(hgvs: pa.Array, keep: pa.Array) -> pa.Array:
+    change = pc.replace_substring_regex(hgvs, pattern="^.*:", replacement="")
+    return pc.if_else(keep, change, pa.nulls(len(change), pa.string()))
+
+
+def _picked_rows(records: int, record_of_row: np.ndarray, is_picked: pa.Array, is_canonical: pa.Array) -> pa.Array:
+    # Row index of each record's primary transcript, null when it has none.
+    rows = np.arange(len(record_of_row))
+    last_picked = np.full(records, -1)
+    picked = is_picked.to_numpy(zero_copy_only=False)
+    np.maximum.at(last_picked, record_of_row[picked], rows[picked])
+    first_canonical = np.full(records, len(rows))
+    canonical = is_canonical.to_numpy(zero_copy_only=False)
+    np.minimum.at(first_canonical, record_of_row[canonical], rows[canonical])
+    chosen = np.where(last_picked >= 0, last_picked, first_canonical)
+    return pa.array(chosen, mask=chosen == len(rows))
 
 
 def parse_csq_header(vcf: VCF):
@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from dataclasses import dataclass
 
 
-class Experiment(BaseModel):
+# Plain dataclasses, so the pipeline starts without pydantic; case definition files are still
+# validated into them with a pydantic TypeAdapter (see process_args._read_cases).
+@dataclass(slots=True)
+class Experiment:
     seq_id: int
     task_id: int
     patient_id: int
@@ -15,7 +18,8 @@ class Experiment(BaseModel):
     exomiser_filepaths: list[str] | None = None
 
 # TODO: figure out how to make a case
-class Case(BaseModel):
+@dataclass(slots=True)
+class Case:
     case_id: int
     part: int
     vcf_filepath: str
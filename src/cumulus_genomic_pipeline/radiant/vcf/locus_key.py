@@ -0,0 +1,192 @@
+"""
+Locus keys: the value joining variants, consequences and occurrences of the same locus.
+
+Modes:
+    - sha256: The historical `locus_hash` column, a 64 character hex SHA-256 of the locus string.
+    - blake2b: An int64 `locus_key`, the first 8 bytes of a BLAKE2b digest of the locus string.
+    - packed: An int64 `locus_key` with chromosome, position and alleles bit-packed, so keys sort in
+      genome order. Loci that do not fit (long or non-ACGT alleles, non-standard contigs) keep the
+      chromosome and position bits and replace the allele bits with a hash.
+
+Keys are computed for a block of `Common`s at a time by `assign_locus_keys`. The int64 modes can
+collide; `CollisionCheck` finds the collisions of a run: each work unit collects the distinct
+(key, check) pairs of its records, and the main process checks those of all units together.
+
+Exports:
+    - LOCUS_KEY_MODES: Supported modes.
+    - assign_locus_keys: Fills `locus_hash` or `locus_key` for a block of records.
+    - CollisionCheck: Collision detection for int64 keys, over the units of a run.
+"""
+
+import hashlib
+import logging
+
+import numpy as np
+
+from cumulus_genomic_pipeline.radiant.vcf.common import Common
+
+SHA256 = 'sha256'
+BLAKE2B = 'blake2b'
+PACKED = 'packed'
+LOCUS_KEY_MODES = (SHA256, BLAKE2B, PACKED)
+
+# Packed layout, from the most significant bit: sign (0), chromosome (5), position (28), hashed flag (1),
+# alleles (29). Packed alleles are the ref and alt lengths (3 bits each) then 2 bits per base.
+_CHROMOSOME_CODES = {str(i): i for i in range(1, 23)} | {'X': 23, 'Y': 24, 'M': 25, 'MT': 25}
+_OTHER_CHROMOSOME = 0
+_POSITION_BITS = 28
+_ALLELE_BITS = 29
+_MAX_ALLELE_LENGTH = 7
+_MAX_BASES = (_ALLELE_BITS - 6) // 2
+# Personalizes the check hash of `CollisionCheck`, so it is independent of the blake2b keys.
+_CHECK_PERSON = b'locus-check'
+_BASE_CODES = np.full(256, 255, dtype=np.uint8)
+for _code, _base in enumerate(b'ACGT'):
+    _BASE_CODES[_base] = _code
+
+
+def assign_locus_keys(commons: list[Common], mode: str):
+    """
+    Computes the locus keys of a block of records and stores them on the `Common`s: `locus_hash`
+    for sha256, `locus_key` for the int64 modes.
+
+    Raises:
+        ValueError: If `mode` is not one of `LOCUS_KEY_MODES`.
+    """
+    if mode == SHA256:
+        for common in commons:
+            common.locus_hash = hashlib.sha256(common.locus.encode()).hexdigest()
+        return
+    if mode == BLAKE2B:
+        keys = blake2b_keys([common.locus for common in commons])
+    elif mode == PACKED:
+        keys = packed_keys(commons)
+    else:
+        raise ValueError(f"Unknown locus key mode '{mode}', expected one of {LOCUS_KEY_MODES}")
+    for common, key in zip(commons, keys.tolist()):
+        common.locus_key = key
+
+
+def blake2b_keys(loci: list[str], person: bytes = b'') -> np.ndarray:
+    """
+    Returns the first 8 bytes of the BLAKE2b digest of each locus string, as int64.
+    """
+    digests = b''.join(hashlib.blake2b(locus.encode(), digest_size=8, person=person).digest() for locus in loci)
+    return np.frombuffer(digests, dtype='<i8').astype(np.int64)
+
+
+def packed_keys(commons: list[Common]) -> np.ndarray:
+    """
+    Returns the packed int64 key of each record, see the module docstring for the layout.
+    """
+    n = len(commons)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    chromosomes = np.array([_CHROMOSOME_CODES.get(c.chromosome, _OTHER_CHROMOSOME) for c in commons], dtype=np.int64)
+    positions = np.array([c.start for c in commons], dtype=np.int64)
+    refs = [c.reference.encode() for c in commons]
+    alts = [c.alternate.encode() for c in commons]
+    ref_lengths = np.fromiter(map(len, refs), dtype=np.int64, count=n)
+    alt_lengths = np.fromiter(map(len, alts), dtype=np.int64, count=n)
+
+    # Base codes of every record's ref+alt, concatenated; alleles are never empty, so every record has bases.
+    lengths = ref_lengths + alt_lengths
+    bases = _BASE_CODES[np.frombuffer(b''.join(ref + alt for ref, alt in zip(refs, alts)), dtype=np.uint8)]
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    packable = (
+        (ref_lengths <= _MAX_ALLELE_LENGTH)
+        & (alt_lengths <= _MAX_ALLELE_LENGTH)
+        & (lengths <= _MAX_BASES)
+        & ~np.logical_or.reduceat(bases == 255, starts)
+        & (chromosomes != _OTHER_CHROMOSOME)
+        & (positions < 1 << _POSITION_BITS)
+    )
+
+    # Two bits per base, first base most significant.
+    record_of_base = np.repeat(np.arange(n), lengths)
+    shifts = 2 * (lengths[record_of_base] - 1 - (np.arange(len(bases)) - starts[record_of_base]))
+    keep = packable[record_of_base]
+    contributions = np.where(keep, bases, 0).astype(np.int64) << np.where(keep, shifts, 0)
+    sequences = np.add.reduceat(contributions, starts)
+    alleles = (ref_lengths << _ALLELE_BITS - 3) | (alt_lengths << _ALLELE_BITS - 6) | sequences
+
+    hashed = np.flatnonzero(~packable)
+    if len(hashed):
+        # Non-standard contigs all share chromosome code 0, so the hash covers the whole locus string.
+        loci_hashes = blake2b_keys([commons[i].locus for i in hashed])
+        alleles[hashed] = (1 << _ALLELE_BITS) | (loci_hashes & ((1 << _ALLELE_BITS) - 1))
+        positions[hashed] &= (1 << _POSITION_BITS) - 1
+    return (chromosomes << _POSITION_BITS + _ALLELE_BITS + 1) | (positions << _ALLELE_BITS + 1) | alleles
+
+
+class CollisionCheck:
+    """
+    Detects int64 locus keys shared by different loci over a run.
+
+    Keeps the key and a second, independent 64-bit hash of the locus string per record (16 bytes
+    per record); two records collide when their keys match but their checks differ. Repeated loci
+    are not collisions. The check is a personalized BLAKE2b, the same in every process, so the
+    `pairs` of the work units, each run in its own worker, can be `merge`d into one check.
+    """
+
+    def __init__(self):
+        self.keys: list[np.ndarray] = []
+        self.checks: list[np.ndarray] = []
+        self.rows = 0
+        self.distinct_rows = 0
+
+    def add(self, commons: list[Common]):
+        self.keys.append(np.array([common.locus_key for common in commons], dtype=np.int64))
+        self.checks.append(blake2b_keys([common.locus for common in commons], _CHECK_PERSON))
+        self.rows += len(commons)
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the distinct (key, check) pairs added so far, as a keys and a checks array.
+        """
+        self._compact()
+        if not self.keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return self.keys[0], self.checks[0]
+
+    def merge(self, keys: np.ndarray, checks: np.ndarray):
+        """
+        Adds the `pairs` of another check, e.g. of a work unit run in a worker.
+        """
+        self.keys.append(keys)
+        self.checks.append(checks)
+        self.rows += len(keys)
+        # Units of different cases share most loci: keeping the distinct pairs bounds the memory
+        # by the loci of the run rather than its records.
+        if self.rows > 2 * max(self.distinct_rows, 1 << 20):
+            self._compact()
+
+    def _compact(self):
+        if len(self.keys) < 2 and self.rows == self.distinct_rows:
+            return
+        if self.keys:
+            distinct = np.unique(np.stack([np.concatenate(self.keys), np.concatenate(self.checks)], axis=1), axis=0)
+            self.keys, self.checks = [distinct[:, 0].copy()], [distinct[:, 1].copy()]
+        self.rows = self.distinct_rows = len(self.keys[0]) if self.keys else 0
+
+    def collisions(self) -> int:
+        """
+        Returns the number of distinct keys shared by more than one locus.
+        """
+        if not self.keys:
+            return 0
+        keys, checks = np.concatenate(self.keys), np.concatenate(self.checks)
+        order = np.lexsort((checks, keys))
+        keys, checks = keys[order], checks[order]
+        # Sorted by (key, check): a collision is a key followed by itself with a new check.
+        colliding = (keys[1:] == keys[:-1]) & (checks[1:] != checks[:-1])
+        return len(np.unique(keys[1:][colliding]))
+
+    def report(self, name: str) -> int:
+        collisions = self.collisions()
+        if collisions:
+            logging.warning(f'{collisions} locus keys are shared by different loci in {name}')
+        else:
+            logging.info(f'No locus key collisions in {name}')
+        return collisions
@@ -1,6 +1,128 @@
+import logging
+from dataclasses import dataclass
+from pathlib import Path
 
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case, Experiment
 
-from cumulus_genomic_pipeline.radiant.vcf.experiment import Case
+PROGENY_ROLES = ("proband", "brother", "sister", "sibling")
+# PED sex and phenotype codes; anything else (0, -9, ...) is unknown.
+PED_SEXES = {"1": "Male", "2": "Female"}
+PED_AFFECTED = {"1": "unaffected", "2": "affected"}
+
+
+@dataclass(frozen=True, slots=True)
+class PedEntry:
+    """
+    One individual of a PED file.
+
+    Attributes:
+        family_id (str): Family the individual belongs to.
+        sample (str): Individual id, matched against the VCF sample names.
+        father (str | None): Father's individual id, None when unknown ("0").
+        mother (str | None): Mother's individual id, None when unknown ("0").
+        sex (str): "Male", "Female" or "Unknown", as `Experiment.sex`.
+        affected_status (str): "affected", "unaffected" or "" (unknown), as `Experiment.affected_status`.
+    """
+
+    family_id: str
+    sample: str
+    father: str | None
+    mother: str | None
+    sex: str
+    affected_status: str
+
+
+def read_ped(path: str | Path) -> dict[str, PedEntry]:
+    """
+    Reads a PED file: whitespace separated family, individual, father, mother, sex and phenotype
+    columns. Blank lines and lines starting with '#' are skipped; columns past the sixth are ignored.
+
+    Returns:
+        dict[str, PedEntry]: The entries by individual id.
+
+    Raises:
+        ValueError: If a line has fewer than six columns or an individual is listed twice.
+    """
+    entries: dict[str, PedEntry] = {}
+    for number, line in enumerate(Path(path).read_text().splitlines(), start=1):
+        if not line.strip() or line.startswith("#"):
+            continue
+        fields = line.split()
+        if len(fields) < 6:
+            raise ValueError(f"{path}:{number}: expected 6 PED columns, got {len(fields)}")
+        family_id, sample, father, mother, sex, phenotype = fields[:6]
+        if sample in entries:
+            raise ValueError(f"{path}:{number}: individual {sample} is listed twice")
+        entries[sample] = PedEntry(
+            family_id,
+            sample,
+            father if father != "0" else None,
+            mother if mother != "0" else None,
+            PED_SEXES.get(sex, "Unknown"),
+            PED_AFFECTED.get(phenotype, ""),
+        )
+    return entries
+
+
+def case_from_ped(case_id: int, vcf_path: str, vcf_samples: list[str], ped: dict[str, PedEntry] | None) -> Case:
+    """
+    Builds the case of a VCF given without a case definition: one experiment per VCF sample, with
+    seq_id and patient_id its 1-based position in the VCF.
+
+    Sex and affected status come from the PED entries, when there are any. The first family (in VCF
+    order of its children) with a child whose father or mother is also in the VCF becomes the trio:
+    its parents get the father and mother roles, and the children of those parents the progeny
+    roles, the first affected child (or else the first child) being the proband. Everyone else,
+    and every sample without a PED, is a "child" outside the family.
+    """
+    ped = ped or {}
+    in_vcf = set(vcf_samples)
+    entries = [ped.get(sample) for sample in vcf_samples]
+    families = [
+        entry.family_id for entry in entries
+        if entry is not None and (entry.father in in_vcf or entry.mother in in_vcf)
+    ]
+    roles = ["child"] * len(vcf_samples)
+    if families:
+        family_id = families[0]
+        if len(set(families)) > 1:
+            logging.warning(
+                f"{vcf_path} has trios of families {sorted(set(families))}; only family {family_id} is annotated"
+            )
+        first = next(entry for entry in entries if entry is not None and entry.family_id == family_id
+                     and (entry.father in in_vcf or entry.mother in in_vcf))
+        father = first.father if first.father in in_vcf else None
+        mother = first.mother if first.mother in in_vcf else None
+        children = [
+            idx for idx, entry in enumerate(entries)
+            if entry is not None and (entry.father, entry.mother) == (first.father, first.mother)
+        ]
+        proband = next((idx for idx in children if entries[idx].affected_status == "affected"), children[0])
+        for idx in children:
+            if idx == proband:
+                roles[idx] = "proband"
+            else:
+                roles[idx] = {"Male": "brother", "Female": "sister"}.get(entries[idx].sex, "sibling")
+        for idx, sample in enumerate(vcf_samples):
+            if sample == father:
+                roles[idx] = "father"
+            elif sample == mother:
+                roles[idx] = "mother"
+
+    experiments = [
+        Experiment(
+            seq_id=idx + 1,
+            task_id=1,
+            patient_id=idx + 1,
+            aliquot=sample,
+            family_role=roles[idx],
+            affected_status=entry.affected_status if entry else "",
+            sex=entry.sex if entry else "Unknown",
+            experimental_strategy="Unknown",
+        )
+        for idx, (sample, entry) in enumerate(zip(vcf_samples, entries))
+    ]
+    return Case(case_id=case_id, part=1, vcf_filepath=vcf_path, analysis_type="WGS", experiments=experiments)
 
 
 class Pedigree:
@@ -11,14 +133,20 @@ class Pedigree:
     Attributes:
        experiments (list[Case.Experiment]): A list of experiments corresponding to the VCF samples,
            ordered as they appear in the VCF file.
+        sample_indices (list[int]): The VCF sample index of each experiment.
         father_experiment (Case.Experiment or None): The experiment associated with the father, if available.
         mother_experiment (Case.Experiment or None): The experiment associated with the mother, if available.
         is_father_affected (bool): Indicates if the father is affected by the condition.
         is_mother_affected (bool): Indicates if the mother is affected by the condition.
         father_seq_id (str or None): The sequence ID of the father, if available.
         mother_seq_id (str or None): The sequence ID of the mother, if available.
+        father_index (int or None): The VCF sample index of the father, if available.
+        mother_index (int or None): The VCF sample index of the mother, if available.
         progenies (list[Case.Experiment]): A list of experiments for progenies (e.g., proband, brother, sister).
+        progeny_indices (list[int]): The VCF sample index of each progeny.
         is_family (bool): Indicates if the pedigree represents a family (requires at least one parent and one progeny).
+        occurrence_indices (list[int]): Indexes into `experiments` of the samples that get an occurrence row.
+            There is one row per seq_id; when experiments share a seq_id the last one wins.
 
     Methods:
         __init__(case: Case, vcf_samples: list[str]):
@@ -27,15 +155,27 @@ class Pedigree:
     """
 
     def __init__(self, case: Case, vcf_samples: list[str]):
+        by_aliquot: dict[str, Experiment] = {}
+        for exp in case.experiments:
+            by_aliquot.setdefault(exp.aliquot, exp)
         self.experiments = []
+        self.sample_indices = []
         # We save the experiments in the order of the samples in the VCF file
-        for vcf_sample in vcf_samples:
-            experiment = next((exp for exp in case.experiments if exp.aliquot == vcf_sample), None)
+        for sample_index, vcf_sample in enumerate(vcf_samples):
+            experiment = by_aliquot.get(vcf_sample)
             if experiment:
                 self.experiments.append(experiment)
+                self.sample_indices.append(sample_index)
+
+        self.occurrence_indices = list({exp.seq_id: idx for idx, exp in enumerate(self.experiments)}.values())
 
-        self.father_experiment = next((exp for exp in self.experiments if exp.family_role == "father"), None)
-        self.mother_experiment = next((exp for exp in self.experiments if exp.family_role == "mother"), None)
+        roles = [exp.family_role for exp in self.experiments]
+        father = roles.index("father") if "father" in roles else None
+        mother = roles.index("mother") if "mother" in roles else None
+        self.father_experiment = self.experiments[father] if father is not None else None
+        self.mother_experiment = self.experiments[mother] if mother is not None else None
+        self.father_index = self.sample_indices[father] if father is not None else None
+        self.mother_index = self.sample_indices[mother] if mother is not None else None
         self.is_father_affected = (
             self.father_experiment.affected_status == "affected" if self.father_experiment else False
         )
@@ -46,6 +186,8 @@ class Pedigree:
         self.father_seq_id = self.father_experiment.seq_id if self.father_experiment else None
         self.mother_seq_id = self.mother_experiment.seq_id if self.mother_experiment else None
 
-        self.progenies = [exp for exp in self.experiments if exp.family_role in ["proband", "brother", "sister"]]
+        progenies = [idx for idx, role in enumerate(roles) if role in PROGENY_ROLES]
+        self.progenies = [self.experiments[idx] for idx in progenies]
+        self.progeny_indices = [self.sample_indices[idx] for idx in progenies]
 
         self.is_family = (self.mother_seq_id or self.father_seq_id) and len(self.progenies) > 0
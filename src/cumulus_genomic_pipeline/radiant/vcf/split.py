@@ -0,0 +1,244 @@
+"""
+Decomposition of multi-allelic records into one biallelic record per ALT allele, as
+`bcftools norm -m-` would write them, inside the streaming pass.
+
+`AlleleSplitter.split` decodes the FORMAT arrays of a record once and returns an `AlleleRecord`
+per ALT allele. An `AlleleRecord` has the attributes of a `cyvcf2.Variant` the table blocks read,
+so the blocks take it in place of a record:
+    - ALT: The one ALT allele. REF, POS and END are left as they are (no trimming), so the locus
+      is the same as after `bcftools norm -m-`.
+    - GT: The allele becomes 1, the other ALT alleles 0; missing calls and phase are kept.
+      `gt_types` is derived from the new calls with the rules cyvcf2 applies to a split VCF.
+    - AD and other Number=R fields keep the REF and allele values, Number=A fields the allele
+      value. The depths and allele fraction are recomputed from the new AD the way cyvcf2 does.
+    - CSQ: The VEP entries of the allele, matched on ALLELE_NUM when the CSQ header has it, and
+      otherwise on the Allele field.
+
+Other FORMAT fields (e.g. PL) are passed through unsplit; the occurrence table does not read them.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from cyvcf2 import VCF, Variant
+
+from cumulus_genomic_pipeline.radiant.vcf.consequence import CSQ_FORMAT_FIELD
+
+# cyvcf2 gt_types codes.
+HOM_REF, HET, UNKNOWN, HOM_ALT = 0, 1, 2, 3
+# gt_types of a split call from its first two alleles, indexed by [first + 1, second + 2]; the
+# second allele is -2 for haploid calls. cyvcf2 only reports UNKNOWN for "./." when every allele
+# of the row is missing, i.e. not when a higher ploidy elsewhere in the record pads it.
+_GT_TYPES = np.array([
+    # second: end, missing, 0, 1
+    [UNKNOWN, HOM_ALT, HOM_REF, HET],  # first missing
+    [HOM_REF, HOM_REF, HOM_REF, HET],  # first 0
+    [HOM_ALT, HET, HET, HOM_ALT],  # first 1
+], dtype=np.int32)
+
+
+@dataclass(slots=True)
+class _Genotype:
+    # Stands in for cyvcf2's Genotypes, of which the blocks only call `array`.
+    values: np.ndarray
+
+    def array(self) -> np.ndarray:
+        return self.values
+
+
+class AlleleInfo:
+    """
+    INFO of one allele: Number=A and Number=R values are reduced to the allele, CSQ to its entries.
+    """
+
+    __slots__ = ('info', 'allele', 'numbers', 'csq')
+
+    def __init__(self, info, allele: int, numbers: dict[str, str], csq: str | None):
+        self.info = info
+        self.allele = allele
+        self.numbers = numbers
+        self.csq = csq
+
+    def get(self, key: str, default=None):
+        if key == CSQ_FORMAT_FIELD:
+            return self.csq if self.csq is not None else default
+        value = self.info.get(key, default)
+        if not isinstance(value, tuple):
+            return value
+        number = self.numbers.get(key)
+        if number == 'A':
+            return value[self.allele - 1]
+        if number == 'R':
+            return (value[0], value[self.allele])
+        return value
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+
+_MISSING = object()
+
+
+class AlleleRecord:
+    """
+    One ALT allele of a multi-allelic record. Attributes not split per allele come from the record.
+    """
+
+    __slots__ = (
+        'record', 'allele', 'ALT', 'INFO', 'genotype', 'gt_types', 'gt_ref_depths', 'gt_alt_depths',
+        'gt_depths', 'gt_alt_freqs', '_formats',
+    )
+
+    def __init__(self, record: Variant, allele: int, info: AlleleInfo, formats: dict[str, np.ndarray]):
+        self.record = record
+        self.allele = allele
+        self.ALT = [record.ALT[allele - 1]]
+        self.INFO = info
+        self._formats = formats
+
+    def format(self, name: str) -> np.ndarray | None:
+        values = self._formats.get(name)
+        return values if values is not None else self.record.format(name)
+
+    def __getattr__(self, name: str):
+        return getattr(self.record, name)
+
+
+class AlleleSplitter:
+    """
+    Splits the multi-allelic records of one VCF. Built once per VCF, from its header.
+
+    Attributes:
+        info_numbers (dict[str, str]): Number of each INFO field, e.g. 'A' or 'R'.
+        format_numbers (dict[str, str]): Number of each FORMAT field.
+        allele_num (int | None): Index of ALLELE_NUM in the CSQ fields, if VEP wrote it.
+        csq_allele (int): Index of Allele in the CSQ fields.
+    """
+
+    def __init__(self, vcf: VCF, csq_fields: dict[str, int]):
+        self.info_numbers: dict[str, str] = {}
+        self.format_numbers: dict[str, str] = {}
+        for header in vcf.header_iter():
+            fields = header.info()
+            if fields.get('HeaderType') == 'INFO':
+                self.info_numbers[fields['ID']] = fields.get('Number')
+            elif fields.get('HeaderType') == 'FORMAT':
+                self.format_numbers[fields['ID']] = fields.get('Number')
+        self.allele_num = csq_fields.get('ALLELE_NUM')
+        self.csq_allele = csq_fields.get('Allele', 0)
+
+    def split(self, record: Variant) -> list[AlleleRecord]:
+        alts = record.ALT
+        csqs = self._split_csq(record.INFO.get(CSQ_FORMAT_FIELD, None), record.REF, alts)
+        genotype = record.genotype.array()
+        calls = genotype[:, :-1]
+        split_formats = {
+            name: record.format(name) for name in record.FORMAT if self.format_numbers.get(name) in ('A', 'R')
+        }
+        records = []
+        for allele in range(1, len(alts) + 1):
+            formats = {}
+            for name, values in split_formats.items():
+                if values is None:
+                    continue
+                if self.format_numbers[name] == 'R':
+                    formats[name] = _columns(values, (0, allele))
+                else:
+                    formats[name] = _columns(values, (allele - 1,))
+            split = AlleleRecord(record, allele, AlleleInfo(record.INFO, allele, self.info_numbers, csqs[allele - 1]), formats)
+
+            allele_calls = np.where(calls > 0, calls == allele, calls).astype(genotype.dtype)
+            split.genotype = _Genotype(np.concatenate([allele_calls, genotype[:, -1:]], axis=1))
+            split.gt_types = _gt_types(allele_calls)
+            ad = formats.get('AD')
+            if ad is not None:
+                _set_depths(split, ad)
+            else:
+                missing = np.full(len(calls), -1, dtype=np.int32)
+                split.gt_ref_depths = split.gt_alt_depths = split.gt_depths = missing
+                split.gt_alt_freqs = missing.astype(np.float64)
+            records.append(split)
+        return records
+
+    def _split_csq(self, csq: str | None, ref: str, alts: list[str]) -> list[str | None]:
+        """
+        Returns the CSQ entries of each ALT allele, joined back into one CSQ value (None if there are none).
+        """
+        if not csq:
+            return [None] * len(alts)
+        entries = csq.split(',')
+        if self.allele_num is not None:
+            keys = [_csq_value(entry, self.allele_num) for entry in entries]
+            alleles = [str(allele) for allele in range(1, len(alts) + 1)]
+        else:
+            keys = [_csq_value(entry, self.csq_allele) for entry in entries]
+            alleles = _csq_alleles(ref, alts, set(keys))
+        return [','.join(entry for entry, key in zip(entries, keys) if key == allele) or None for allele in alleles]
+
+
+def _csq_value(entry: str, index: int) -> str:
+    fields = entry.split('|', index + 1)
+    return fields[index] if index < len(fields) else ''
+
+
+def _csq_alleles(ref: str, alts: list[str], found: set[str]) -> list[str]:
+    """
+    The CSQ Allele of each ALT allele. VEP drops the first base when every allele shares it; with
+    --minimal it trims each ALT against REF on its own. The first representation that is distinct
+    per allele and accounts for every CSQ entry is used.
+    """
+    candidates = []
+    if all(allele[:1] == ref[:1] for allele in alts):
+        candidates.append([allele[1:] or '-' for allele in alts])
+    candidates.append([_minimal(ref, alt) for alt in alts])
+    candidates.append(list(alts))
+    for alleles in candidates:
+        if len(set(alleles)) == len(alleles) and found <= set(alleles):
+            return alleles
+    return candidates[0]
+
+
+def _minimal(ref: str, alt: str) -> str:
+    start = 0
+    while start < min(len(ref), len(alt)) and ref[start] == alt[start]:
+        start += 1
+    end = 0
+    while end < min(len(ref), len(alt)) - start and ref[-1 - end] == alt[-1 - end]:
+        end += 1
+    return alt[start:len(alt) - end] or '-'
+
+
+def _columns(values: np.ndarray, columns: tuple[int, ...]) -> np.ndarray:
+    # Values past a sample's vector end stay missing.
+    if max(columns) < values.shape[1]:
+        return values[:, list(columns)]
+    out = np.full((len(values), len(columns)), _missing_value(values), dtype=values.dtype)
+    for i, column in enumerate(columns):
+        if column < values.shape[1]:
+            out[:, i] = values[:, column]
+    return out
+
+
+def _missing_value(values: np.ndarray):
+    return np.nan if values.dtype.kind == 'f' else np.iinfo(values.dtype).min
+
+
+def _gt_types(calls: np.ndarray) -> np.ndarray:
+    first = calls[:, 0]
+    second = calls[:, 1] if calls.shape[1] > 1 else np.full(len(calls), -2, dtype=calls.dtype)
+    types = _GT_TYPES[first + 1, second + 2]
+    types[(calls == -1).all(axis=1)] = UNKNOWN
+    return types
+
+
+def _set_depths(split: AlleleRecord, ad: np.ndarray):
+    # Negative values are cyvcf2's missing and vector end markers, reported as -1.
+    ref = np.where(ad[:, 0] >= 0, ad[:, 0], -1).astype(np.int32)
+    alt = np.where(ad[:, 1] >= 0, ad[:, 1], -1).astype(np.int32)
+    depth = np.where((ref < 0) & (alt < 0), -1, np.maximum(ref, 0) + np.maximum(alt, 0)).astype(np.int32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(depth > 0, np.maximum(alt, 0) / depth, np.where(depth == 0, 0.0, -1.0))
+    split.gt_ref_depths, split.gt_alt_depths, split.gt_depths, split.gt_alt_freqs = ref, alt, depth, fraction
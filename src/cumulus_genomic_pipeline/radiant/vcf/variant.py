@@ -13,16 +13,25 @@ Dependencies:
 
 Exports:
     - SCHEMA: A merged Iceberg schema including common and annotation-specific fields.
-    - process_variant: Function to extract and transform a variant record into a row matching the schema.
+    - process_variant: Function to extract and transform a variant record into a row of the variant table builder.
+    - VariantBlock: Accumulates variant rows for a block of records, filled from the block's picked consequences.
 """
 
+import numpy as np
+import pyarrow as pa
 from cyvcf2 import Variant
 
-from cumulus_genomic_pipeline.radiant.vcf.common import Common
+from cumulus_genomic_pipeline.radiant.vcf.common import Common, add_common, add_commons
+from cumulus_genomic_pipeline.schema.schema import BatchBuilder
 
 
+PICKED_COLUMNS = (
+    "variant_class", "symbol", "consequences", "vep_impact", "impact_score", "mane_select", "is_mane_select",
+    "is_mane_plus", "is_canonical", "hgvsg", "hgvsp", "hgvsc", "dna_change", "aa_change", "transcript_id",
+)
 
-def process_variant(record: Variant, picked_consequence: dict, common: Common):
+
+def process_variant(record: Variant, picked_consequence: dict | None, common: Common, builder: BatchBuilder):
     """
     Processes a single VCF variant record with transcript consequence annotations.
 
@@ -30,40 +39,59 @@ def process_variant(record: Variant, picked_consequence: dict, common: Common):
         record (Variant): A cyvcf2.Variant object representing a variant record from a VCF file.
         picked_consequence (dict): A dictionary containing the most relevant transcript annotation (e.g., VEP output).
         common (Common): A utility object containing common precomputed fields (like position, alleles, etc.).
+        builder (BatchBuilder): Accumulator for the variant table; one row is appended.
+    """
+    add_common(builder, common, 1)
+    columns = builder.columns
+    columns["rsnumber"].append(record.ID)
+    if picked_consequence:
+        for name in PICKED_COLUMNS:
+            columns[name].append(picked_consequence.get(name))
+    builder.end_rows(1)
 
-    Returns:
-        dict: A dictionary with keys matching the SCHEMA fields, ready to be written to an Iceberg table.
+
+class VariantBlock:
+    """
+    Variant rows for a block of records. The picked consequence columns are only known once the
+    `ConsequenceBlock` of the same records is flushed, so rows are appended on `flush`.
     """
 
-    variant = {
-        "case_id": common.case_id,
-        "locus": common.locus,
-        "locus_hash": common.locus_hash,
-        "chromosome": common.chromosome,
-        "start": common.start,
-        "end": common.end,
-        "reference": common.reference,
-        "alternate": common.alternate,
-        "rsnumber": record.ID,
-    }
-    if picked_consequence:
-        picked_fields = {
-            "variant_class": picked_consequence.get("variant_class"),
-            "symbol": picked_consequence.get("symbol"),
-            "consequences": picked_consequence.get("consequences"),
-            "vep_impact": picked_consequence.get("vep_impact"),
-            "impact_score": picked_consequence.get("impact_score"),
-            "mane_select": picked_consequence.get("mane_select"),
-            "is_mane_select": picked_consequence.get("is_mane_select"),
-            "is_mane_plus": picked_consequence.get("is_mane_plus"),
-            "is_canonical": picked_consequence.get("is_canonical"),
-            "hgvsg": picked_consequence.get("hgvsg"),
-            "hgvsp": picked_consequence.get("hgvsp"),
-            "hgvsc": picked_consequence.get("hgvsc"),
-            "dna_change": picked_consequence.get("dna_change"),
-            "aa_change": picked_consequence.get("aa_change"),
-            "transcript_id": picked_consequence.get("transcript_id"),
-        }
-
-        variant = {**variant, **picked_fields}
-    return variant
+    def __init__(self, builder: BatchBuilder):
+        self.builder = builder
+        self.ids: list[str | None] = []
+        self.commons: list[Common] = []
+
+    def __len__(self) -> int:
+        return len(self.commons)
+
+    def add(self, record: Variant, common: Common):
+        self.ids.append(record.ID)
+        self.commons.append(common)
+
+    def flush(self, picked: dict[str, pa.Array], keep: np.ndarray | None = None) -> int:
+        """
+        Appends one row per record to the builder and empties the block.
+
+        Args:
+            picked (dict[str, pa.Array]): Primary consequence of each record written, as returned by
+                `ConsequenceBlock.flush` with the same `keep`.
+            keep (np.ndarray | None): Boolean mask of the records to write, or None for all of them.
+
+        Returns:
+            int: The number of rows appended.
+        """
+        if keep is not None:
+            self.ids = [rsnumber for rsnumber, kept in zip(self.ids, keep) if kept]
+            self.commons = [common for common, kept in zip(self.commons, keep) if kept]
+        n = len(self.commons)
+        if n == 0:
+            return 0
+        add_commons(self.builder, self.commons)
+        columns = self.builder.columns
+        columns["rsnumber"].extend(self.ids)
+        for name in PICKED_COLUMNS:
+            columns[name].extend(picked[name])
+        self.builder.end_rows(n)
+        self.ids = []
+        self.commons = []
+        return n
@@ -0,0 +1,146 @@
+"""
+Plans and runs the units of work for a batch of VCFs.
+
+Every input VCF is one case, and so is every case definition, which selects its samples from a
+VCF (several cases can share one joint-called VCF). A case is either processed as a single unit
+or, when sharding is enabled and the file can be indexed, as one unit per region shard. Units
+are started largest-first (longest processing time first) on a bounded process pool, so the
+biggest files do not end up as stragglers after everything else has finished.
+"""
+
+import logging
+import multiprocessing
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case
+from cumulus_genomic_pipeline.sharding import Shard, plan_shards
+from cumulus_genomic_pipeline.vcf_index import ensure_index, is_bgzf
+
+
+@dataclass(frozen=True, slots=True)
+class WorkUnit:
+    """
+    One call to `_process_vcf`.
+
+    Attributes:
+        vcf_path (str): Input VCF.
+        case_id (int): Case the VCF belongs to: the case definition's id, or else assigned in input
+            order starting from 1.
+        cost (float): Estimated relative cost, used for ordering. Compressed bytes of input covered.
+        shard (Shard | None): Region to process, or None for the whole file.
+        index_path (Path | None): Index used for region queries when `shard` is set.
+        case (Case | None): Case definition; only its samples are decoded. None for a VCF given
+            without one, which has an experiment for every sample.
+    """
+
+    vcf_path: str
+    case_id: int
+    cost: float
+    shard: Shard | None = None
+    index_path: Path | None = None
+    case: Case | None = None
+
+
+def plan_work(inputs: VcfProcessingInput) -> list[WorkUnit]:
+    """
+    Expands the input VCFs into work units, ordered by decreasing estimated cost.
+
+    Shards of one file share its compressed size evenly; that is only an estimate, but it keeps
+    shards of a large file ahead of small whole files in the queue.
+    """
+    inputs_by_case: list[tuple[str, int, Case | None]] = [
+        (vcf_path, case_id, None) for case_id, vcf_path in enumerate(inputs.vcf_files, start=1)
+    ]
+    inputs_by_case.extend((case.vcf_filepath, case.case_id, case) for case in inputs.cases)
+    units: list[WorkUnit] = []
+    for vcf_path, case_id, case in inputs_by_case:
+        size = os.path.getsize(vcf_path)
+        if inputs.shard and is_bgzf(vcf_path):
+            if case is not None and case.index_vcf_filepath:
+                index_path = Path(case.index_vcf_filepath)
+            else:
+                index_path = ensure_index(vcf_path, inputs.output_dir)
+            shards = plan_shards(vcf_path, index_path, inputs.shard_size)
+            units.extend(
+                WorkUnit(vcf_path, case_id, size / len(shards), shard, index_path, case) for shard in shards
+            )
+        else:
+            if inputs.shard:
+                logging.warning(f'{vcf_path} is not BGZF-compressed and cannot be indexed. Processing it as one unit.')
+            units.append(WorkUnit(vcf_path, case_id, size, case=case))
+    # sorted() is stable, so equal-cost shards keep genome order.
+    return sorted(units, key=lambda unit: unit.cost, reverse=True)
+
+
+def run_work(
+        units: list[WorkUnit], workers: int, process: Callable[[WorkUnit], Any],
+        done: Callable[[WorkUnit, Any], None] | None = None, initializer: Callable | None = None,
+        initargs: tuple = (), preload: tuple[str, ...] = ()
+    ):
+    """
+    Runs `process` on every unit, in order, with at most `workers` units in flight.
+    With a single worker, units run in this process, which keeps debugging and profiling simple.
+    `done` is called in this process with each unit that succeeded and its result, as they finish.
+    `initializer(*initargs)` runs once in every process that runs units, this one included.
+    Pool workers start with the `preload` modules imported, see `_pool_context`.
+
+    Raises:
+        RuntimeError: If any unit failed. The remaining units still run first.
+    """
+    failed: list[WorkUnit] = []
+    if workers <= 1:
+        if initializer:
+            initializer(*initargs)
+        for unit in units:
+            try:
+                result = process(unit)
+            except Exception:
+                logging.exception(f'Failed to process {_describe(unit)}')
+                failed.append(unit)
+                continue
+            if done:
+                done(unit, result)
+    else:
+        # Only pools need concurrent.futures; single-worker runs start without it.
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(
+                max_workers=workers, mp_context=_pool_context(preload), initializer=initializer, initargs=initargs
+            ) as pool:
+            futures = {pool.submit(process, unit): unit for unit in units}
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    result = future.result()
+                    logging.info(f'Finished {_describe(unit)}')
+                except Exception:
+                    logging.exception(f'Failed to process {_describe(unit)}')
+                    failed.append(unit)
+                    continue
+                if done:
+                    done(unit, result)
+    if failed:
+        raise RuntimeError(f'{len(failed)} of {len(units)} work units failed: {[_describe(u) for u in failed]}')
+
+
+def _pool_context(preload: tuple[str, ...]):
+    """
+    Returns the multiprocessing context of the pool, such that workers do not import the `preload`
+    modules (pyarrow, cyvcf2, ...) again: forked from this process, which has them, or else from a
+    forkserver that imports them once for all workers (where the default start method is spawn,
+    e.g. macOS, or forkserver without a preload, as on Linux from Python 3.14).
+    """
+    if multiprocessing.get_start_method() == 'fork' or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(list(preload))
+    return context
+
+
+def _describe(unit: WorkUnit) -> str:
+    return f'{unit.vcf_path} ({unit.shard.region})' if unit.shard else unit.vcf_path
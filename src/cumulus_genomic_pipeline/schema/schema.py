@@ -1,5 +1,6 @@
 import logging
 
+import numpy as np
 import pyarrow as pa
 from pyarrow import Schema
 import pyarrow.parquet as pq
@@ -118,4 +119,212 @@ variant_schema: Schema = pa.schema([
 
 consequence_schema = pa.unify_schemas([consequence_schema, _common])
 occurance_schema = pa.unify_schemas([occurance_schema, _common])
-variant_schema = pa.unify_schemas([variant_schema, _common])
\ No newline at end of file
+variant_schema = pa.unify_schemas([variant_schema, _common])
+
+# Site layout: the record level columns of the occurrence table (QUAL, FILTER and INFO) go to a sites
+# table with one row per record, and occurrences keep their sample columns and the columns sites are
+# joined, sorted and partitioned on.
+SITE_COLUMNS = tuple(
+    name for name in occurance_schema.names if name in ('quality', 'filter') or name.startswith('info_')
+)
+OCCURRENCE_SITE_KEYS = ('case_id', 'part', 'locus_hash', 'chromosome', 'start')
+sites_schema: Schema = pa.schema(
+    [occurance_schema.field('part')] + [occurance_schema.field(name) for name in SITE_COLUMNS] + list(_common)
+)
+site_occurance_schema: Schema = pa.schema([
+    field for field in occurance_schema
+    if field.name not in SITE_COLUMNS and (field.name not in _common.names or field.name in OCCURRENCE_SITE_KEYS)
+])
+
+# Schema profiles. "compact" stores low-cardinality string columns as Arrow dictionaries, from batch
+# building through to Parquet dictionary pages. Columns with a closed set of values get int8 indexes,
+# i.e. a small-int enum that still reads back as strings; open sets get indexes wide enough for them.
+DEFAULT_PROFILE = 'default'
+COMPACT_PROFILE = 'compact'
+SCHEMA_PROFILES = (DEFAULT_PROFILE, COMPACT_PROFILE)
+COMPACT_INDEX_TYPES = {
+    'vep_impact': pa.int8(),
+    'variant_class': pa.int8(),
+    'zygosity': pa.int8(),
+    'father_zygosity': pa.int8(),
+    'mother_zygosity': pa.int8(),
+    'parental_origin': pa.int8(),
+    'transmission_mode': pa.int8(),
+    'chromosome': pa.int16(),
+    'filter': pa.int16(),
+    'source': pa.int16(),
+    'biotype': pa.int16(),
+    'symbol': pa.int32(),
+}
+
+
+def compact_schema(schema: Schema) -> Schema:
+    """
+    Returns `schema` with the columns of `COMPACT_INDEX_TYPES` dictionary encoded.
+    """
+    return pa.schema(
+        [
+            field.with_type(pa.dictionary(COMPACT_INDEX_TYPES[field.name], field.type))
+            if field.name in COMPACT_INDEX_TYPES else field
+            for field in schema
+        ],
+        metadata=schema.metadata,
+    )
+
+
+def locus_key_schema(schema: Schema) -> Schema:
+    """
+    Returns `schema` with the SHA-256 `locus_hash` column replaced by the int64 `locus_key`.
+    """
+    index = schema.get_field_index('locus_hash')
+    return schema.set(index, pa.field('locus_key', pa.int64(), nullable=False))
+
+
+def table_schemas(
+        profile: str = DEFAULT_PROFILE, locus_key: str = 'sha256', site_table: bool = False
+    ) -> tuple[Schema, ...]:
+    """
+    Returns the (variant, consequence, occurance) schemas of a schema profile and locus key mode.
+    With `site_table`, the occurance schema has no site columns and the sites schema comes fourth.
+
+    Raises:
+        ValueError: If the profile is not one of `SCHEMA_PROFILES`.
+    """
+    if site_table:
+        schemas = (variant_schema, consequence_schema, site_occurance_schema, sites_schema)
+    else:
+        schemas = (variant_schema, consequence_schema, occurance_schema)
+    if locus_key != 'sha256':
+        schemas = tuple(locus_key_schema(schema) for schema in schemas)
+    if profile == DEFAULT_PROFILE:
+        return schemas
+    elif profile == COMPACT_PROFILE:
+        return tuple(compact_schema(schema) for schema in schemas)
+    raise ValueError(f"Unknown schema profile '{profile}', expected one of {SCHEMA_PROFILES}")
+
+
+class ColumnBuffer:
+    """
+    Accumulates the values of one column before conversion to Arrow.
+
+    Scalars are appended to a plain list; whole arrays (NumPy or Arrow) are kept as separate
+    chunks so they are converted without going through Python objects. `finish` concatenates
+    adjacent NumPy chunks, converts every chunk with the column's Arrow type and concatenates
+    the results.
+    """
+
+    __slots__ = ('type', 'values', 'chunks', 'length')
+
+    def __init__(self, type: pa.DataType):
+        self.type = type
+        self.values: list = []
+        self.chunks: list = []
+        self.length = 0
+
+    def append(self, value):
+        self.values.append(value)
+        self.length += 1
+
+    def repeat(self, value, n: int):
+        self.values.extend([value] * n)
+        self.length += n
+
+    def extend(self, values, mask=None):
+        """
+        Appends a sequence of values. Lists are copied into the scalar buffer; NumPy and Arrow
+        arrays are kept as a chunk, with an optional boolean NumPy `mask` marking nulls.
+        """
+        if isinstance(values, list) and mask is None:
+            self.values.extend(values)
+        else:
+            self._seal()
+            self.chunks.append((values, mask))
+        self.length += len(values)
+
+    def finish(self) -> pa.Array:
+        self._seal()
+        arrays = []
+        numpy_run = []
+        for values, mask in self.chunks:
+            if isinstance(values, np.ndarray):
+                numpy_run.append((values, mask))
+                continue
+            if numpy_run:
+                arrays.append(_numpy_to_arrow(numpy_run, self.type))
+                numpy_run = []
+            arrays.append(_to_arrow(values, mask, self.type))
+        if numpy_run:
+            arrays.append(_numpy_to_arrow(numpy_run, self.type))
+        self.chunks = []
+        self.length = 0
+        if len(arrays) == 1:
+            return arrays[0]
+        return pa.concat_arrays(arrays) if arrays else pa.array([], type=self.type)
+
+    def _seal(self):
+        if self.values:
+            self.chunks.append((self.values, None))
+            self.values = []
+
+
+def _numpy_to_arrow(chunks: list[tuple[np.ndarray, np.ndarray | None]], type: pa.DataType) -> pa.Array:
+    # One conversion per run of NumPy chunks; per record chunks are far too small to convert one by one.
+    if len(chunks) == 1:
+        return _to_arrow(*chunks[0], type)
+    values = np.concatenate([values for values, _ in chunks])
+    mask = None
+    if any(mask is not None for _, mask in chunks):
+        mask = np.concatenate([np.zeros(len(v), dtype=bool) if m is None else m for v, m in chunks])
+    return _to_arrow(values, mask, type)
+
+
+def _to_arrow(values, mask, type: pa.DataType) -> pa.Array:
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        array = values if values.type == type else values.cast(type)
+        return array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+    return pa.array(values, type=type, mask=mask)
+
+
+class BatchBuilder:
+    """
+    Columnar accumulator for one table schema.
+
+    Processing functions add the values for a group of rows (e.g. all consequences of one
+    record) column by column with `append`, `repeat` and `extend`, then call `end_rows`.
+    Columns that were not given values for those rows are padded with nulls, so optional
+    columns only need to be touched when they have data. `flush` returns the accumulated rows
+    as a `RecordBatch` and resets the builder.
+
+    Attributes:
+        schema (Schema): Arrow schema of the table.
+        columns (dict[str, ColumnBuffer]): Buffer per column, by field name.
+        num_rows (int): Rows accumulated since the last flush.
+    """
+
+    __slots__ = ('schema', 'columns', 'num_rows')
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.columns: dict[str, ColumnBuffer] = {field.name: ColumnBuffer(field.type) for field in schema}
+        self.num_rows = 0
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def end_rows(self, n: int):
+        self.num_rows += n
+        for name, column in self.columns.items():
+            if column.length < self.num_rows:
+                column.repeat(None, self.num_rows - column.length)
+            elif column.length > self.num_rows:
+                raise ValueError(f"Column '{name}' has {column.length} values for {self.num_rows} rows")
+
+    def flush(self) -> pa.RecordBatch:
+        arrays = []
+        for field in self.schema:
+            try:
+                arrays.append(self.columns[field.name].finish())
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"Column '{field.name}' does not match {field.type}: {e}") from e
+        self.num_rows = 0
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
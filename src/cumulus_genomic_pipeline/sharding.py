@@ -0,0 +1,72 @@
+"""
+Splits an indexed VCF into genomic region shards that can be processed independently.
+
+A shard owns the records whose POS falls inside its interval. Region queries also return
+records that merely overlap the interval (e.g. a deletion starting just before it), so
+workers filter with `Shard.owns` to make sure every record is emitted by exactly one shard.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from cyvcf2 import VCF
+
+from cumulus_genomic_pipeline.vcf_index import index_extents
+
+
+@dataclass(frozen=True, slots=True)
+class Shard:
+    """
+    A contiguous region of one contig.
+
+    Attributes:
+        part (int): Shard number, in genome order. Written to the `part` column and used in output file names.
+        contig (str): Contig name exactly as it appears in the VCF, e.g. 'chr11'.
+        start (int): 1-based inclusive start position.
+        end (int | None): 1-based inclusive end position, or None to run to the end of the contig.
+    """
+
+    part: int
+    contig: str
+    start: int = 1
+    end: int | None = None
+
+    @property
+    def region(self) -> str:
+        return f'{self.contig}:{self.start}-{self.end}' if self.end else self.contig
+
+    def owns(self, pos: int) -> bool:
+        return self.start <= pos and (self.end is None or pos <= self.end)
+
+
+def plan_shards(vcf_path: str, index_path: Path, shard_size: int | None = None) -> list[Shard]:
+    """
+    Plans the shards for a VCF from its index and header.
+
+    Args:
+        vcf_path (str): Path to the VCF.
+        index_path (Path): Tabix or CSI index for the VCF.
+        shard_size (int | None): Shard length in base pairs. None or 0 gives one shard per contig.
+
+    Returns:
+        list[Shard]: Shards in genome (index) order, numbered from 0. Only contigs present in
+        the index are included, and only up to the last indexed record, so sparse inputs such as
+        exomes or single-gene extracts do not produce thousands of empty shards. A CSI index
+        without contig names falls back to the header contigs.
+    """
+    vcf = VCF(vcf_path)
+    lengths = dict(zip(vcf.seqnames, vcf.seqlens))
+    vcf.close()
+    extents = index_extents(index_path) or dict.fromkeys(lengths)
+
+    shards: list[Shard] = []
+    for contig, extent in extents.items():
+        length = min(filter(None, (lengths.get(contig), extent)), default=None)
+        if not shard_size or not length:
+            shards.append(Shard(part=len(shards), contig=contig))
+            continue
+        for start in range(1, length + 1, shard_size):
+            # The last shard is open-ended so records past the declared length are not lost.
+            end = start + shard_size - 1 if start + shard_size <= length else None
+            shards.append(Shard(part=len(shards), contig=contig, start=start, end=end))
+    return shards
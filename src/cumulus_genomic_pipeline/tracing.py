@@ -0,0 +1,78 @@
+"""
+Sampled trace events of the record loop, written as JSON lines.
+
+Tracing is off unless `install` is given a trace file. Then `unit_trace` returns None, and the
+record loop's only cost is testing that once per record: nothing is formatted or timed. With a
+trace file, every `every`-th record of a unit is processed under a timer and gets a `record`
+event, and the unit's other events are all written:
+
+    - unit: a work unit starts. Its samples and shard region.
+    - record: a sampled record. Its 1-based index in the unit, locus, the variants it was split
+      into, their CSQ transcripts, the time it took and the estimated bytes buffered after it.
+    - flush: the blocks are flushed. Records, rows per table, Arrow bytes, and the time spent
+      waiting on the memory budget and the writers.
+    - done: a unit finishes. Records and wall time.
+
+Every event holds the time (epoch seconds), the event name, the unit (`input`, `case_id`,
+`part`) and the worker's pid. Workers append to the same file: each event is one write() of one
+line to a file opened with O_APPEND, so the lines of concurrent workers do not interleave. Pick
+events out with e.g. `jq 'select(.event == "record")' trace.jsonl`.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+
+_fd: int | None = None
+_every = 1
+
+
+@dataclass(slots=True)
+class UnitTrace:
+    """
+    Writes the trace events of one work unit. `unit` is added to every event.
+    """
+
+    fd: int
+    every: int
+    unit: dict
+
+    def sampled(self, index: int) -> bool:
+        """
+        Whether the record with this 1-based index in the unit gets a `record` event.
+        """
+        return index % self.every == 0
+
+    def emit(self, event: str, **fields):
+        line = json.dumps({'time': time.time(), 'event': event, **self.unit, **fields}, default=str)
+        os.write(self.fd, (line + '\n').encode())
+
+
+def reset(path: str | None):
+    """
+    Empties the trace file at the start of a run, in the main process, before any worker appends to it.
+    """
+    if path:
+        open(path, 'w').close()
+
+
+def install(path: str | None, every: int = 1):
+    """
+    Opens the trace file of this process, or closes it when `path` is None, and sets the record
+    sampling rate. Part of the worker pool initializer.
+    """
+    global _fd, _every
+    if _fd is not None:
+        os.close(_fd)
+    _fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644) if path else None
+    _every = every
+
+
+def unit_trace(vcf_path: str, case_id: int, part: int) -> UnitTrace | None:
+    """
+    Returns the trace of a work unit, or None when tracing is off.
+    """
+    if _fd is None:
+        return None
+    return UnitTrace(_fd, _every, {'input': vcf_path, 'case_id': case_id, 'part': part, 'worker': os.getpid()})
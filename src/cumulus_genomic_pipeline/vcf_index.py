@@ -0,0 +1,296 @@
+"""
+Tabix index discovery and construction for BGZF-compressed VCFs.
+
+Region-sharded processing needs random access into the VCF. cyvcf2 can query an existing
+tabix (.tbi) or CSI index but cannot build one, and we do not want to depend on an htslib
+command line install, so this module carries a small BGZF reader and a tabix writer.
+
+Exports:
+    - find_index: Locates an existing index next to the VCF, or a current one built in the output directory.
+    - ensure_index: Returns an index path, building a .tbi when none exists or the built one is stale.
+    - built_index_path: Where `ensure_index` puts the index it builds.
+    - build_tabix_index: Builds a .tbi for a BGZF-compressed VCF.
+    - index_contigs / index_extents: Lists the contigs that have records according to an index.
+    - is_bgzf / write_bgzf: BGZF detection and writing.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import re
+import struct
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+TBI_SUFFIX = '.tbi'
+CSI_SUFFIX = '.csi'
+
+_BGZF_HEADER = struct.Struct('<BBBBIBBH')
+_BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+_BGZF_MAX_BLOCK = 0xff00
+_TBI_MIN_SHIFT = 14
+_TBI_FORMAT_VCF = 2
+_INFO_END = re.compile(rb'(?:^|;)END=(\d+)')
+
+
+def find_index(vcf_path: str, output_dir: str | None = None) -> Path | None:
+    """
+    Looks for a tabix or CSI index for `vcf_path`.
+
+    Args:
+        vcf_path (str): Path to the VCF.
+        output_dir (str | None): Output directory, where `ensure_index` puts indexes it builds.
+
+    Returns:
+        Path | None: The first index found, or None. A built index is skipped once the VCF changed.
+    """
+    candidates = [Path(vcf_path + TBI_SUFFIX), Path(vcf_path + CSI_SUFFIX)]
+    index = next((c for c in candidates if c.is_file()), None)
+    if index is None and output_dir:
+        built = built_index_path(vcf_path, output_dir)
+        if built.is_file() and built.stat().st_mtime_ns == os.stat(vcf_path).st_mtime_ns:
+            index = built
+    return index
+
+
+def ensure_index(vcf_path: str, output_dir: str) -> Path:
+    """
+    Returns an index for `vcf_path`, building a .tbi in `output_dir` if none exists.
+    Inputs are never modified, so a built index goes next to the outputs rather than the VCF.
+    """
+    index = find_index(vcf_path, output_dir)
+    if index is None:
+        index = built_index_path(vcf_path, output_dir)
+        logging.info(f'No current index found for {vcf_path}, building {index}')
+        tmp = index.with_name(f'.{index.name}.tmp')
+        build_tabix_index(vcf_path, tmp)
+        # The index carries the modification time of the VCF it was built from, see `find_index`.
+        stat = os.stat(vcf_path)
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp, index)
+    return index
+
+
+def built_index_path(vcf_path: str, output_dir: str) -> Path:
+    """
+    Where `ensure_index` builds the index of `vcf_path`: named after the whole input path, so
+    inputs with the same file name in different directories get an index each.
+    """
+    digest = hashlib.sha256(str(Path(vcf_path).resolve()).encode()).hexdigest()[:16]
+    return Path(output_dir) / f'{Path(vcf_path).name}.{digest}{TBI_SUFFIX}'
+
+
+def index_contigs(index_path: Path) -> list[str]:
+    """
+    Lists the contig names stored in a tabix or CSI index, in index order.
+    CSI indexes without a tabix auxiliary header carry no names; an empty list is returned.
+    """
+    return list(index_extents(index_path))
+
+
+def index_extents(index_path: Path) -> dict[str, int | None]:
+    """
+    Maps each contig in a tabix or CSI index to an upper bound on the positions it holds records for.
+
+    For tabix the bound comes from the linear index (one entry per 16kb window up to the last
+    record). CSI has no linear index, so its contigs map to None.
+    """
+    data = gzip.decompress(Path(index_path).read_bytes())
+    if data[:4] == b'TBI\1':
+        (n_ref,) = struct.unpack_from('<i', data, 4)
+        (l_nm,) = struct.unpack_from('<i', data, 32)
+        names = [n.decode() for n in data[36:36 + l_nm].split(b'\0') if n]
+        offset = 36 + l_nm
+        extents: dict[str, int | None] = {}
+        for name in names[:n_ref]:
+            (n_bin,) = struct.unpack_from('<i', data, offset)
+            offset += 4
+            for _ in range(n_bin):
+                (n_chunk,) = struct.unpack_from('<i', data, offset + 4)
+                offset += 8 + 16 * n_chunk
+            (n_intv,) = struct.unpack_from('<i', data, offset)
+            offset += 4 + 8 * n_intv
+            extents[name] = n_intv << _TBI_MIN_SHIFT
+        return extents
+    elif data[:4] == b'CSI\1':
+        (l_aux,) = struct.unpack_from('<i', data, 12)
+        if l_aux < 28:
+            return {}
+        (l_nm,) = struct.unpack_from('<i', data, 16 + 24)
+        names = data[44:44 + l_nm]
+        return {n.decode(): None for n in names.split(b'\0') if n}
+    else:
+        raise ValueError(f'{index_path} is not a tabix or CSI index')
+
+
+def build_tabix_index(vcf_path: str, index_path: Path):
+    """
+    Builds a tabix (.tbi) index for a BGZF-compressed VCF.
+
+    Args:
+        vcf_path (str): Path to a bgzipped VCF. Plain gzip files cannot be indexed.
+        index_path (Path): Where to write the index.
+
+    Raises:
+        ValueError: If the VCF is not BGZF-compressed or is not sorted.
+    """
+    names: list[str] = []
+    refs: list[tuple[dict[int, list[list[int]]], list[int]]] = []
+    current = None
+    last_beg = -1
+    for line, start, end in _iter_lines(vcf_path):
+        if not line or line.startswith(b'#'):
+            continue
+        chrom, pos, _id, ref, _alt, _qual, _filter, info = line.split(b'\t', 8)[:8]
+        name = chrom.decode()
+        if not names or names[-1] != name:
+            if name in names:
+                raise ValueError(f'{vcf_path} is not sorted: contig {name} appears in more than one block')
+            names.append(name)
+            current = ({}, [])
+            refs.append(current)
+            last_beg = -1
+        beg = int(pos) - 1
+        if beg < last_beg:
+            raise ValueError(f'{vcf_path} is not sorted at {name}:{int(pos)}')
+        last_beg = beg
+        info_end = _INFO_END.search(info)
+        stop = max(int(info_end.group(1)) if info_end else 0, beg + len(ref), beg + 1)
+
+        bins, linear = current
+        chunks = bins.setdefault(_reg2bin(beg, stop), [])
+        if chunks and chunks[-1][1] == start:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+        first_window, last_window = beg >> _TBI_MIN_SHIFT, (stop - 1) >> _TBI_MIN_SHIFT
+        if len(linear) <= last_window:
+            linear.extend([0] * (last_window + 1 - len(linear)))
+        for window in range(first_window, last_window + 1):
+            if linear[window] == 0:
+                linear[window] = start
+
+    nm = b''.join(n.encode() + b'\0' for n in names)
+    out = bytearray(b'TBI\1')
+    out += struct.pack('<8i', len(names), _TBI_FORMAT_VCF, 1, 2, 0, ord('#'), 0, len(nm))
+    out += nm
+    for bins, linear in refs:
+        out += struct.pack('<i', len(bins))
+        for bin_id in sorted(bins):
+            chunks = bins[bin_id]
+            out += struct.pack('<Ii', bin_id, len(chunks))
+            for chunk_beg, chunk_end in chunks:
+                out += struct.pack('<QQ', chunk_beg, chunk_end)
+        for window in range(1, len(linear)):
+            if linear[window] == 0:
+                linear[window] = linear[window - 1]
+        out += struct.pack('<i', len(linear))
+        out += struct.pack(f'<{len(linear)}Q', *linear)
+    write_bgzf(index_path, bytes(out))
+
+
+def _reg2bin(beg: int, end: int) -> int:
+    # Standard UCSC/SAM binning scheme for a 0-based half-open interval.
+    end -= 1
+    if beg >> 14 == end >> 14:
+        return ((1 << 15) - 1) // 7 + (beg >> 14)
+    if beg >> 17 == end >> 17:
+        return ((1 << 12) - 1) // 7 + (beg >> 17)
+    if beg >> 20 == end >> 20:
+        return ((1 << 9) - 1) // 7 + (beg >> 20)
+    if beg >> 23 == end >> 23:
+        return ((1 << 6) - 1) // 7 + (beg >> 23)
+    if beg >> 26 == end >> 26:
+        return ((1 << 3) - 1) // 7 + (beg >> 26)
+    return 0
+
+
+def iter_bgzf_blocks(path: str) -> Iterator[tuple[int, int, bytes]]:
+    """
+    Yields (compressed offset, compressed size, uncompressed data) for each BGZF block.
+
+    Raises:
+        ValueError: If the file is not BGZF-compressed.
+    """
+    with open(path, 'rb') as f:
+        coffset = 0
+        while True:
+            header = f.read(_BGZF_HEADER.size)
+            if not header:
+                return
+            id1, id2, _cm, flg, _mtime, _xfl, _os, xlen = _BGZF_HEADER.unpack(header)
+            if id1 != 31 or id2 != 139 or not flg & 4:
+                raise ValueError(f'{path} is not BGZF-compressed; recompress it with bgzip')
+            extra = f.read(xlen)
+            bsize = None
+            i = 0
+            while i + 4 <= len(extra):
+                si1, si2, slen = extra[i], extra[i + 1], struct.unpack_from('<H', extra, i + 2)[0]
+                if si1 == 66 and si2 == 67 and slen == 2:
+                    bsize = struct.unpack_from('<H', extra, i + 4)[0]
+                i += 4 + slen
+            if bsize is None:
+                raise ValueError(f'{path} is not BGZF-compressed; recompress it with bgzip')
+            block_size = bsize + 1
+            rest = f.read(block_size - _BGZF_HEADER.size - xlen)
+            data = zlib.decompress(rest[:-8], -15)
+            yield coffset, block_size, data
+            coffset += block_size
+
+
+def _iter_lines(path: str) -> Iterator[tuple[bytes, int, int]]:
+    # Yields (line, virtual offset of line start, virtual offset just past the newline).
+    pending = b''
+    pending_start = 0
+    tail = 0
+    for coffset, block_size, data in iter_bgzf_blocks(path):
+        tail = (coffset << 16) | len(data)
+        pos = 0
+        while True:
+            nl = data.find(b'\n', pos)
+            if nl < 0:
+                if pos < len(data):
+                    if not pending:
+                        pending_start = (coffset << 16) | pos
+                    pending += data[pos:]
+                break
+            if pending:
+                line, start = pending + data[pos:nl], pending_start
+                pending = b''
+            else:
+                line, start = data[pos:nl], (coffset << 16) | pos
+            pos = nl + 1
+            end = (coffset << 16) | pos if pos < len(data) else (coffset + block_size) << 16
+            yield line, start, end
+    if pending:
+        yield pending, pending_start, tail
+
+
+def is_bgzf(path: str) -> bool:
+    """
+    Checks whether `path` starts with a BGZF block header, i.e. was written by bgzip or htslib.
+    """
+    try:
+        next(iter_bgzf_blocks(path), None)
+        return True
+    except (ValueError, zlib.error, struct.error):
+        return False
+
+
+def write_bgzf(path: Path, payload: bytes):
+    """
+    Writes `payload` to `path` as a BGZF stream, including the terminating EOF block.
+    """
+    out = bytearray()
+    for i in range(0, len(payload), _BGZF_MAX_BLOCK):
+        chunk = payload[i:i + _BGZF_MAX_BLOCK]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        out += _BGZF_HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6)
+        out += struct.pack('<BBHH', 66, 67, 2, len(cdata) + 25)
+        out += cdata
+        out += struct.pack('<II', zlib.crc32(chunk), len(chunk))
+    out += _BGZF_EOF
+    Path(path).write_bytes(out)
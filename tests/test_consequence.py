@@ -0,0 +1,68 @@
+from cyvcf2 import VCF
+
+from cumulus_genomic_pipeline.radiant.vcf.common import process_common
+from cumulus_genomic_pipeline.radiant.vcf.consequence import (
+    IMPACT_SCORE,
+    ConsequenceBlock,
+    parse_csq_header,
+    process_consequence,
+)
+from cumulus_genomic_pipeline.schema.schema import BatchBuilder, consequence_schema
+
+VCF_PATH = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+DERIVED_COLUMNS = ['transcript_id', 'exon', 'consequences', 'is_picked', 'is_canonical', 'aa_change',
+                   'dna_change', 'impact_score']
+
+
+def reference_consequences(csq: str, csq_fields: dict[str, int]) -> list[dict]:
+    # Row at a time implementation the columnar engine replaced.
+    rows = []
+    for transcript in csq.split(','):
+        fields = transcript.split('|')
+        exon = fields[csq_fields['EXON']].split('/')
+        hgvsp, hgvsc = fields[csq_fields['HGVSp']], fields[csq_fields['HGVSc']]
+        rows.append({
+            'transcript_id': fields[csq_fields['Feature']],
+            'exon': {'rank': exon[0], 'total': exon[1]} if len(exon) == 2 else None,
+            'consequences': fields[csq_fields['Consequence']].split('&'),
+            'is_picked': fields[csq_fields['PICK']] == '1',
+            'is_canonical': fields[csq_fields['CANONICAL']] == 'YES',
+            'aa_change': hgvsp.split(':')[-1] if hgvsp else None,
+            'dna_change': hgvsc.split(':')[-1] if hgvsp else None,
+            'impact_score': IMPACT_SCORE.get(fields[csq_fields['IMPACT']], 0),
+        })
+    return rows
+
+
+def test_columnar_consequences_match_row_reference():
+    vcf = VCF(VCF_PATH)
+    csq_fields = parse_csq_header(vcf)
+    builder = BatchBuilder(consequence_schema)
+    block = ConsequenceBlock(csq_fields, builder)
+    expected, expected_picked = [], []
+    for record in vcf:
+        block.add(record, process_common(record, case_id=1, part=0))
+        csq = record.INFO.get('CSQ')
+        rows = reference_consequences(csq, csq_fields) if csq else []
+        expected.extend(rows)
+        picked = [row for row in rows if row['is_picked']][-1:] or [row for row in rows if row['is_canonical']][:1]
+        expected_picked.append(picked[0]['transcript_id'] if picked else None)
+
+    picked = block.flush()
+    assert len(block) == 0
+    assert builder.flush().select(DERIVED_COLUMNS).to_pylist() == expected
+    assert picked['transcript_id'].to_pylist() == expected_picked
+
+
+def test_process_consequence_returns_picked_transcript():
+    vcf = VCF(VCF_PATH)
+    csq_fields = parse_csq_header(vcf)
+    record = next(iter(vcf))
+    builder = BatchBuilder(consequence_schema)
+
+    picked = process_consequence(record, csq_fields, process_common(record, case_id=1, part=0), builder)
+
+    rows = builder.flush().to_pylist()
+    assert len(rows) == len(record.INFO['CSQ'].split(','))
+    assert picked is not None and picked['is_picked']
+    assert picked['transcript_id'] in {row['transcript_id'] for row in rows}
@@ -0,0 +1,92 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cumulus_genomic_pipeline.external_sort import SortBudget, SortedWriter
+from cumulus_genomic_pipeline.parquet_writer import TableWriter, WriterProfile
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import CONSEQUENCE_OUT, OCCURANCE_OUT, VARIANT_OUT, process_inputs
+
+SCHEMA = pa.schema([
+    pa.field('chromosome', pa.dictionary(pa.int16(), pa.string())),
+    pa.field('start', pa.int64()),
+    pa.field('locus_hash', pa.string()),
+    pa.field('row', pa.int64()),
+])
+
+
+def random_batches(n_batches: int, rows: int) -> list[pa.RecordBatch]:
+    rng = np.random.default_rng(7)
+    batches = []
+    for i in range(n_batches):
+        chromosomes = rng.choice(['1', '2', '10', 'X'], rows)
+        starts = rng.integers(0, 50, rows)
+        batches.append(pa.record_batch([
+            pa.array(chromosomes).dictionary_encode().cast(SCHEMA.field('chromosome').type),
+            pa.array(starts),
+            pa.array([f'{h:02d}' for h in rng.integers(0, 20, rows)]),
+            pa.array(np.arange(i * rows, (i + 1) * rows)),
+        ], schema=SCHEMA))
+    return batches
+
+
+def test_spilled_runs_merge_into_locus_order(tmp_path):
+    batches = random_batches(12, 500)
+    # A budget of about two batches, so the table is sorted as six spilled runs.
+    budget = 2 * batches[0].nbytes
+    with SortedWriter(TableWriter(tmp_path / 'out.parquet', SCHEMA, WriterProfile()), budget, str(tmp_path)) as writer:
+        for batch in batches:
+            writer.write(batch)
+        assert len(writer.runs) == 6
+
+    result = pq.read_table(tmp_path / 'out.parquet')
+    expected = pa.Table.from_batches(batches).cast(
+        SCHEMA.set(0, pa.field('chromosome', pa.string()))
+    ).sort_by([('chromosome', 'ascending'), ('start', 'ascending'), ('locus_hash', 'ascending')])
+    assert result.column('chromosome').type == SCHEMA.field('chromosome').type
+    assert result.cast(expected.schema).select(['chromosome', 'start', 'locus_hash']).equals(
+        expected.select(['chromosome', 'start', 'locus_hash'])
+    )
+    assert sorted(result['row'].to_pylist()) == list(range(6000))
+    # Row groups keep the input batch size, and the spill directory is removed.
+    assert pq.ParquetFile(tmp_path / 'out.parquet').metadata.row_group(0).num_rows == 500
+    assert [p.name for p in tmp_path.iterdir()] == ['out.parquet']
+
+
+def test_tables_share_the_sort_budget(tmp_path):
+    small, large = random_batches(12, 100), random_batches(12, 400)
+    budget = SortBudget(3 * large[0].nbytes)
+    writers = [
+        SortedWriter(TableWriter(tmp_path / f'{name}.parquet', SCHEMA, WriterProfile()), budget, str(tmp_path))
+        for name in ('small', 'large')
+    ]
+    for small_batch, large_batch in zip(small, large):
+        writers[0].write(small_batch)
+        writers[1].write(large_batch)
+        # Over by at most the batch each writer took since the last check.
+        assert sum(writer.buffered_bytes for writer in writers) < budget.memory_bytes + large[0].nbytes + small[0].nbytes
+    # The largest buffer is the one spilled, so the large table spills most.
+    assert len(writers[0].runs) < len(writers[1].runs)
+    for writer in writers:
+        writer.close()
+    assert pq.read_metadata(tmp_path / 'small.parquet').num_rows == 1200
+    assert pq.read_metadata(tmp_path / 'large.parquet').num_rows == 4800
+    assert budget.buffered == {id(writer): 0 for writer in writers}
+
+
+def test_sorted_output_keeps_rows(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    outputs = {}
+    for sort in (False, True):
+        output_dir = tmp_path / str(sort)
+        output_dir.mkdir()
+        process_inputs(VcfProcessingInput(vcf_files=[vcf], output_dir=str(output_dir), valid=True, sort=sort))
+        outputs[sort] = output_dir
+
+    keys = [('chromosome', 'ascending'), ('start', 'ascending'), ('locus_hash', 'ascending')]
+    for out in (VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT):
+        result = pq.read_table(outputs[True] / out)
+        assert result.select(['chromosome', 'start', 'locus_hash']).equals(
+            result.sort_by(keys).select(['chromosome', 'start', 'locus_hash'])
+        )
+        assert result.num_rows == pq.read_metadata(outputs[False] / out).num_rows
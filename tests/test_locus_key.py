@@ -0,0 +1,72 @@
+import numpy as np
+import pyarrow.parquet as pq
+
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import CONSEQUENCE_OUT, OCCURANCE_OUT, VARIANT_OUT, process_inputs
+from cumulus_genomic_pipeline.radiant.vcf.common import Common
+from cumulus_genomic_pipeline.radiant.vcf.locus_key import CollisionCheck, assign_locus_keys, packed_keys
+
+
+def common(chromosome: str, start: int, reference: str, alternate: str) -> Common:
+    locus = f'{chromosome}-{start}-{reference}-{alternate}'
+    return Common(case_id=1, part=0, locus=locus, locus_hash=None, chromosome=chromosome, start=start, end=start,
+                  reference=reference, alternate=alternate)
+
+
+def test_packed_keys_sort_in_genome_order_and_are_unique():
+    commons = [
+        common('1', 10, 'A', 'C'), common('1', 10, 'A', 'G'), common('1', 10, 'AC', 'A'),
+        common('1', 11, 'T', 'TTTTTTTTTTTTTTT'), common('2', 5, 'G', '<DEL>'), common('X', 1, 'C', 'T'),
+        common('GL000192.1', 3, 'A', 'C'), common('GL000193.1', 3, 'A', 'C'),
+    ]
+    keys = packed_keys(commons)
+
+    assert len(set(keys.tolist())) == len(commons)
+    assert (keys >= 0).all()
+    # Keys of standard contigs sort by chromosome then position.
+    assert (np.diff(keys[:6]) > 0).all()
+    assert packed_keys(commons[:1])[0] == keys[0]
+
+
+def test_collision_check_ignores_repeats_and_reports_shared_keys():
+    commons = [common('1', 10, 'A', 'C'), common('1', 10, 'A', 'C'), common('1', 20, 'A', 'C')]
+    assign_locus_keys(commons, 'blake2b')
+    check = CollisionCheck()
+    check.add(commons)
+    assert check.collisions() == 0
+
+    forged = common('1', 30, 'A', 'C')
+    forged.locus_key = commons[0].locus_key
+    check.add([forged])
+    assert check.collisions() == 1
+
+
+def test_collision_check_merges_the_keys_of_work_units():
+    commons = [common('1', 10, 'A', 'C'), common('1', 20, 'A', 'C')]
+    assign_locus_keys(commons, 'blake2b')
+    forged = common('1', 30, 'A', 'C')
+    forged.locus_key = commons[0].locus_key
+    # Two units, e.g. two cases on different workers, each without a collision of its own.
+    units = [CollisionCheck(), CollisionCheck()]
+    units[0].add(commons + commons)
+    units[1].add(commons[1:] + [forged])
+    assert [unit.collisions() for unit in units] == [0, 0]
+    assert len(units[0].pairs()[0]) == 2
+
+    run = CollisionCheck()
+    for unit in units:
+        run.merge(*unit.pairs())
+    assert run.collisions() == 1
+
+
+def test_int64_locus_key_joins_all_tables(tmp_path):
+    process_inputs(VcfProcessingInput(vcf_files=['tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'],
+                                      output_dir=str(tmp_path), valid=True, locus_key='packed'))
+
+    variants = pq.read_table(tmp_path / VARIANT_OUT)
+    assert 'locus_hash' not in variants.column_names
+    by_locus = dict(zip(variants['locus'].to_pylist(), variants['locus_key'].to_pylist()))
+    assert len(set(by_locus.values())) == len(by_locus)
+    for out in (CONSEQUENCE_OUT, OCCURANCE_OUT):
+        table = pq.read_table(tmp_path / out, columns=['locus', 'locus_key'])
+        assert all(by_locus[locus] == key for locus, key in zip(table['locus'].to_pylist(), table['locus_key'].to_pylist()))
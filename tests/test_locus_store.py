@@ -0,0 +1,80 @@
+import dataclasses
+import gzip
+import json
+
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cumulus_genomic_pipeline.locus_store import LocusStore
+from cumulus_genomic_pipeline.manifest import MANIFEST
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import process_inputs
+
+VCF = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def rows(output_dir, table: str) -> dict[str, int]:
+    return {path.name: pq.read_metadata(path).num_rows for path in sorted((output_dir / table).glob('*.parquet'))}
+
+
+def test_loci_are_written_once_across_cases_and_runs(tmp_path):
+    inputs = VcfProcessingInput(vcf_files=[VCF, VCF], output_dir=str(tmp_path), valid=True, dedupe_loci=True)
+    process_inputs(inputs)
+    assert rows(tmp_path, 'variants') == {'case-1.part-00000.parquet': 561, 'case-2.part-00000.parquet': 0}
+    assert rows(tmp_path, 'consequence') == {'case-1.part-00000.parquet': 4443, 'case-2.part-00000.parquet': 0}
+    assert rows(tmp_path, 'occurance') == {'case-1.part-00000.parquet': 1683, 'case-2.part-00000.parquet': 1683}
+
+    # A new case in a later run only writes occurrences.
+    process_inputs(dataclasses.replace(inputs, vcf_files=[VCF, VCF, VCF]))
+    assert rows(tmp_path, 'variants')['case-3.part-00000.parquet'] == 0
+    assert rows(tmp_path, 'occurance')['case-3.part-00000.parquet'] == 1683
+
+    # A case that runs again still writes the loci it owns.
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    manifest['inputs'][VCF]['units'] = {}
+    (tmp_path / MANIFEST).write_text(json.dumps(manifest))
+    process_inputs(dataclasses.replace(inputs, vcf_files=[VCF]))
+    assert rows(tmp_path, 'variants')['case-1.part-00000.parquet'] == 561
+    assert len(np.load(tmp_path / 'locus_store' / 'keys.npy')) == 561
+
+
+
+def test_rerun_of_a_shrunk_case_keeps_the_loci_of_other_cases(tmp_path):
+    with gzip.open(VCF, 'rt') as vcf:
+        lines = vcf.readlines()
+    header = [line for line in lines if line.startswith('#')]
+    records = lines[len(header):]
+    first, second = tmp_path / 'first.vcf', tmp_path / 'second.vcf'
+    for path in (first, second):
+        path.write_text(''.join(header + records))
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    inputs = VcfProcessingInput(
+        vcf_files=[str(first), str(second)], output_dir=str(output_dir), valid=True, dedupe_loci=True
+    )
+    process_inputs(inputs)
+    assert rows(output_dir, 'variants') == {'case-1.part-00000.parquet': 561, 'case-2.part-00000.parquet': 0}
+
+    # Case 1 no longer holds most of the loci that case 2 relies on.
+    first.write_text(''.join(header + records[:50]))
+    process_inputs(inputs)
+    variants = set(ds.dataset(output_dir / 'variants').to_table(columns=['locus_hash']).column(0).to_pylist())
+    occurrences = pq.read_table(output_dir / 'occurance' / 'case-2.part-00000.parquet', columns=['locus_hash'])
+    assert set(occurrences.column(0).to_pylist()) <= variants
+    assert len(variants) == 561
+
+
+def test_claim_marks_first_unknown_record_of_each_locus(tmp_path):
+    store = LocusStore(str(tmp_path))
+    loci = store.open(1, 0)
+    assert loci.claim(np.array([5, 3, 5, 9], dtype=np.int64)).tolist() == [True, True, False, True]
+    assert loci.claim(np.array([3, 4], dtype=np.int64)).tolist() == [False, True]
+    loci.save()
+
+    other = store.open(2, 0)
+    assert other.claim(np.array([4, 6], dtype=np.int64)).tolist() == [False, True]
+    other.save()
+    store.compact()
+    assert np.load(tmp_path / 'locus_store' / 'keys.npy').tolist() == [3, 4, 5, 6, 9]
+    assert store.open(1, 0).claim(np.array([3, 6], dtype=np.int64)).tolist() == [True, False]
@@ -0,0 +1,107 @@
+import dataclasses
+import gzip
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+from cumulus_genomic_pipeline import process_vcf
+from cumulus_genomic_pipeline.manifest import MANIFEST, file_checksum
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import VARIANT_OUT, process_inputs
+from cumulus_genomic_pipeline.vcf_index import write_bgzf
+
+VCF = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def test_rerun_skips_finished_inputs(tmp_path):
+    inputs = VcfProcessingInput(vcf_files=[VCF], output_dir=str(tmp_path), valid=True)
+    process_inputs(inputs)
+
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    entry = manifest['inputs'][VCF]
+    assert entry['checksum'] == file_checksum(VCF)
+    assert entry['units']['0']['records'] == 561
+    assert sorted(entry['units']['0']['files']) == ['consequence.parquet', 'occurance.parquet', 'variants.parquet']
+
+    written = (tmp_path / VARIANT_OUT).stat().st_mtime_ns
+    process_inputs(inputs)
+    assert (tmp_path / VARIANT_OUT).stat().st_mtime_ns == written
+    process_inputs(dataclasses.replace(inputs, force=True))
+    assert (tmp_path / VARIANT_OUT).stat().st_mtime_ns != written
+
+
+@pytest.mark.parametrize('layout', ['flat', 'hive'])
+def test_failed_unit_leaves_no_rows_and_reruns(tmp_path, monkeypatch, layout):
+    inputs = VcfProcessingInput(vcf_files=[VCF], output_dir=str(tmp_path), valid=True, output_layout=layout)
+    process_record = process_vcf._process_record
+    calls = 0
+
+    def failing_process_record(*args):
+        nonlocal calls
+        calls += 1
+        if calls > 300:
+            raise OSError('interrupted')
+        return process_record(*args)
+
+    # Small batches, so some rows have been written when the unit fails.
+    monkeypatch.setattr(process_vcf, 'BATCH_SIZE', 100)
+    monkeypatch.setattr(process_vcf, '_process_record', failing_process_record)
+    with pytest.raises(RuntimeError):
+        process_inputs(inputs)
+    assert [p for p in tmp_path.rglob('*') if p.is_file()] == []
+
+    monkeypatch.setattr(process_vcf, '_process_record', process_record)
+    process_inputs(inputs)
+    entry = json.loads((tmp_path / MANIFEST).read_text())['inputs'][VCF]
+    assert entry['units']['0']['records'] == 561
+    assert sorted(entry['units']['0']['files']) == sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob('*.parquet'))
+
+
+def test_failed_forced_hive_rerun_keeps_the_earlier_files(tmp_path, monkeypatch):
+    inputs = VcfProcessingInput(vcf_files=[VCF], output_dir=str(tmp_path), valid=True, output_layout='hive')
+    process_inputs(inputs)
+    files = {p: p.read_bytes() for p in tmp_path.rglob('*.parquet')}
+
+    def failing_process_record(*args):
+        raise OSError('interrupted')
+
+    monkeypatch.setattr(process_vcf, '_process_record', failing_process_record)
+    with pytest.raises(RuntimeError):
+        process_inputs(dataclasses.replace(inputs, force=True))
+    # The manifest still lists the unit as done, and its files are still there.
+    process_inputs(inputs)
+    assert {p: p.read_bytes() for p in tmp_path.rglob('*.parquet')} == files
+
+
+def test_rerun_with_fewer_shards_removes_the_earlier_parts(tmp_path):
+    lines = gzip.decompress(open(VCF, 'rb').read()).decode().splitlines(keepends=True)
+    header = [line for line in lines if line.startswith('#')]
+    records = lines[len(header):]
+    vcf = tmp_path / 'input.vcf.gz'
+    write_bgzf(vcf, ''.join(header + records).encode())
+    output_dir = tmp_path / 'output'
+    output_dir.mkdir()
+    inputs = VcfProcessingInput(
+        vcf_files=[str(vcf)], output_dir=str(output_dir), valid=True, shard=True, shard_size=60_000
+    )
+
+    def committed_files():
+        units = json.loads((output_dir / MANIFEST).read_text())['inputs'][str(vcf)]['units']
+        return sorted(file for unit in units.values() for file in unit['files'])
+
+    process_inputs(inputs)
+    shards = len(list((output_dir / 'variants').glob('*.parquet')))
+
+    # Cut to its first quarter, the VCF has fewer shards.
+    write_bgzf(vcf, ''.join(header + records[:140]).encode())
+    process_inputs(inputs)
+    assert len(list((output_dir / 'variants').glob('*.parquet'))) < shards
+    assert sorted(str(p.relative_to(output_dir)) for p in output_dir.rglob('*.parquet')) == committed_files()
+    assert pq.read_table(output_dir / 'variants').num_rows == 140
+
+    # So does a shard size change alone.
+    process_inputs(dataclasses.replace(inputs, shard_size=20_000))
+    process_inputs(inputs)
+    assert sorted(str(p.relative_to(output_dir)) for p in output_dir.rglob('*.parquet')) == committed_files()
+    assert pq.read_table(output_dir / 'variants').num_rows == 140
@@ -0,0 +1,69 @@
+import threading
+
+import pyarrow.parquet as pq
+import pytest
+
+from cumulus_genomic_pipeline.memory import MemoryBudget, MemoryLease
+from cumulus_genomic_pipeline.pipeline import Cancelled
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import CONSEQUENCE_OUT, VARIANT_OUT, process_inputs
+
+VCF = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def test_small_flush_size_flushes_before_batch_end(tmp_path):
+    inputs = VcfProcessingInput(
+        vcf_files=[VCF], output_dir=str(tmp_path), valid=True, flush_mb=1, memory_budget_mb=1
+    )
+    process_inputs(inputs)
+    # The consequence rows of the whole VCF are estimated at over 1 MiB, so there is more than one flush.
+    for table, rows in ((VARIANT_OUT, 561), (CONSEQUENCE_OUT, 4443)):
+        metadata = pq.read_metadata(tmp_path / table)
+        assert metadata.num_rows == rows
+        assert metadata.num_row_groups > 1
+
+
+def test_budget_waits_for_release():
+    budget = MemoryBudget(100)
+    lease = MemoryLease(budget)
+    lease.acquire(80)
+    acquired = threading.Event()
+
+    def acquire_more():
+        lease.acquire(40)
+        acquired.set()
+
+    thread = threading.Thread(target=acquire_more)
+    thread.start()
+    assert not acquired.wait(0.3)
+    lease.release(80)
+    assert acquired.wait(5)
+    thread.join()
+
+    # Larger than the whole budget: let through once nothing else is charged.
+    lease.close()
+    lease.acquire(500)
+    assert budget.used.value == 500
+
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(Cancelled):
+        lease.acquire(1, cancelled)
+    lease.close()
+    assert budget.used.value == 0
+
+
+@pytest.mark.parametrize('sort', [False, True])
+def test_budget_drains_the_writer_buffers(tmp_path, sort):
+    # The scan profile buffers 64 MiB row groups, and the sort buffers every row: the 1 MiB
+    # budget has them written out (or spilled) before the whole VCF is read.
+    inputs = VcfProcessingInput(
+        vcf_files=[VCF], output_dir=str(tmp_path), valid=True, flush_mb=1, memory_budget_mb=1,
+        writer_profile='scan', sort=sort
+    )
+    process_inputs(inputs)
+    metadata = pq.read_metadata(tmp_path / CONSEQUENCE_OUT)
+    assert metadata.num_rows == 4443
+    # Sorted tables are written from the merged runs at close, in whole row groups.
+    assert (metadata.num_row_groups > 1) != sort
+    assert pq.read_table(tmp_path / VARIANT_OUT).num_rows == 561
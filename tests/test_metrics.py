@@ -0,0 +1,31 @@
+import json
+
+from cumulus_genomic_pipeline.metrics import METRICS_JSON, METRICS_PROM
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import process_inputs
+
+VCF = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def test_run_writes_stage_metrics(tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    inputs = VcfProcessingInput(
+        vcf_files=[VCF, VCF], output_dir=str(tmp_path), valid=True, metrics_dir=str(metrics_dir)
+    )
+    process_inputs(inputs)
+
+    metrics = json.loads((metrics_dir / METRICS_JSON).read_text())
+    assert metrics['run']['complete'] and metrics['run']['units_finished'] == 2
+    stages = metrics['stages']
+    assert stages['decode']['items'] == stages['record']['items'] == 2 * 561
+    assert stages['write.consequence']['items'] == 2 * 4443
+    assert all(stage['seconds'] >= 0 for stage in stages.values())
+    assert list(metrics['inputs']) == [VCF]
+
+    prometheus = (metrics_dir / METRICS_PROM).read_text()
+    assert f'cumulus_pipeline_stage_items_total{{stage="decode",input="{VCF}",worker=' in prometheus
+    assert 'cumulus_pipeline_units_finished 2' in prometheus
+
+    # Nothing left to do: the metrics of the last run that did something are kept.
+    process_inputs(inputs)
+    assert json.loads((metrics_dir / METRICS_JSON).read_text())['run'] == metrics['run']
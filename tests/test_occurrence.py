@@ -0,0 +1,173 @@
+import numpy as np
+import pyarrow.compute as pc
+from cyvcf2 import VCF
+
+from cumulus_genomic_pipeline.radiant.vcf.common import process_common
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case, Experiment
+from cumulus_genomic_pipeline.radiant.vcf.occurrence import (
+    GT_NONE,
+    SEX_CODES,
+    SEX_OTHER,
+    OccurrenceBlock,
+    SparseOccurrences,
+    adjust_calls_and_zygosity,
+    chromosome_kind,
+    compute_transmission_mode,
+    family_tables,
+    genotype_codes,
+    normalize_calls,
+    parental_origin,
+    parental_origin_array,
+    process_occurrence,
+    transmission_mode_array,
+)
+from cumulus_genomic_pipeline.radiant.vcf.pedigree import Pedigree
+from cumulus_genomic_pipeline.schema.schema import BatchBuilder, occurance_schema
+
+VCF_PATH = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+SAMPLE_COLUMNS = ['seq_id', 'dp', 'gq', 'calls', 'has_alt', 'zygosity', 'ad_ref', 'ad_total', 'phased',
+                  'parental_origin', 'transmission_mode', 'father_calls', 'father_zygosity', 'father_dp',
+                  'mother_calls', 'mother_zygosity', 'mother_ad_ref']
+
+
+def trio_pedigree(vcf: VCF) -> Pedigree:
+    proband, father, mother = vcf.samples
+    experiments = [
+        Experiment(seq_id=1, task_id=1, patient_id=1, aliquot=proband, family_role='proband',
+                   affected_status='affected', sex='Female', experimental_strategy='WGS'),
+        Experiment(seq_id=2, task_id=1, patient_id=2, aliquot=father, family_role='father',
+                   affected_status='affected', sex='Male', experimental_strategy='WGS'),
+        Experiment(seq_id=3, task_id=1, patient_id=3, aliquot=mother, family_role='mother',
+                   affected_status='unaffected', sex='Female', experimental_strategy='WGS'),
+    ]
+    case = Case(case_id=1, part=0, vcf_filepath=VCF_PATH, analysis_type='WGS', experiments=experiments)
+    return Pedigree(case, vcf.samples)
+
+
+def reference_occurrences(record, ped: Pedigree, chromosome: str) -> list[dict]:
+    # Row at a time implementation the vectorized code replaced.
+    rows = {}
+    for idx, exp in enumerate(ped.experiments):
+        dp = record.format('DP')[idx][0]
+        gq = record.format('GQ')[idx][0]
+        ad_ref = record.gt_ref_depths[idx] if record.gt_ref_depths[idx] > 0 else None
+        ad_alt = record.gt_alt_depths[idx] if record.gt_alt_depths[idx] > 0 else None
+        calls, zygosity = adjust_calls_and_zygosity(record.genotypes[idx][:2], record.gt_types[idx], ad_ref, ad_alt)
+        rows[exp.seq_id] = {
+            'seq_id': exp.seq_id, 'dp': dp if dp > 0 else None, 'gq': gq if gq > 0 else None,
+            'calls': calls, 'has_alt': 1 in calls, 'zygosity': zygosity, 'ad_ref': ad_ref,
+            'ad_total': record.gt_depths[idx] if record.gt_depths[idx] > 0 else None,
+            'phased': record.gt_phases[idx],
+        }
+    father, mother = rows[ped.father_seq_id], rows[ped.mother_seq_id]
+    for row in rows.values():
+        for name in SAMPLE_COLUMNS[9:]:
+            row[name] = None
+    for progeny in ped.progenies:
+        row = rows[progeny.seq_id]
+        calls = normalize_calls(row['calls'])
+        row['parental_origin'] = parental_origin(
+            chromosome, calls, normalize_calls(father['calls']), normalize_calls(mother['calls']))
+        row['transmission_mode'] = compute_transmission_mode(
+            chromosome, progeny.sex, calls, normalize_calls(father['calls']), normalize_calls(mother['calls']),
+            ped.is_father_affected, ped.is_mother_affected)
+        row.update(father_calls=father['calls'], father_zygosity=father['zygosity'], father_dp=father['dp'],
+                   mother_calls=mother['calls'], mother_zygosity=mother['zygosity'], mother_ad_ref=mother['ad_ref'])
+    return list(rows.values())
+
+
+def test_vectorized_occurrences_match_row_reference():
+    vcf = VCF(VCF_PATH)
+    ped = trio_pedigree(vcf)
+    assert ped.is_family
+
+    builder = BatchBuilder(occurance_schema)
+    expected = []
+    for record in vcf:
+        common = process_common(record, case_id=1, part=0)
+        assert process_occurrence(record, ped, common, builder) == 3
+        expected.extend(reference_occurrences(record, ped, common.chromosome))
+
+    actual = builder.flush().select(SAMPLE_COLUMNS).to_pylist()
+    assert len(actual) == 561 * 3
+    assert actual == [{k: (int(v) if hasattr(v, 'dtype') else v) for k, v in row.items()} for row in expected]
+    assert {row['parental_origin'] for row in actual} > {None}
+
+
+def test_occurrence_block_matches_single_record_blocks():
+    vcf = VCF(VCF_PATH)
+    ped = trio_pedigree(vcf)
+
+    single, blocked = BatchBuilder(occurance_schema), BatchBuilder(occurance_schema)
+    block = OccurrenceBlock(ped, blocked, capacity=64)
+    for record in vcf:
+        common = process_common(record, case_id=1, part=0)
+        process_occurrence(record, ped, common, single)
+        block.add(record, common)
+    block.flush()
+
+    assert len(block) == 0
+    assert blocked.flush().equals(single.flush())
+
+
+def test_sparse_occurrences_keep_carriers_and_their_parents():
+    vcf = VCF(VCF_PATH)
+    ped = trio_pedigree(vcf)
+
+    builders = [BatchBuilder(occurance_schema) for _ in range(3)]
+    blocks = [
+        OccurrenceBlock(ped, builders[0]),
+        OccurrenceBlock(ped, builders[1], sparse=SparseOccurrences()),
+        OccurrenceBlock(ped, builders[2], sparse=SparseOccurrences(min_dp=20, min_gq=50)),
+    ]
+    for record in vcf:
+        common = process_common(record, case_id=1, part=0)
+        for block in blocks:
+            block.add(record, common)
+    for block in blocks:
+        block.flush()
+    dense, sparse, gated = (builder.flush() for builder in builders)
+
+    # Rows are record major: proband, father, mother. Parents stay when the proband carries the allele.
+    has_alt = dense.column('has_alt').to_numpy(zero_copy_only=False).reshape(-1, 3)
+    keep = has_alt.copy()
+    keep[:, 1:] |= has_alt[:, :1]
+    assert sparse.equals(dense.filter(keep.ravel()))
+    assert sparse.num_rows < dense.num_rows
+
+    passing = pc.and_(
+        pc.greater_equal(dense.column('dp'), 20), pc.greater_equal(dense.column('gq'), 50)
+    ).fill_null(False).to_numpy(zero_copy_only=False)
+    assert gated.equals(dense.filter(keep.ravel() | passing))
+
+
+def test_lookup_tables_match_scalar_functions():
+    rng = np.random.default_rng(7)
+    calls = rng.integers(-1, 3, size=(5000, 3)).astype(np.int16)
+    ploidy = rng.choice([0, 1, 2, 2, 2, 3], size=5000)
+    calls[np.arange(3) >= ploidy[:, np.newaxis]] = -2
+    codes = genotype_codes(calls, ploidy)
+    genotypes = [normalize_calls(row[:p]) for row, p in zip(calls.tolist(), ploidy.tolist())]
+
+    trios = rng.integers(0, len(calls), size=(20000, 3))
+    father_missing, mother_missing = rng.random(20000) < 0.1, rng.random(20000) < 0.1
+    chromosomes = rng.choice(['1', 'X', 'Y'], size=20000)
+    sexes = rng.choice(['Male', 'Female', 'Unknown'], size=20000)
+    affected = rng.random((20000, 2)) < 0.5
+
+    kinds = np.array([chromosome_kind(c) for c in chromosomes])
+    father = np.where(father_missing, GT_NONE, codes[trios[:, 1]])
+    mother = np.where(mother_missing, GT_NONE, codes[trios[:, 2]])
+    origins = parental_origin_array(kinds, codes[trios[:, 0]], father, mother)
+    transmissions = transmission_mode_array(
+        kinds, np.array([SEX_CODES.get(s, SEX_OTHER) for s in sexes]), codes[trios[:, 0]], father, mother,
+        affected[:, 0], affected[:, 1])
+
+    tables = family_tables()
+    for i, (progeny_idx, father_idx, mother_idx) in enumerate(trios.tolist()):
+        progeny_calls = genotypes[progeny_idx]
+        father_calls = None if father_missing[i] else genotypes[father_idx]
+        mother_calls = None if mother_missing[i] else genotypes[mother_idx]
+        assert tables.origin_labels[origins[i]] == parental_origin(chromosomes[i], progeny_calls, father_calls, mother_calls)
+        assert tables.transmission_labels[transmissions[i]] == compute_transmission_mode(
+            chromosomes[i], sexes[i], progeny_calls, father_calls, mother_calls, affected[i, 0], affected[i, 1])
@@ -0,0 +1,36 @@
+import pytest
+
+from cumulus_genomic_pipeline.pipeline import Pipeline
+
+
+def test_pipeline_keeps_order():
+    written = []
+    with Pipeline() as pipeline:
+        inputs, outputs = pipeline.channel(), pipeline.channel()
+        pipeline.start('reader', lambda: ([inputs.put(i) for i in range(50)], inputs.close()))
+        pipeline.start('writer', lambda: written.extend(outputs))
+        for item in inputs:
+            outputs.put(item * 2)
+        outputs.close()
+
+    assert written == [i * 2 for i in range(50)]
+
+
+def test_failed_writer_cancels_reader_and_transform():
+    def fail(channel):
+        next(iter(channel))
+        raise OSError('disk full')
+
+    def read_forever(channel):
+        i = 0
+        while True:
+            channel.put(i)
+            i += 1
+
+    with pytest.raises(OSError, match='disk full'):
+        with Pipeline() as pipeline:
+            inputs, outputs = pipeline.channel(), pipeline.channel()
+            pipeline.start('reader', read_forever, inputs)
+            pipeline.start('writer', fail, outputs)
+            for item in inputs:
+                outputs.put(item)
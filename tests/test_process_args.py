@@ -1,4 +1,5 @@
 import argparse
+import json
 from pathlib import PosixPath
 
 from cumulus_genomic_pipeline.process_args import VcfProcessingInput, validate
@@ -41,3 +42,49 @@ def test_fail_no_out_dir(tmp_path):
     expected = VcfProcessingInput(vcf_files=[f"{vcf_file_a}"], output_dir='', valid=False)
     
     assert actual == expected
+
+def test_manifest_entries_are_added_to_vcf_files(tmp_path):
+    input_dir: PosixPath = tmp_path / "input"
+    input_dir.mkdir()
+    vcf_file_a = input_dir / "sample1.vcf"
+    vcf_file_b = input_dir / "sample2.vcf"
+    vcf_file_a.write_text("##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\n")
+    vcf_file_b.write_text("##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\n")
+    manifest = input_dir / "manifest.txt"
+    manifest.write_text("# cohort\nsample2.vcf\n\nmissing.vcf\n")
+    output_dir: PosixPath = tmp_path / "output"
+
+    args = argparse.Namespace(
+        vcf=[f"{vcf_file_a}"],
+        manifest=f"{manifest}",
+        output_dir=f"{output_dir}"
+    )
+
+    actual: VcfProcessingInput = validate(args)
+    expected = VcfProcessingInput(vcf_files=[f"{vcf_file_a}", f"{vcf_file_b}"], output_dir=f"{output_dir}", valid=True)
+
+    assert actual == expected
+
+def test_case_definitions_are_read(tmp_path):
+    input_dir: PosixPath = tmp_path / "input"
+    input_dir.mkdir()
+    vcf_file = input_dir / "family.vcf"
+    vcf_file.write_text("##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\n")
+    experiment = {
+        "seq_id": 1, "task_id": 1, "patient_id": 1, "aliquot": "S1", "family_role": "proband",
+        "affected_status": "affected", "sex": "Female", "experimental_strategy": "WGS",
+    }
+    case = {"case_id": 7, "part": 1, "vcf_filepath": "family.vcf", "analysis_type": "WGS", "experiments": [experiment]}
+    case_file = input_dir / "case.json"
+    case_file.write_text(json.dumps(case))
+    output_dir: PosixPath = tmp_path / "output"
+
+    actual = validate(argparse.Namespace(cases=[f"{case_file}"], output_dir=f"{output_dir}"))
+    assert actual.valid
+    assert actual.vcf_files == []
+    assert [(c.case_id, c.vcf_filepath) for c in actual.cases] == [(7, f"{vcf_file}")]
+
+    # The VCF given without a case is case 1, like the case defined with id 1.
+    case_file.write_text(json.dumps([case, {**case, "case_id": 1}]))
+    actual = validate(argparse.Namespace(vcf=[f"{vcf_file}"], cases=[f"{case_file}"], output_dir=f"{output_dir}"))
+    assert not actual.valid
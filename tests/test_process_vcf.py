@@ -1,9 +1,18 @@
 import argparse
+import shutil
 from pathlib import PosixPath
 
-from cumulus_genomic_pipeline.schema.schema import variant_schema, consequence_schema, occurance_schema
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cumulus_genomic_pipeline.radiant.vcf.experiment import Case, Experiment
+from cumulus_genomic_pipeline.schema.schema import variant_schema, consequence_schema, occurance_schema, table_schemas
+from cumulus_genomic_pipeline.parquet_writer import SUPPORTS_BLOOM_FILTERS, TableWriter, WriterProfile, writer_profile
 from cumulus_genomic_pipeline.process_args import VcfProcessingInput, validate
-from cumulus_genomic_pipeline.process_vcf import CONSEQUENCE_OUT, OCCURANCE_OUT, VARIANT_OUT, process_inputs
+from cumulus_genomic_pipeline.process_vcf import (
+    CONSEQUENCE_OUT, OCCURANCE_OUT, SITES_OUT, VARIANT_OUT, _process_vcf, process_inputs
+)
 from tests.utils.utils import verify_parquet_file
 
 
@@ -32,4 +41,188 @@ def test_process_vcf(tmp_path):
     # than they are assertions that there should be that exact no. of rows
     assert verify_parquet_file(variant, variant_schema, 561)
     assert verify_parquet_file(consequence, consequence_schema, 4443)
-    assert verify_parquet_file(occurance, occurance_schema, 561)
+    assert verify_parquet_file(occurance, occurance_schema, 1683)
+
+
+def test_process_multiple_vcfs_writes_one_part_per_case(tmp_path):
+    output_dir: PosixPath = tmp_path / "output"
+    output_dir.mkdir()
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+    inputs = VcfProcessingInput(vcf_files=[vcf, vcf], output_dir=f"{output_dir.resolve()}", valid=True, workers=2)
+    process_inputs(inputs)
+
+    assert not (output_dir / VARIANT_OUT).exists()
+    for case_id in (1, 2):
+        part = f'case-{case_id}.part-00000.parquet'
+        assert verify_parquet_file(output_dir / 'variants' / part, variant_schema, 561)
+        assert verify_parquet_file(output_dir / 'consequence' / part, consequence_schema, 4443)
+        assert verify_parquet_file(output_dir / 'occurance' / part, occurance_schema, 1683)
+
+
+def test_cases_read_only_their_samples(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+    def case(case_id: int, aliquots: list[str]) -> Case:
+        experiments = [
+            Experiment(
+                seq_id=seq_id, task_id=1, patient_id=seq_id, aliquot=aliquot, family_role='proband',
+                affected_status='affected', sex='Unknown', experimental_strategy='WGS'
+            )
+            for seq_id, aliquot in enumerate(aliquots, start=1)
+        ]
+        return Case(case_id=case_id, part=1, vcf_filepath=vcf, analysis_type='WGS', experiments=experiments)
+
+    # Two families of one joint-called VCF, with their samples in another order than the VCF's.
+    cases = [case(3, ['NA12892_NA12892', 'NA12878_NA12878']), case(4, ['NA12891_NA12891'])]
+    inputs = VcfProcessingInput(vcf_files=[], output_dir=str(tmp_path), valid=True, cases=cases)
+    process_inputs(inputs)
+
+    for case_id, aliquots in ((3, ['NA12878_NA12878', 'NA12892_NA12892']), (4, ['NA12891_NA12891'])):
+        part = f'case-{case_id}.part-00000.parquet'
+        occurrences = pq.read_table(tmp_path / 'occurance' / part)
+        assert occurrences.num_rows == 561 * len(aliquots)
+        assert occurrences.column('aliquot').to_pylist()[:len(aliquots)] == aliquots
+        assert set(occurrences.column('case_id').to_pylist()) == {case_id}
+        assert verify_parquet_file(tmp_path / 'variants' / part, variant_schema, 561)
+
+    # Both cases are in the manifest, so a rerun has nothing left to do.
+    written = (tmp_path / 'occurance' / 'case-3.part-00000.parquet').stat().st_mtime_ns
+    process_inputs(inputs)
+    assert (tmp_path / 'occurance' / 'case-3.part-00000.parquet').stat().st_mtime_ns == written
+
+
+def test_ped_file_gives_the_same_trio_as_a_case_definition(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    ped = tmp_path / 'ceph.ped'
+    ped.write_text(
+        '# family individual father mother sex phenotype\n'
+        '1463 NA12878_NA12878 NA12891_NA12891 NA12892_NA12892 2 2\n'
+        '1463 NA12891_NA12891 0 0 1 2\n'
+        '1463 NA12892_NA12892 0 0 2 1\n'
+    )
+    experiments = [
+        Experiment(seq_id=seq_id, task_id=1, patient_id=seq_id, aliquot=aliquot, family_role=role,
+                   affected_status=status, sex=sex, experimental_strategy='Unknown')
+        for seq_id, aliquot, role, status, sex in (
+            (1, 'NA12878_NA12878', 'proband', 'affected', 'Female'),
+            (2, 'NA12891_NA12891', 'father', 'affected', 'Male'),
+            (3, 'NA12892_NA12892', 'mother', 'unaffected', 'Female'),
+        )
+    ]
+    case = Case(case_id=1, part=1, vcf_filepath=vcf, analysis_type='WGS', experiments=experiments)
+
+    args = argparse.Namespace(vcf=[vcf], output_dir=str(tmp_path / 'ped'), ped_file=str(ped))
+    process_inputs(validate(args))
+    (tmp_path / 'case').mkdir()
+    _process_vcf(vcf, str(tmp_path / 'case'), 1, case=case)
+
+    from_ped = pq.read_table(tmp_path / 'ped' / OCCURANCE_OUT)
+    assert from_ped.equals(pq.read_table(tmp_path / 'case' / OCCURANCE_OUT))
+    assert from_ped.column('seq_id').to_pylist()[:3] == [1, 2, 3]
+    assert from_ped.column('parental_origin').null_count == 561 * 2
+    assert from_ped.column('father_calls').to_pylist()[0] is not None
+
+
+def test_site_table_holds_the_site_columns_of_occurrences(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    for name, site_table in (('dense', False), ('sites', True)):
+        (tmp_path / name).mkdir()
+        process_inputs(VcfProcessingInput(
+            vcf_files=[vcf], output_dir=str(tmp_path / name), valid=True, site_table=site_table
+        ))
+
+    dense = pq.read_table(tmp_path / 'dense' / OCCURANCE_OUT)
+    occurrences = pq.read_table(tmp_path / 'sites' / OCCURANCE_OUT)
+    sites = pq.read_table(tmp_path / 'sites' / SITES_OUT)
+    assert sites.num_rows == 561
+    assert not {'quality', 'filter', 'info_qd', 'reference'} & set(occurrences.column_names)
+    # Joined back on the locus, they are the dense occurrence table.
+    by_locus = {site['locus_hash']: site for site in sites.to_pylist()}
+    joined = [{**by_locus[row['locus_hash']], **row} for row in occurrences.to_pylist()]
+    assert [{name: row[name] for name in dense.column_names} for row in joined] == dense.to_pylist()
+
+
+def test_compact_schema_profile_keeps_values(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    outputs = {}
+    for profile in ('default', 'compact'):
+        output_dir = tmp_path / profile
+        output_dir.mkdir()
+        process_inputs(VcfProcessingInput(vcf_files=[vcf], output_dir=str(output_dir), valid=True, schema_profile=profile))
+        outputs[profile] = output_dir
+
+    for out, schema in zip((VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT), table_schemas('compact')):
+        compact = pq.read_table(outputs['compact'] / out)
+        assert compact.schema.equals(schema)
+        assert compact.cast(pq.read_schema(outputs['default'] / out)).equals(pq.read_table(outputs['default'] / out))
+    assert pq.read_schema(outputs['compact'] / OCCURANCE_OUT).field('zygosity').type.index_type == pa.int8()
+
+
+
+def test_scan_writer_profile_keeps_values(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    outputs = {}
+    for profile in ('default', 'scan'):
+        output_dir = tmp_path / profile
+        output_dir.mkdir()
+        process_inputs(VcfProcessingInput(vcf_files=[vcf], output_dir=str(output_dir), valid=True, writer_profile=profile))
+        outputs[profile] = output_dir
+
+    for out in (VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT):
+        assert pq.read_table(outputs['scan'] / out).equals(pq.read_table(outputs['default'] / out))
+        metadata = pq.ParquetFile(outputs['scan'] / out).metadata
+        locus = metadata.row_group(0).column(metadata.schema.names.index('locus_hash'))
+        assert locus.compression == 'ZSTD'
+        # Only pyarrow 22+ writes them; the pinned pyarrow 21 does not.
+        if SUPPORTS_BLOOM_FILTERS:
+            assert locus.bloom_filter_length > 0
+    assert writer_profile('scan').bloom_filters == SUPPORTS_BLOOM_FILTERS
+
+
+def test_table_writer_sizes_row_groups_by_bytes(tmp_path):
+    schema = pa.schema([pa.field('value', pa.int64())])
+    batch = pa.record_batch([pa.array(range(1000), pa.int64())], schema=schema)
+    # 8000 bytes per batch, so a 20000 byte target closes a row group every third batch.
+    with TableWriter(tmp_path / 'out.parquet', schema, WriterProfile(row_group_bytes=20000)) as writer:
+        for _ in range(7):
+            writer.write(batch)
+
+    metadata = pq.ParquetFile(tmp_path / 'out.parquet').metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [3000, 3000, 1000]
+
+
+def test_table_writer_without_rows_writes_schema(tmp_path):
+    schema = pa.schema([pa.field('value', pa.int64())])
+    with TableWriter(tmp_path / 'out.parquet', schema, WriterProfile(row_group_bytes=20000)):
+        pass
+
+    assert pq.read_table(tmp_path / 'out.parquet').equals(schema.empty_table())
+
+
+def test_hive_layout_partitions_by_case_and_chromosome(tmp_path):
+    vcf = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+    flat_dir, hive_dir = tmp_path / 'flat', tmp_path / 'hive'
+    flat_dir.mkdir()
+    hive_dir.mkdir()
+    process_inputs(VcfProcessingInput(vcf_files=[vcf], output_dir=str(flat_dir), valid=True))
+    # The manifest keys inputs by path, so the second case gets a copy.
+    copy = shutil.copy(vcf, str(tmp_path / 'copy.vcf.gz'))
+    process_inputs(VcfProcessingInput(vcf_files=[vcf, copy], output_dir=str(hive_dir), valid=True, output_layout='hive'))
+    # A later run adds its files next to the existing ones.
+    files = sorted(p.relative_to(hive_dir) for p in hive_dir.rglob('*.parquet'))
+    process_inputs(VcfProcessingInput(vcf_files=[vcf], output_dir=str(hive_dir), valid=True, output_layout='hive'))
+    assert sorted(p.relative_to(hive_dir) for p in hive_dir.rglob('*.parquet')) == files
+
+    for out in (VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT):
+        flat = pq.read_table(flat_dir / out)
+        table_dir = hive_dir / out.removesuffix('.parquet')
+        chromosomes = set(flat['chromosome'].to_pylist())
+        assert {p.name for p in (table_dir / 'case_id=2').iterdir()} == {f'chromosome={c}' for c in chromosomes}
+        dataset = ds.dataset(table_dir, partitioning=ds.partitioning(
+            pa.schema([pa.field('case_id', pa.int32()), pa.field('chromosome', pa.string())]), flavor='hive'
+        ))
+        case = dataset.to_table(filter=ds.field('case_id') == 2).select(flat.column_names).cast(flat.schema)
+        index = flat.schema.get_field_index('case_id')
+        expected = flat.set_column(index, flat.schema.field(index), pa.array([2] * len(flat), pa.int32()))
+        assert case.sort_by('locus').equals(expected.sort_by('locus'))
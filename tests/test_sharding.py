@@ -0,0 +1,86 @@
+import gzip
+import os
+import random
+from pathlib import PosixPath
+
+import pyarrow.parquet as pq
+from cyvcf2 import VCF
+
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import process_inputs
+from cumulus_genomic_pipeline.sharding import plan_shards
+from cumulus_genomic_pipeline.vcf_index import ensure_index, find_index, index_contigs, write_bgzf
+from tests.utils.utils import bgzip_copy
+
+VCF_PATH = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def test_built_index_matches_full_scan(tmp_path):
+    vcf_path = bgzip_copy(VCF_PATH, tmp_path / 'input.vcf.gz')
+    assert find_index(str(vcf_path), str(tmp_path)) is None
+    index_path = ensure_index(str(vcf_path), str(tmp_path))
+    assert index_contigs(index_path) == ['chr11']
+
+    records = [(r.POS, r.end) for r in VCF(str(vcf_path))]
+    vcf = VCF(str(vcf_path))
+    vcf.set_index(str(index_path))
+    rng = random.Random(7)
+    for _ in range(50):
+        start = rng.randint(1, 260_000)
+        end = start + rng.randint(0, 40_000)
+        queried = [r.POS for r in vcf(f'chr11:{start}-{end}')]
+        expected = [pos for pos, stop in records if pos <= end and stop >= start]
+        assert queried == expected
+
+
+
+def test_inputs_with_the_same_name_get_an_index_each(tmp_path):
+    lines = gzip.decompress(open(VCF_PATH, 'rb').read()).decode().splitlines(keepends=True)
+    header = [line for line in lines if line.startswith('#')]
+    records = lines[len(header):]
+    first, second = tmp_path / 'a' / 'x.vcf.gz', tmp_path / 'b' / 'x.vcf.gz'
+    for path, count in ((first, 261), (second, len(records))):
+        path.parent.mkdir()
+        write_bgzf(path, ''.join(header + records[:count]).encode())
+    output_dir = tmp_path / 'output'
+    output_dir.mkdir()
+
+    inputs = VcfProcessingInput(
+        vcf_files=[str(first), str(second)], output_dir=str(output_dir), valid=True, shard=True, shard_size=20_000
+    )
+    process_inputs(inputs)
+    variants = pq.read_table(output_dir / 'variants', columns=['case_id']).column(0).to_pylist()
+    assert (variants.count(1), variants.count(2)) == (261, 561)
+    assert ensure_index(str(first), str(output_dir)) != ensure_index(str(second), str(output_dir))
+
+    # A changed VCF gets its index built again.
+    index = ensure_index(str(second), str(output_dir))
+    write_bgzf(second, ''.join(header + records[:100]).encode())
+    os.utime(second, ns=(0, index.stat().st_mtime_ns + 1))
+    assert find_index(str(second), str(output_dir)) is None
+    vcf = VCF(str(second))
+    vcf.set_index(str(ensure_index(str(second), str(output_dir))))
+    assert sum(1 for _ in vcf('chr11')) == 100
+
+
+def test_sharded_output_has_every_record_once(tmp_path):
+    vcf_path = bgzip_copy(VCF_PATH, tmp_path / 'input.vcf.gz')
+    output_dir: PosixPath = tmp_path / 'output'
+    output_dir.mkdir()
+
+    inputs = VcfProcessingInput(
+        vcf_files=[str(vcf_path)], output_dir=f'{output_dir.resolve()}', valid=True,
+        workers=2, shard=True, shard_size=20_000
+    )
+    process_inputs(inputs)
+
+    shards = plan_shards(str(vcf_path), ensure_index(str(vcf_path), str(output_dir)), 20_000)
+    assert len(shards) > 1
+    variants = pq.read_table(output_dir / 'variants').to_pydict()
+    consequences = pq.read_table(output_dir / 'consequence')
+    occurrences = pq.read_table(output_dir / 'occurance').to_pydict()
+    assert len(variants['locus']) == 561
+    assert len(set(variants['locus'])) == 561
+    assert consequences.num_rows == 4443
+    assert len(occurrences['locus']) == 561 * 3
+    assert len(set(occurrences['part'])) > 1
@@ -0,0 +1,112 @@
+import gzip
+
+import pyarrow.parquet as pq
+
+from cumulus_genomic_pipeline.process_vcf import CONSEQUENCE_OUT, OCCURANCE_OUT, VARIANT_OUT, _process_vcf
+
+VCF_PATH = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+SAMPLES = ('NA12878_NA12878', 'NA12891_NA12891', 'NA12892_NA12892')
+
+
+def csq(allele: str, consequence: str, impact: str, feature: str, pick: str = '') -> str:
+    fields = [''] * 23
+    fields[:10] = [
+        allele, consequence, impact, f'GENE{feature}', 'Transcript', f'ENSG{feature}', pick, f'ENST{feature}', '',
+        'protein_coding',
+    ]
+    fields[19] = 'SNV'  # VARIANT_CLASS
+    return '|'.join(fields)
+
+
+def record(pos: int, rsid: str, ref: str, alts: str, info: str, csqs: list[str], calls: tuple[str, ...]) -> str:
+    return '\t'.join([
+        'chr1', str(pos), rsid, ref, alts, '250.5', 'PASS', f"{info};CSQ={','.join(csqs)}", 'GT:AD:DP:GQ', *calls,
+    ])
+
+
+def write_vcf(path, records: list[str]):
+    with gzip.open(VCF_PATH, 'rt') as template:
+        header = [line.rstrip('\n') for line in template if line.startswith('##')]
+    columns = ['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT', *SAMPLES]
+    path.write_text('\n'.join(header + ['\t'.join(columns)] + records) + '\n')
+    return str(path)
+
+
+# Multi-allelic records, and the same records as `bcftools norm -m-` splits them. The first uses
+# VEP's default alleles, the second --minimal alleles (C>CT is "T"), the fourth a shared first
+# base that VEP drops ("-" and "TT").
+MULTI = [
+    record(
+        10_000, 'rs1', 'A', 'G,T', 'AC=1,2;AN=6;DP=60;FS=1.5;MLEAC=1,2;MLEAF=0.167,0.333',
+        [csq('G', 'missense_variant', 'MODERATE', '1', '1'), csq('G', 'intron_variant', 'MODIFIER', '2'),
+         csq('T', 'synonymous_variant', 'LOW', '1', '1')],
+        ('1/2:0,10,12:22:99', '0|2:10,0,8:18:50', './.:.:.:.'),
+    ),
+    record(
+        20_000, '.', 'C', 'CT,G', 'AC=2,3;AN=6;DP=27;MLEAC=2,3;MLEAF=0.333,0.5',
+        [csq('T', 'frameshift_variant', 'HIGH', '3', '1'), csq('G', 'stop_gained', 'HIGH', '3', '1')],
+        ('0/1:5,5,0:10:30', '2/2:0,0,9:9:20', '1/2:0,4,4:8:10'),
+    ),
+    record(
+        30_000, 'rs3', 'G', 'A', 'AC=1;AN=6;DP=30;MLEAC=1;MLEAF=0.167',
+        [csq('A', 'missense_variant', 'MODERATE', '4', '1')],
+        ('0/1:6,6:12:40', '0/0:9,0:9:30', '0/0:9,0:9:30'),
+    ),
+    record(
+        40_000, '.', 'AT', 'A,ATT', 'AC=1,1;AN=6;DP=31;MLEAC=1,1;MLEAF=0.167,0.167',
+        [csq('-', 'intron_variant', 'MODIFIER', '5'), csq('TT', 'intron_variant', 'MODIFIER', '5', '1')],
+        ('0/1:7,3,0:10:40', '0/2:5,.,4:9:30', '1/.:2,2,.:4:3'),
+    ),
+]
+SPLIT = [
+    record(
+        10_000, 'rs1', 'A', 'G', 'AC=1;AN=6;DP=60;FS=1.5;MLEAC=1;MLEAF=0.167',
+        [csq('G', 'missense_variant', 'MODERATE', '1', '1'), csq('G', 'intron_variant', 'MODIFIER', '2')],
+        ('1/0:0,10:22:99', '0|0:10,0:18:50', './.:.:.:.'),
+    ),
+    record(
+        10_000, 'rs1', 'A', 'T', 'AC=2;AN=6;DP=60;FS=1.5;MLEAC=2;MLEAF=0.333',
+        [csq('T', 'synonymous_variant', 'LOW', '1', '1')],
+        ('0/1:0,12:22:99', '0|1:10,8:18:50', './.:.:.:.'),
+    ),
+    record(
+        20_000, '.', 'C', 'CT', 'AC=2;AN=6;DP=27;MLEAC=2;MLEAF=0.333',
+        [csq('T', 'frameshift_variant', 'HIGH', '3', '1')],
+        ('0/1:5,5:10:30', '0/0:0,0:9:20', '1/0:0,4:8:10'),
+    ),
+    record(
+        20_000, '.', 'C', 'G', 'AC=3;AN=6;DP=27;MLEAC=3;MLEAF=0.5',
+        [csq('G', 'stop_gained', 'HIGH', '3', '1')],
+        ('0/0:5,0:10:30', '1/1:0,9:9:20', '0/1:0,4:8:10'),
+    ),
+    MULTI[2],
+    record(
+        40_000, '.', 'AT', 'A', 'AC=1;AN=6;DP=31;MLEAC=1;MLEAF=0.167',
+        [csq('-', 'intron_variant', 'MODIFIER', '5')],
+        ('0/1:7,3:10:40', '0/0:5,.:9:30', '1/.:2,2:4:3'),
+    ),
+    record(
+        40_000, '.', 'AT', 'ATT', 'AC=1;AN=6;DP=31;MLEAC=1;MLEAF=0.167',
+        [csq('TT', 'intron_variant', 'MODIFIER', '5', '1')],
+        ('0/0:7,0:10:40', '0/1:5,4:9:30', '0/.:2,.:4:3'),
+    ),
+]
+
+
+def test_multiallelic_records_match_split_vcf(tmp_path):
+    outputs = []
+    for name, records in (('multi', MULTI), ('split', SPLIT)):
+        output_dir = tmp_path / name
+        output_dir.mkdir()
+        result = _process_vcf(write_vcf(tmp_path / f'{name}.vcf', records), str(output_dir), 1)
+        assert result.records == len(records)
+        outputs.append([pq.read_table(output_dir / table) for table in (VARIANT_OUT, CONSEQUENCE_OUT, OCCURANCE_OUT)])
+
+    (variants, consequences, occurrences), expected = outputs
+    assert variants.num_rows == 7
+    assert variants.column('alternate').to_pylist() == ['G', 'T', 'CT', 'G', 'A', 'A', 'ATT']
+    assert consequences.column('transcript_id').to_pylist() == [
+        'ENST1', 'ENST2', 'ENST1', 'ENST3', 'ENST3', 'ENST4', 'ENST5', 'ENST5'
+    ]
+    for actual, table in zip((variants, consequences, occurrences), expected):
+        assert actual.equals(table)
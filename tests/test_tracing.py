@@ -0,0 +1,32 @@
+import json
+
+from cumulus_genomic_pipeline.process_args import VcfProcessingInput
+from cumulus_genomic_pipeline.process_vcf import process_inputs
+
+VCF = 'tests/data/4klines.variants.CEPH-1463.snv.vep.vcf.gz'
+
+
+def test_workers_append_sampled_trace_events(tmp_path):
+    trace_file = tmp_path / 'trace.jsonl'
+    inputs = VcfProcessingInput(
+        vcf_files=[VCF, VCF], output_dir=str(tmp_path / 'out'), valid=True, workers=2, trace_file=str(trace_file),
+        trace_every=100
+    )
+    (tmp_path / 'out').mkdir()
+    process_inputs(inputs)
+
+    events = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    for case_id in (1, 2):
+        unit = [event for event in events if event['case_id'] == case_id]
+        assert [event['event'] for event in unit][0] == 'unit' and unit[-1]['event'] == 'done'
+        records = [event for event in unit if event['event'] == 'record']
+        # 561 records, one in 100 sampled.
+        assert [event['index'] for event in records] == [100, 200, 300, 400, 500]
+        assert all(event['variants'] == len(event['transcripts']) >= 1 for event in records)
+        flushes = [event for event in unit if event['event'] == 'flush']
+        assert sum(event['records'] for event in flushes) == unit[-1]['records'] == 561
+        assert sum(event['rows'][0] for event in flushes) == 561
+
+    # A run without a trace file traces nothing.
+    process_inputs(VcfProcessingInput(vcf_files=[VCF], output_dir=str(tmp_path / 'out'), valid=True, force=True))
+    assert len(trace_file.read_text().splitlines()) == len(events)
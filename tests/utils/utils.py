@@ -24,4 +24,11 @@ def verify_parquet_file(file_path: Path, expected_schema: pa.Schema, row_count:
             
     except Exception as e:
         logging.error(f"Error reading Parquet file: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def bgzip_copy(src: Path, dst: Path) -> Path:
+    # The fixture is plain gzip; sharding needs a BGZF copy it can index.
+    import gzip
+    from cumulus_genomic_pipeline.vcf_index import write_bgzf
+    write_bgzf(dst, gzip.decompress(Path(src).read_bytes()))
+    return dst